@@ -0,0 +1,65 @@
+"""
+Compare the cost of canonicalizing an expression with compiling and
+evaluating it, and show how many distinct spellings collapse to one key.
+
+Run from the repository root:
+    python -m benchmarks.bench_canonical
+"""
+import random
+import timeit
+
+from src.canonical import fingerprint
+from src.expression_ast import compile_expression
+from src.numeric import NumericMode
+
+AUTO = NumericMode()
+BINDINGS = {"x": 2.0, "y": 5.0}
+
+
+def _inputs():
+    rng = random.Random(0)
+    yield "small", "(x + 3) * y - x / 2"
+    yield "integers", " + ".join(f"{rng.randrange(100)} * {rng.randrange(100)}" for _ in range(50))
+    yield "floats", " + ".join(f"{rng.randrange(100)}.{rng.randrange(100):02d} * {rng.choice('xy')}" for _ in range(200))
+    nested = "x"
+    for _ in range(1000):
+        nested = f"({nested} * y + {rng.randrange(1, 9)})"
+    yield "nested", nested
+
+
+def _spellings(count=1000):
+    # Commuted operands, extra parentheses and spaces, and respelled literals of a few expressions
+    rng = random.Random(1)
+    bases = [("2", "3", "x"), ("x", "y", "4"), ("1.5", "y", "x")]
+    spellings = []
+    for _ in range(count):
+        a, b, c = rng.choice(bases)
+        if rng.random() < 0.5:
+            a, b = b, a
+        a = f"({a})" if rng.random() < 0.3 else a
+        c = c.replace("1.5", "1.50") if rng.random() < 0.5 else c
+        spellings.append(f"{a}{' ' * rng.randrange(2)}*{b} + {c}" if rng.random() < 0.5 else f"{c} + {a}*{b}")
+    return spellings
+
+
+def main(number=200):
+    print(f"{'input':<9} {'compile (us)':>13} {'evaluate (us)':>14} {'fingerprint (us)':>17}")
+    for name, text in _inputs():
+        compiled = compile_expression(text, "iterative", numeric=AUTO)
+        times = [
+            min(timeit.repeat(func, number=number, repeat=3)) / number
+            for func in (
+                lambda: compile_expression(text, "iterative", numeric=AUTO),
+                lambda: compiled.evaluate(BINDINGS),
+                lambda: fingerprint(compiled),
+            )
+        ]
+        print(f"{name:<9} {times[0] * 1e6:>13.1f} {times[1] * 1e6:>14.1f} {times[2] * 1e6:>17.1f}")
+
+    spellings = _spellings()
+    keys = {fingerprint(compile_expression(text, numeric=AUTO)) for text in spellings}
+    print(f"\n{len(set(spellings))} distinct spellings, {len(keys)} distinct fingerprints")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Compare evaluating a tree, its optimized program and its generated Python
+function, and report what generating the function costs.
+
+Run from the repository root:
+    python -m benchmarks.bench_codegen
+"""
+import random
+import timeit
+
+from src.codegen import generate
+from src.expression_ast import compile_expression
+from src.optimizer import optimize
+
+BINDINGS = {"x": 2.0, "y": 5.0, "z": 0.5}
+
+
+def _inputs():
+    rng = random.Random(0)
+    yield "small", "(x + 3) * y - z / 2"
+    yield "pricing", " + ".join(
+        f"{rng.randrange(1, 100)}.{rng.randrange(100):02d} * {rng.choice('xyz')}" for _ in range(200)
+    )
+    nested = "x"
+    for _ in range(1000):
+        nested = f"({nested} * z + y - {rng.randrange(1, 9)})"
+    yield "nested", nested
+
+
+def main(number=200):
+    print(
+        f"{'input':<8} {'nodes':>6} {'generate (ms)':>14} {'tree (us)':>10} "
+        f"{'optimized (us)':>15} {'generated (us)':>15}"
+    )
+    for name, text in _inputs():
+        compiled = compile_expression(text, "iterative")
+        optimized = optimize(compiled)
+        generated = generate(compiled)
+        assert generated.evaluate(BINDINGS) == compiled.evaluate(BINDINGS)
+
+        generate_time = min(timeit.repeat(lambda: generate(compiled), number=1, repeat=5))
+        times = [
+            min(timeit.repeat(lambda: form.evaluate(BINDINGS), number=number, repeat=3)) / number
+            for form in (compiled, optimized, generated)
+        ]
+        print(
+            f"{name:<8} {optimized.nodes_after:>6} {generate_time * 1e3:>14.2f} {times[0] * 1e6:>10.2f} "
+            f"{times[1] * 1e6:>15.2f} {times[2] * 1e6:>15.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
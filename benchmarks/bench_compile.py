@@ -0,0 +1,40 @@
+"""
+Compare re-parsing an expression on every call against compiling it once.
+
+Run from the repository root:
+    python -m benchmarks.bench_compile
+"""
+import timeit
+
+from src.evaluator import ExpressionEvaluator
+from src.expression_ast import compile_expression
+
+EXPRESSIONS = [
+    "2 + 2",
+    "(3 + 5) * (2 - 1) / 4",
+    "((2 + 3) * 4) / (1 + 1)",
+    "2.5 * (3.0 + 4.5) - 0.1 * (0.2 + 0.3)",
+    " + ".join(str(i) for i in range(100)),
+]
+
+
+def main(number=2000):
+    print(f"{'expression':<40} {'parse (us)':>12} {'compiled (us)':>14} {'speedup':>8}")
+    for expression in EXPRESSIONS:
+        compiled = compile_expression(expression)
+        assert compiled.evaluate() == ExpressionEvaluator().parse_expression(expression)
+
+        parse_time = timeit.timeit(
+            lambda: ExpressionEvaluator().parse_expression(expression), number=number
+        )
+        compiled_time = timeit.timeit(compiled.evaluate, number=number)
+
+        label = expression if len(expression) <= 37 else expression[:34] + "..."
+        print(
+            f"{label:<40} {parse_time / number * 1e6:>12.2f} "
+            f"{compiled_time / number * 1e6:>14.2f} {parse_time / compiled_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
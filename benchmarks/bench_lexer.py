@@ -0,0 +1,33 @@
+"""
+Measure tokenizer throughput in MB/s on a few generated inputs.
+
+Run from the repository root:
+    python -m benchmarks.bench_lexer
+"""
+import random
+import timeit
+
+from src.lexer import tokenize
+
+
+def _inputs():
+    rng = random.Random(0)
+    yield "integer chain", " + ".join(str(rng.randrange(1000)) for _ in range(20000))
+    yield "decimals", " * ".join(f"{rng.random() * 100:.6f}" for _ in range(20000))
+    yield "nested", "(" * 5000 + "1" + " + 1)" * 5000
+    yield "variables", " - ".join(f"x{rng.randrange(50)}" for _ in range(20000))
+
+
+def main(repeat=5):
+    print(f"{'input':<16} {'size (KB)':>10} {'tokens':>8} {'MB/s':>8} {'ns/token':>9}")
+    for name, text in _inputs():
+        tokens = len(tokenize(text))
+        best = min(timeit.repeat(lambda: tokenize(text), number=1, repeat=repeat))
+        print(
+            f"{name:<16} {len(text) / 1024:>10.1f} {tokens:>8} "
+            f"{len(text) / best / 1e6:>8.1f} {best / tokens * 1e9:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
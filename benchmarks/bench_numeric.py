@@ -0,0 +1,54 @@
+"""
+Report what each numeric mode costs per operation, for compiling and for
+evaluating generated expressions.
+
+Run from the repository root:
+    python -m benchmarks.bench_numeric
+"""
+import random
+import timeit
+
+from src.expression_ast import compile_expression
+from src.numeric import NumericMode
+
+MODES = [
+    NumericMode("float"),
+    NumericMode("auto"),
+    NumericMode("fraction"),
+    NumericMode("decimal", 28),
+    NumericMode("decimal", 100),
+]
+
+OPERATIONS = 2000
+
+
+def _inputs():
+    rng = random.Random(0)
+    yield "integers", " ".join(
+        f"{rng.randrange(1, 10_000)} {rng.choice('+-*')}" for _ in range(OPERATIONS)
+    ) + " 1"
+    yield "money", " + ".join(
+        f"{rng.randrange(100)}.{rng.randrange(100):02d} * {rng.randrange(1, 10)}" for _ in range(OPERATIONS // 2)
+    )
+    yield "divisions", " + ".join(
+        f"{rng.randrange(1, 100)} / {rng.randrange(1, 100)}" for _ in range(OPERATIONS // 2)
+    )
+
+
+def main(number=20):
+    print(f"{'input':<10} {'mode':<12} {'compile (ns/op)':>16} {'evaluate (ns/op)':>17}")
+    for name, text in _inputs():
+        for mode in MODES:
+            compile_time = min(timeit.repeat(
+                lambda: compile_expression(text, "iterative", numeric=mode), number=number, repeat=5
+            ))
+            compiled = compile_expression(text, "iterative", numeric=mode)
+            evaluate_time = min(timeit.repeat(compiled.evaluate, number=number, repeat=5))
+            print(
+                f"{name:<10} {mode.key:<12} {compile_time / number / OPERATIONS * 1e9:>16.0f} "
+                f"{evaluate_time / number / OPERATIONS * 1e9:>17.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Report node counts and evaluation time before and after optimization on
+generated expressions with heavily repeated subterms.
+
+Run from the repository root:
+    python -m benchmarks.bench_optimizer
+"""
+import random
+import timeit
+
+from src.expression_ast import compile_expression
+from src.optimizer import optimize
+
+BINDINGS = {"x": 2.0, "y": 5.0}
+
+
+def _inputs():
+    rng = random.Random(0)
+    constant = ["(1.5+2.25)", "(3*4-1)", "(2.5/0.5)"]
+    mixed = ["(1.5+2.25)", "(x*3)", "(y-1)", "(x*3)/(y-1)"]
+    yield "constant terms", " + ".join(rng.choice(constant) for _ in range(2000))
+    yield "mixed terms", " + ".join(rng.choice(mixed) for _ in range(2000))
+    nested = "x"
+    for _ in range(1000):
+        nested = f"({nested} + (x*y-{rng.randrange(3)})) / 2"
+    yield "nested repeats", nested
+
+
+def main(number=50):
+    print(
+        f"{'input':<16} {'nodes':>7} {'unique':>7} {'folded':>7} "
+        f"{'optimize (ms)':>14} {'tree (us)':>10} {'optimized (us)':>15}"
+    )
+    for name, text in _inputs():
+        compiled = compile_expression(text, "iterative")
+        optimized = optimize(compiled)
+        assert optimized.evaluate(BINDINGS) == compiled.evaluate(BINDINGS)
+
+        optimize_time = min(timeit.repeat(lambda: optimize(compiled), number=1, repeat=5))
+        tree_time = timeit.timeit(lambda: compiled.evaluate(BINDINGS), number=number)
+        optimized_time = timeit.timeit(lambda: optimized.evaluate(BINDINGS), number=number)
+        print(
+            f"{name:<16} {optimized.nodes_before:>7} {optimized.nodes_after:>7} {optimized.folded:>7} "
+            f"{optimize_time * 1e3:>14.2f} {tree_time / number * 1e6:>10.1f} "
+            f"{optimized_time / number * 1e6:>15.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Measure the CPU time per request spent decoding bodies and encoding
+responses, FastAPI's default way (a pydantic body parameter and a returned
+dict) against the fast path in src/serialization.py, in JSON and MessagePack.
+
+Both variants are routes on one bare FastAPI app and return the same
+precomputed results, so the difference is the serialization overhead
+alone. Requests are sent straight to the ASGI app, without a network or
+test client in between.
+
+Run from the repository root:
+    python -m benchmarks.bench_serialization
+"""
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI, Request
+
+from src.expression_api import BatchRequest, ExpressionRequest
+from src.serialization import msgpack, read_model, respond
+
+app = FastAPI()
+
+
+def _batch_results(request):
+    return {"results": [{"expression": expression, "result": 42} for expression in request.expressions]}
+
+
+@app.post("/default/evaluate")
+async def default_evaluate(request: ExpressionRequest):
+    return {"expression": request.expression, "result": 42}
+
+
+@app.post("/fast/evaluate")
+async def fast_evaluate(http_request: Request):
+    request = await read_model(http_request, ExpressionRequest)
+    return respond(http_request, {"expression": request.expression, "result": 42})
+
+
+@app.post("/default/batch")
+async def default_batch(request: BatchRequest):
+    return _batch_results(request)
+
+
+@app.post("/fast/batch")
+async def fast_batch(http_request: Request):
+    request = await read_model(http_request, BatchRequest)
+    return respond(http_request, _batch_results(request))
+
+
+async def _post(path, body, headers):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": headers, "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8000),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    assert messages[0]["status"] == 200, messages
+
+
+async def _cpu_per_request(path, body, headers, number):
+    await _post(path, body, headers)
+    start = time.process_time()
+    for _ in range(number):
+        await _post(path, body, headers)
+    return (time.process_time() - start) / number * 1e6
+
+
+def _cases():
+    evaluate = {"expression": "(x + 3) * y - x / 2", "variables": {"x": 2.0, "y": 5.0}}
+    batch = {"expressions": [f"{n} * {n + 1} + 7" for n in range(200)]}
+    json_headers = [(b"content-type", b"application/json")]
+    for name, route, payload in (("evaluate", "evaluate", evaluate), ("batch200", "batch", batch)):
+        body = json.dumps(payload).encode()
+        yield name, "default json", f"/default/{route}", body, json_headers
+        yield name, "fast json", f"/fast/{route}", body, json_headers
+        if msgpack is not None:
+            headers = [(b"content-type", b"application/msgpack"), (b"accept", b"application/msgpack")]
+            yield name, "fast msgpack", f"/fast/{route}", msgpack.packb(payload), headers
+
+
+def main(number=2000):
+    print(f"{'payload':<10} {'path':<14} {'CPU/request (us)':>17} {'saved':>7}")
+    baseline = {}
+    for name, variant, path, body, headers in _cases():
+        runs = number if name == "evaluate" else number // 20
+        micros = asyncio.run(_cpu_per_request(path, body, headers, runs))
+        baseline.setdefault(name, micros)
+        saved = 1 - micros / baseline[name]
+        print(f"{name:<10} {variant:<14} {micros:>17.1f} {saved:>7.0%}")
+    if msgpack is None:
+        print("\nmsgpack is not installed; MessagePack cases skipped")
+
+
+if __name__ == "__main__":
+    main()
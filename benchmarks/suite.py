@@ -0,0 +1,253 @@
+"""
+Benchmark every evaluator implementation and the /evaluate endpoint.
+
+Each implementation is run over each generated workload. The suite reports
+throughput (ops/sec), per-operation latency percentiles and peak memory,
+and can compare the results against a stored baseline:
+
+    python -m benchmarks                    # run and print a table
+    python -m benchmarks --save-baseline    # store results in benchmarks/baseline.json
+    python -m benchmarks --check            # exit with status 1 on a regression
+
+Baselines are machine-specific; regenerate them on the machine that runs
+the check, and whenever a change moves the numbers on purpose. On a noisy
+machine, ``--repeat`` reports each case's median over several runs.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from .workloads import WORKLOADS
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def _api_evaluator():
+    from src.evaluator import ExpressionEvaluator
+    return lambda expression: ExpressionEvaluator().parse_expression(expression)
+
+
+def _streamlit_evaluator():
+    from src.evaluator import EngineEvaluator
+    return lambda expression: EngineEvaluator().parse_expression(expression)
+
+
+def _script_evaluator():
+    from src.test import evaluate_expression
+    return evaluate_expression
+
+
+def _compiled(engine):
+    def factory():
+        from src.expression_ast import compile_expression
+        return lambda expression: compile_expression(expression, engine).evaluate()
+    return factory
+
+
+def _endpoint():
+    from fastapi.testclient import TestClient
+    from src.expression_api import app, expression_cache, fingerprint_index
+
+    client = TestClient(app)
+    # Misses would otherwise be answered by entries of equivalent expressions from earlier cases
+    expression_cache.clear()
+    fingerprint_index.clear()
+
+    def evaluate(expression):
+        response = client.post("/evaluate", json={"expression": expression})
+        if response.status_code != 200:
+            raise ValueError(response.json()["detail"])
+        return response.json()["result"]
+    return evaluate
+
+
+IMPLEMENTATIONS = {
+    "api_evaluator": _api_evaluator,
+    "streamlit_evaluator": _streamlit_evaluator,
+    "script_evaluator": _script_evaluator,
+    "compiled_recursive": _compiled("recursive"),
+    "compiled_iterative": _compiled("iterative"),
+    "endpoint": _endpoint,
+}
+
+
+def run_case(evaluate, expressions, min_time=0.2):
+    """
+    Time one implementation over one workload.
+
+    The workload is repeated until at least min_time seconds have been
+    spent. A separate pass under tracemalloc measures peak memory, so the
+    tracing overhead does not distort the timings.
+
+    Args:
+        evaluate (Callable[[str], object]): Evaluates one expression
+        expressions (list): The workload
+        min_time (float): Minimum seconds spent timing
+
+    Returns:
+        dict: ops_per_sec, p50_us, p99_us, errors (per pass over the workload)
+            and peak_kb (peak traced memory during one pass)
+    """
+    latencies = []
+    errors = 0
+    perf_counter_ns = time.perf_counter_ns
+    started = perf_counter_ns()
+    deadline = started + int(min_time * 1e9)
+    while True:
+        for expression in expressions:
+            start = perf_counter_ns()
+            try:
+                evaluate(expression)
+            except Exception:
+                errors += 1
+            latencies.append(perf_counter_ns() - start)
+        if perf_counter_ns() >= deadline:
+            break
+    elapsed = (perf_counter_ns() - started) / 1e9
+
+    tracemalloc.start()
+    for expression in expressions:
+        try:
+            evaluate(expression)
+        except Exception:
+            pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "ops_per_sec": len(latencies) / elapsed,
+        "p50_us": latencies[len(latencies) // 2] / 1e3,
+        "p99_us": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] / 1e3,
+        "errors": errors * len(expressions) // len(latencies),
+        "peak_kb": peak / 1024,
+    }
+
+
+def run_suite(implementations=None, workloads=None, min_time=0.2, scale=1.0):
+    """
+    Run every selected implementation over every selected workload.
+
+    Args:
+        implementations (list, optional): Names from IMPLEMENTATIONS (default: all)
+        workloads (list, optional): Names from WORKLOADS (default: all)
+        min_time (float): Minimum seconds spent timing each case
+        scale (float): Multiplier for workload sizes
+
+    Returns:
+        dict: {"implementation/workload": run_case() result}
+    """
+    results = {}
+    for workload_name in workloads or WORKLOADS:
+        generator = WORKLOADS[workload_name]
+        default_count = generator.__defaults__[0]
+        expressions = generator(count=max(1, int(default_count * scale)))
+        for name in implementations or IMPLEMENTATIONS:
+            evaluate = IMPLEMENTATIONS[name]()
+            results[f"{name}/{workload_name}"] = run_case(evaluate, expressions, min_time)
+    return results
+
+
+def median_results(runs):
+    """
+    Combine repeated runs of the suite, keeping each case's median run by ops/sec.
+
+    Args:
+        runs (list): Outputs of run_suite() over the same cases
+
+    Returns:
+        dict: {"implementation/workload": run_case() result}
+    """
+    results = {}
+    for case in runs[0]:
+        ordered = sorted((run[case] for run in runs), key=lambda result: result["ops_per_sec"])
+        results[case] = ordered[len(ordered) // 2]
+    return results
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    Compare results against a baseline.
+
+    Args:
+        results (dict): Output of run_suite()
+        baseline (dict): A previous output of run_suite()
+        tolerance (float): Allowed fractional drop in ops/sec, e.g. 0.25
+
+    Returns:
+        list: Human-readable descriptions of each regression
+    """
+    regressions = []
+    for case, result in results.items():
+        expected = baseline.get(case)
+        if expected is None:
+            continue
+        floor = expected["ops_per_sec"] * (1 - tolerance)
+        if result["ops_per_sec"] < floor:
+            regressions.append(
+                f"{case}: {result['ops_per_sec']:.0f} ops/sec is below "
+                f"{floor:.0f} (baseline {expected['ops_per_sec']:.0f})"
+            )
+    return regressions
+
+
+def format_table(results):
+    lines = [
+        f"{'case':<44} {'ops/sec':>10} {'p50 (us)':>10} {'p99 (us)':>10} "
+        f"{'errors':>7} {'peak KB':>9}"
+    ]
+    for case, result in results.items():
+        lines.append(
+            f"{case:<44} {result['ops_per_sec']:>10.0f} {result['p50_us']:>10.1f} "
+            f"{result['p99_us']:>10.1f} {result['errors']:>7} {result['peak_kb']:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the expression evaluators")
+    parser.add_argument("--implementation", action="append", choices=sorted(IMPLEMENTATIONS),
+                        help="Implementation to run (repeatable; default: all)")
+    parser.add_argument("--workload", action="append", choices=sorted(WORKLOADS),
+                        help="Workload to run (repeatable; default: all)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds spent timing each case")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for workload sizes")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Runs of the suite; each case's median run is reported")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if any case regressed")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed fractional drop in ops/sec before --check fails")
+    args = parser.parse_args(argv)
+
+    runs = [
+        run_suite(args.implementation, args.workload, args.min_time, args.scale)
+        for _ in range(max(1, args.repeat))
+    ]
+    results = median_results(runs)
+    print(format_table(results))
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+
+    if args.check:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Deterministic generated workloads for the benchmark suite.
+
+Every workload is a list of expression strings built from a fixed seed, so
+runs on the same code are comparable.
+"""
+import random
+
+
+def long_chains(count=200, terms=200, seed=0):
+    """Long flat '+' and '-' chains of small integers."""
+    rng = random.Random(seed)
+    return [
+        str(rng.randrange(100)) + "".join(
+            f" {rng.choice('+-')} {rng.randrange(100)}" for _ in range(terms - 1)
+        )
+        for _ in range(count)
+    ]
+
+
+def deep_parentheses(count=200, depth=100, seed=0):
+    """Expressions nested depth levels deep, e.g. (1 + (2 * (3 - ...)))."""
+    rng = random.Random(seed)
+    expressions = []
+    for _ in range(count):
+        operators = [rng.choice("+-*") for _ in range(depth)]
+        numbers = [str(rng.randrange(1, 10)) for _ in range(depth)]
+        head = "".join(f"({number} {operator} " for number, operator in zip(numbers, operators))
+        expressions.append(head + "1" + ")" * depth)
+    return expressions
+
+
+def many_decimals(count=500, terms=30, seed=0):
+    """Products and sums of decimal literals with several fractional digits."""
+    rng = random.Random(seed)
+    return [
+        " ".join(
+            f"{rng.random() * 1000:.6f} {rng.choice('+-*/')}" for _ in range(terms - 1)
+        ) + f" {rng.random() * 1000 + 1:.6f}"
+        for _ in range(count)
+    ]
+
+
+def realistic_mix(count=2000, seed=0):
+    """Short formulas like the ones users type, with repeats."""
+    rng = random.Random(seed)
+    templates = [
+        "{a} + {b}",
+        "{a} * ({b} - {c})",
+        "({a} + {b}) / {c}",
+        "-{a} + {b} * {c}",
+        "(({a} + {b}) * {c}) / ({d} + 1)",
+        "{a}.{b} * {c}.{d}",
+    ]
+    expressions = []
+    for _ in range(count):
+        template = rng.choice(templates)
+        values = {name: rng.randrange(1, 50) for name in "abcd"}
+        expressions.append(template.format(**values))
+    return expressions
+
+
+def error_heavy(count=2000, seed=0):
+    """Mostly malformed input and division by zero, as sent by a broken client."""
+    rng = random.Random(seed)
+    broken = ["2 +", "* 3", "2 * (3 + 4", "3 ** 2", ".5 + 2", "2..5", "1 / 0", "2 / (3 - 3)", "((1)", "2 % 3"]
+    return [
+        rng.choice(broken) if rng.random() < 0.8 else f"{rng.randrange(10)} + {rng.randrange(10)}"
+        for _ in range(count)
+    ]
+
+
+WORKLOADS = {
+    "long_chains": long_chains,
+    "deep_parentheses": deep_parentheses,
+    "many_decimals": many_decimals,
+    "realistic_mix": realistic_mix,
+    "error_heavy": error_heavy,
+}
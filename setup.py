@@ -1,17 +1,32 @@
-from setuptools import setup, find_packages
+from setuptools import setup
 
 setup(
     name="expression-evaluator",
     version="0.1.0",
-    package_dir={"": "src"},
-    packages=find_packages(where="src"),
+    # The modules in src/ are installed as one package, so that generic names
+    # like config and lexer cannot clash with other installed distributions
+    package_dir={"expression_evaluator": "src"},
+    packages=["expression_evaluator"],
+    entry_points={
+        "console_scripts": [
+            "expression-batch=expression_evaluator.batch_cli:main",
+        ],
+    },
     install_requires=[
         "fastapi",
+        "numpy",
         "uvicorn",
+        "websockets>=11",
         "streamlit",
         "requests",
+        "httpx",
     ],
     extras_require={
+        # Faster JSON responses, and MessagePack request and response bodies
+        "fast": [
+            "orjson",
+            "msgpack",
+        ],
         "test": [
             "pytest",
             "pytest-cov",
@@ -0,0 +1,279 @@
+"""
+Admission control and load shedding for the API.
+
+A bounded number of requests is evaluated at once. A bounded number more
+may wait briefly for a slot, and anything beyond that is refused
+immediately, so latency stays bounded under overload instead of growing
+for every caller. An optional per-client token bucket refuses clients
+that send faster than their share.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict, deque
+
+
+class OverloadedError(RuntimeError):
+    """
+    Raised when a request cannot be admitted.
+
+    Attributes:
+        reason (str): "queue_full" if no waiting slot was free, "queue_timeout"
+            if the request waited too long for a slot
+    """
+
+    def __init__(self, message, reason):
+        super().__init__(message)
+        self.reason = reason
+
+
+class AdmissionController:
+    """
+    Limit how many requests are in flight, with a bounded FIFO wait queue.
+
+    Attributes:
+        max_in_flight (int): Requests processed at once (0 admits everything)
+        max_queue (int): Requests allowed to wait for a slot
+        queue_timeout (float): Seconds a request may wait before it is refused
+        in_flight (int): Requests currently holding a slot
+    """
+
+    def __init__(self, max_in_flight=64, max_queue=128, queue_timeout=1.0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters = deque()
+
+    @property
+    def queued(self):
+        """int: Requests waiting for a slot."""
+        return len(self._waiters)
+
+    async def acquire(self):
+        """
+        Take a slot, waiting up to queue_timeout for one to free up.
+
+        Raises:
+            OverloadedError: If the queue is full or the wait timed out
+        """
+        if not self.max_in_flight or (self.in_flight < self.max_in_flight and not self._waiters):
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise OverloadedError("Server is overloaded; too many requests waiting", "queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            # release() may have handed over the slot just as the wait timed out
+            if not waiter.done() or waiter.cancelled():
+                raise OverloadedError(
+                    f"Server is overloaded; no slot freed up within {self.queue_timeout} seconds",
+                    "queue_timeout",
+                ) from None
+        except asyncio.CancelledError:
+            # The request went away; pass on a slot that was already handed over
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self):
+        """Give a slot back, handing it straight to the longest-waiting request if there is one."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+class TokenBucket:
+    """
+    Allow ``rate`` requests per second on average, in bursts of up to ``burst``.
+
+    Attributes:
+        rate (float): Tokens added per second
+        burst (float): Most tokens the bucket holds
+        tokens (float): Tokens available at ``updated``
+        updated (float): time.monotonic() of the last refill
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic() if now is None else now
+
+    def take(self, now=None):
+        """
+        Take one token if one is available.
+
+        Args:
+            now (float, optional): The current time.monotonic()
+
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until one is available
+        """
+        if now is None:
+            now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    One token bucket per client, keeping buckets for the most recently seen clients.
+
+    Attributes:
+        rate (float): Requests per second allowed per client
+        burst (int): Requests a client may send at once
+        max_clients (int): Buckets kept; the least recently seen client's
+            bucket is dropped (i.e. refilled) beyond this
+    """
+
+    def __init__(self, rate, burst, max_clients=10_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+
+    def check(self, client, now=None):
+        """
+        Count a request from a client.
+
+        Args:
+            client (str): The client's identity
+            now (float, optional): The current time.monotonic()
+
+        Returns:
+            float: 0 if the request is allowed, otherwise the seconds until it would be
+        """
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket.take(now)
+
+
+def client_identity(scope, header=None):
+    """
+    Identify the client of an HTTP request or WebSocket connection, for rate limiting.
+
+    Args:
+        scope (dict): The ASGI scope
+        header (bytes, optional): Lower-case name of a header identifying the
+            client, e.g. an API key
+
+    Returns:
+        str: The header's value, or the client's address if there is no such header
+    """
+    if header is not None:
+        for name, value in scope["headers"]:
+            if name == header:
+                return value.decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else ""
+
+
+def retry_after_seconds(seconds):
+    """
+    Round a wait up to the whole seconds of a Retry-After header.
+
+    Args:
+        seconds (float): The wait
+
+    Returns:
+        int: At least 1
+    """
+    return max(1, math.ceil(seconds))
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware that sheds load before it reaches the endpoints.
+
+    Requests under ``prefix`` are first checked against the client's rate
+    limit (429 if exceeded), then wait for an admission slot (503 if none
+    frees up). Both responses carry a Retry-After header. Other paths, such
+    as /metrics, are always let through, and so are WebSocket connections,
+    whose messages are each admitted by the endpoint instead: a slot held
+    for a connection's lifetime would not bound the work it sends.
+
+    Args:
+        app: The ASGI application to wrap
+        controller (AdmissionController): The in-flight limit
+        limiter (RateLimiter, optional): Per-client rate limit
+        shed (Counter, optional): Counter labelled by reason, incremented for every refused request
+        phases (Histogram, optional): Histogram labelled by phase; the wait
+            for a slot is recorded as the "queue" phase
+        prefix (str): Only paths starting with this are controlled
+        client_header (str, optional): Header identifying the client, e.g. an
+            API key; the client's address is used if omitted or missing
+        retry_after (float): Retry-After, in seconds, sent with 503 responses
+    """
+
+    def __init__(self, app, controller, limiter=None, shed=None, phases=None,
+                 prefix="/evaluate", client_header=None, retry_after=1.0):
+        self.app = app
+        self.controller = controller
+        self.limiter = limiter
+        self.shed = shed
+        self.phases = phases
+        self.prefix = prefix
+        self.client_header = client_header.lower().encode("latin-1") if client_header else None
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        if self.limiter is not None:
+            wait = self.limiter.check(client_identity(scope, self.client_header))
+            if wait:
+                await self._refuse(send, 429, "Rate limit exceeded", wait, "rate_limited")
+                return
+
+        start = time.perf_counter()
+        try:
+            await self.controller.acquire()
+        except OverloadedError as e:
+            await self._refuse(send, 503, str(e), self.retry_after, e.reason)
+            return
+        if self.phases is not None:
+            self.phases.observe(time.perf_counter() - start, "queue")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+    async def _refuse(self, send, status, detail, retry_after, reason):
+        if self.shed is not None:
+            self.shed.inc(reason)
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after_seconds(retry_after)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,271 @@
+"""
+Clients for the API: a pooled HTTP client for evaluating many expressions
+through the batch endpoint, and a WebSocket client that keeps one
+connection open and pipelines expressions over it.
+"""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from .expression_ast import normalize_expression
+except ImportError:
+    from expression_ast import normalize_expression
+
+API_URL = "http://localhost:8000"
+
+# Error types that depend only on the expression, not on the server's load,
+# so that their outcome can be cached like a result
+CACHEABLE_ERRORS = ("invalid_expression", "division_by_zero")
+
+
+def make_session(pool_size=8):
+    """
+    Create a session that keeps up to pool_size connections to the API alive.
+
+    Args:
+        pool_size (int): Connections kept open per host
+
+    Returns:
+        requests.Session: The session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def cacheable(outcome):
+    """
+    Decide whether an outcome can be answered from a client-side cache next time.
+
+    Args:
+        outcome (dict): {"result": ...} or {"error": {"type": ..., "detail": ...}}
+
+    Returns:
+        bool: True for results and errors of a type in CACHEABLE_ERRORS;
+            timeouts, overload and limit errors may not recur and are not cached
+    """
+    return "result" in outcome or outcome["error"].get("type") in CACHEABLE_ERRORS
+
+
+def post_batch(session, url, expressions, timeout=30):
+    """
+    Evaluate one batch through POST /evaluate/batch.
+
+    A batch larger than the server's EXPRESSION_MAX_BATCH_SIZE is refused
+    with 413; it is then split into batches of the size the server names in
+    X-Max-Batch-Size (or into halves if it names none) and sent again.
+
+    Args:
+        session (requests.Session): The pooled session
+        url (str): Base URL of the API
+        expressions (list): The expressions
+        timeout (float): Request timeout in seconds
+
+    Returns:
+        list: One {"result": ...} or {"error": {...}} outcome per expression
+
+    Raises:
+        requests.RequestException: If the request fails or the server rejects the batch
+    """
+    response = session.post(f"{url}/evaluate/batch", json={"expressions": expressions}, timeout=timeout)
+    if response.status_code == 413 and len(expressions) > 1:
+        size = int(response.headers.get("X-Max-Batch-Size") or 0)
+        if not 0 < size < len(expressions):
+            size = len(expressions) // 2
+        outcomes = []
+        for start in range(0, len(expressions), size):
+            outcomes.extend(post_batch(session, url, expressions[start:start + size], timeout))
+        return outcomes
+    response.raise_for_status()
+    return [
+        {key: item[key] for key in ("result", "error") if key in item}
+        for item in response.json()["results"]
+    ]
+
+
+def evaluate_many(session, expressions, cache, url=API_URL, batch_size=1000, workers=4, on_progress=None):
+    """
+    Evaluate a list of expressions with as few requests as possible.
+
+    Expressions are normalized and deduplicated, those already in the
+    client-side cache are answered from it, and the rest are sent in
+    batches of batch_size, with up to ``workers`` batches in flight over
+    the session's connection pool. Only cacheable() outcomes are added to
+    the cache.
+
+    Args:
+        session (requests.Session): The pooled session
+        expressions (list): The expressions, in order
+        cache (ExpressionCache): Client-side cache of normalized expression -> outcome
+        url (str): Base URL of the API
+        batch_size (int): Expressions per request; batches over the
+            server's EXPRESSION_MAX_BATCH_SIZE are split by post_batch()
+        workers (int): Batches in flight at once
+        on_progress (Callable[[int, int], None], optional): Called with
+            (expressions done, expressions to send) after each batch
+
+    Returns:
+        list: One {"result": ...} or {"error": {...}} outcome per input expression
+
+    Raises:
+        requests.RequestException: If a batch request fails
+    """
+    keys = [normalize_expression(expression) for expression in expressions]
+    outcomes = {}
+    missing = []
+    for key in dict.fromkeys(keys):
+        outcome = cache.get(key)
+        if outcome is None:
+            missing.append(key)
+        else:
+            outcomes[key] = outcome
+
+    batches = [missing[start:start + batch_size] for start in range(0, len(missing), batch_size)]
+    done = 0
+    if on_progress is not None:
+        on_progress(done, len(missing))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(post_batch, session, url, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            batch = futures[future]
+            for key, outcome in zip(batch, future.result()):
+                outcomes[key] = outcome
+                if cacheable(outcome):
+                    cache.put(key, outcome)
+            done += len(batch)
+            if on_progress is not None:
+                on_progress(done, len(missing))
+
+    return [outcomes[key] for key in keys]
+
+
+def socket_url(url):
+    """
+    Get the WebSocket endpoint of an API from its base URL.
+
+    Args:
+        url (str): Base URL, e.g. "http://localhost:8000"
+
+    Returns:
+        str: The /ws endpoint, e.g. "ws://localhost:8000/ws"
+    """
+    if url.startswith("https://"):
+        url = "wss://" + url[len("https://"):]
+    elif url.startswith("http://"):
+        url = "ws://" + url[len("http://"):]
+    return url.rstrip("/") + "/ws"
+
+
+class SocketClient:
+    """
+    One persistent connection to the API's /ws endpoint.
+
+    Each expression is sent as a message tagged with an id and answered as
+    soon as the server has evaluated it, so there is no connection setup or
+    HTTP framing per expression, and many expressions can be in flight at
+    once. A client is not thread-safe; use one per thread or session.
+
+    Args:
+        url (str): Base URL of the API
+        timeout (float): Seconds to wait for the connection and for each reply
+        connection (optional): An open connection with send(str),
+            recv(timeout) and close(); one is opened to ``url`` if omitted
+    """
+
+    def __init__(self, url=API_URL, timeout=10, connection=None):
+        self.timeout = timeout
+        if connection is None:
+            # Imported here so that HTTP-only callers never load websockets
+            from websockets.sync.client import connect as websocket_connect
+
+            # Replies are small, so compressing them costs more time than it saves
+            connection = websocket_connect(socket_url(url), open_timeout=timeout, compression=None)
+        self.connection = connection
+        self._last_id = 0
+
+    def _send(self, expression, variables=None):
+        self._last_id += 1
+        message = {"id": self._last_id, "expression": expression}
+        if variables:
+            message["variables"] = variables
+        self.connection.send(json.dumps(message))
+        return self._last_id
+
+    def _receive(self):
+        reply = json.loads(self.connection.recv(timeout=self.timeout))
+        return reply.get("id"), {key: reply[key] for key in ("result", "error") if key in reply}
+
+    def evaluate(self, expression, variables=None):
+        """
+        Evaluate one expression and wait for its result.
+
+        Args:
+            expression (str): The mathematical expression
+            variables (Mapping[str, float], optional): Values for its variables
+
+        Returns:
+            dict: {"result": ...} or {"error": {"type": ..., "detail": ...}}
+
+        Raises:
+            TimeoutError: If no reply arrives within the timeout
+            websockets.exceptions.ConnectionClosed: If the connection is lost
+        """
+        tag = self._send(expression, variables)
+        while True:
+            reply_tag, outcome = self._receive()
+            # Replies to an earlier call that gave up waiting are skipped
+            if reply_tag == tag:
+                return outcome
+
+    def pipeline(self, expressions, window=64):
+        """
+        Evaluate many expressions with up to ``window`` of them in flight.
+
+        Expressions are read from the iterable lazily, as earlier ones are answered.
+
+        Args:
+            expressions (Iterable[str]): The expressions
+            window (int): Most expressions sent but not yet answered
+
+        Yields:
+            tuple: (index, outcome, seconds) in completion order, where index
+                is the expression's position in the input, outcome is as for
+                evaluate(), and seconds is the time from sending it to its reply
+
+        Raises:
+            TimeoutError: If no reply arrives within the timeout
+            websockets.exceptions.ConnectionClosed: If the connection is lost
+        """
+        expressions = enumerate(expressions)
+        in_flight = {}
+        exhausted = False
+        while True:
+            while not exhausted and len(in_flight) < window:
+                item = next(expressions, None)
+                if item is None:
+                    exhausted = True
+                else:
+                    index, expression = item
+                    in_flight[self._send(expression)] = (index, time.perf_counter())
+            if not in_flight:
+                return
+            tag, outcome = self._receive()
+            sent = in_flight.pop(tag, None)
+            if sent is not None:
+                yield sent[0], outcome, time.perf_counter() - sent[1]
+
+    def close(self):
+        """Close the connection."""
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,280 @@
+"""
+Evaluate a file of expressions, one per line, on every core.
+
+The input is memory-mapped and cut into byte ranges that end at newlines.
+Workers receive only the path and a range, map the file themselves and
+read their lines straight from the page cache, so the input is never
+copied into or pickled for a worker. Each range's results come back as
+one encoded block and are written in input order, one output line per
+input line:
+
+    expression-batch expressions.txt --output results.ndjson
+    expression-batch expressions.txt --format text --workers 8 --numeric-mode decimal
+
+Only the standard library and the evaluator core are imported, so workers
+start quickly.
+"""
+import argparse
+import json
+import mmap
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from . import config
+    from .expression_ast import compile_expression
+    from .expression_cache import ExpressionCache
+    from .limits import LimitExceededError, check_expression
+    from .numeric import MODES, NumericMode, format_number
+except ImportError:
+    import config
+    from expression_ast import compile_expression
+    from expression_cache import ExpressionCache
+    from limits import LimitExceededError, check_expression
+    from numeric import MODES, NumericMode, format_number
+
+FORMATS = ("ndjson", "text")
+
+# Bytes per work item: large enough that pickling a block of results is
+# noise, small enough that every worker gets many ranges to balance load
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Distinct lines whose encoded output each process remembers, for repetitive input
+LINE_CACHE_SIZE = 4096
+
+_line_cache = None
+
+
+def split_ranges(data, chunk_bytes):
+    """
+    Cut a buffer into byte ranges that each end just after a newline.
+
+    Args:
+        data (mmap.mmap or bytes): The input
+        chunk_bytes (int): Approximate size of each range
+
+    Returns:
+        list[tuple[int, int]]: (start, end) offsets covering the whole input;
+            only the last range may end without a newline
+
+    Example:
+        >>> split_ranges(b"1+1\\n2*3\\n4/2\\n", 5)
+        [(0, 8), (8, 12)]
+    """
+    size = len(data)
+    ranges = []
+    start = 0
+    while start < size:
+        end = start + chunk_bytes
+        if end >= size:
+            end = size
+        else:
+            newline = data.find(b"\n", end - 1)
+            end = size if newline == -1 else newline + 1
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def evaluate_line(expression, numeric, engine="iterative"):
+    """
+    Evaluate one expression into a JSON-compatible record.
+
+    Args:
+        expression (str): The mathematical expression
+        numeric (NumericMode): The numeric mode to evaluate in
+        engine (str): The parser engine
+
+    Returns:
+        dict: {"result": ...} or {"error": {"type": ..., "detail": ...}},
+            matching the per-item objects of the API's batch and stream endpoints
+    """
+    try:
+        check_expression(expression, config.MAX_EXPRESSION_LENGTH, config.MAX_TOKENS, config.MAX_NESTING_DEPTH)
+        return {"result": format_number(compile_expression(expression, engine, numeric=numeric).evaluate())}
+    except ZeroDivisionError as e:
+        return {"error": {"type": "division_by_zero", "detail": str(e)}}
+    except LimitExceededError as e:
+        return {"error": {"type": "limit_exceeded", "detail": str(e)}}
+    except (ValueError, ArithmeticError, RecursionError) as e:
+        return {"error": {"type": "invalid_expression", "detail": str(e)}}
+
+
+def encode_record(record, output_format):
+    """
+    Encode one record as an output line.
+
+    Args:
+        record (dict): The return value of evaluate_line()
+        output_format (str): "ndjson" for a JSON object, "text" for the bare
+            result or "error: <detail>"
+
+    Returns:
+        bytes: The newline-terminated line
+    """
+    if output_format == "text":
+        if "result" in record:
+            return f"{record['result']}\n".encode("utf-8")
+        return f"error: {record['error']['detail']}\n".encode("utf-8")
+    return json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def evaluate_range(path, start, end, numeric, output_format="ndjson", engine="iterative"):
+    """
+    Evaluate the lines in one byte range of a file.
+
+    Runs in a pool worker. The file is mapped here rather than passed in,
+    so only the arguments cross the process boundary.
+
+    Args:
+        path (str): The input file
+        start (int): Offset of the first line
+        end (int): Offset just past the last line
+        numeric (NumericMode): The numeric mode to evaluate in
+        output_format (str): One of FORMATS
+        engine (str): The parser engine
+
+    Returns:
+        tuple: (output, lines, errors) where output is the encoded results,
+            one line per input line, and lines and errors are counts
+    """
+    global _line_cache
+    if _line_cache is None:
+        # One per process, kept across the ranges a worker is given
+        _line_cache = ExpressionCache(maxsize=LINE_CACHE_SIZE)
+    cache_tag = (numeric.key, output_format, engine)
+
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        output = []
+        errors = 0
+        position = start
+        while position < end:
+            newline = data.find(b"\n", position, end)
+            stop = end if newline == -1 else newline
+            raw = data[position:stop]
+            position = stop + 1
+
+            key = (cache_tag, raw)
+            cached = _line_cache.get(key)
+            if cached is None:
+                try:
+                    expression = raw.decode("utf-8").strip()
+                except UnicodeDecodeError:
+                    record = {"error": {"type": "invalid_expression", "detail": "Line is not valid UTF-8"}}
+                else:
+                    record = evaluate_line(expression, numeric, engine)
+                cached = (encode_record(record, output_format), "error" in record)
+                _line_cache.put(key, cached)
+            output.append(cached[0])
+            errors += cached[1]
+    return b"".join(output), len(output), errors
+
+
+def evaluate_file(path, output, workers=None, chunk_bytes=DEFAULT_CHUNK_BYTES, numeric=None,
+                  output_format="ndjson", engine="iterative"):
+    """
+    Evaluate every line of a file and write the results in input order.
+
+    At most two ranges per worker are in flight, so results waiting to be
+    written stay bounded however large the input is.
+
+    Args:
+        path (str): The input file, one expression per line
+        output (BinaryIO): Where to write the results
+        workers (int, optional): Worker processes; one per CPU if omitted,
+            and evaluated in this process if 1
+        chunk_bytes (int): Approximate size of each work item
+        numeric (NumericMode, optional): The numeric mode, "auto" if omitted
+        output_format (str): One of FORMATS
+        engine (str): The parser engine
+
+    Returns:
+        dict: {"lines", "errors", "bytes", "elapsed", "throughput"} statistics
+    """
+    if numeric is None:
+        numeric = NumericMode()
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            ranges = []
+        else:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                ranges = split_ranges(data, chunk_bytes)
+
+    lines = errors = 0
+    if workers == 1 or len(ranges) <= 1:
+        for start, end in ranges:
+            block, count, failed = evaluate_range(path, start, end, numeric, output_format, engine)
+            output.write(block)
+            lines += count
+            errors += failed
+    else:
+        workers = min(workers, len(ranges))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            def submit(span):
+                return pool.submit(evaluate_range, path, span[0], span[1], numeric, output_format, engine)
+
+            pending = deque(submit(span) for span in ranges[:2 * workers])
+            waiting = iter(ranges[2 * workers:])
+            while pending:
+                block, count, failed = pending.popleft().result()
+                output.write(block)
+                lines += count
+                errors += failed
+                span = next(waiting, None)
+                if span is not None:
+                    pending.append(submit(span))
+
+    elapsed = time.perf_counter() - started
+    return {
+        "lines": lines,
+        "errors": errors,
+        "bytes": size,
+        "elapsed": elapsed,
+        "throughput": lines / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate a file of expressions, one per line, on every core")
+    parser.add_argument("input", help="File with one expression per line")
+    parser.add_argument("--output", default="-", metavar="FILE", help="Where to write results ('-' for stdout)")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson", help="Output format")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--chunk-mb", type=float, default=DEFAULT_CHUNK_BYTES / 2**20,
+                        help="Megabytes of input per work item")
+    parser.add_argument("--numeric-mode", choices=MODES, default=config.NUMERIC_MODE, help="Number type")
+    parser.add_argument("--precision", type=int, help="Significant digits in decimal mode")
+    parser.add_argument("--engine", choices=["iterative", "recursive"], default="iterative", help="Parser engine")
+    args = parser.parse_args(argv)
+
+    try:
+        numeric = NumericMode(args.numeric_mode, args.precision)
+    except ValueError as e:
+        parser.error(str(e))
+    chunk_bytes = max(1, int(args.chunk_mb * 2**20))
+
+    output = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        stats = evaluate_file(
+            args.input, output, args.workers or None, chunk_bytes, numeric, args.format, args.engine
+        )
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+        else:
+            output.flush()
+    print(
+        f"{stats['lines']} lines ({stats['bytes'] / 2**20:.1f} MB) in {stats['elapsed']:.2f}s "
+        f"({stats['throughput']:.0f}/s), {stats['errors']} errors",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
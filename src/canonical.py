@@ -0,0 +1,212 @@
+"""
+Canonical forms and fingerprints of compiled expressions.
+
+``2+3``, ``2 + 3``, ``(2+3)`` and ``3+2`` are different strings for the
+same computation. ``canonical_form`` writes a compiled tree back out with
+minimal parentheses and literals in one spelling per value, and with the
+operands of ``+`` and ``*`` in a fixed order. ``fingerprint`` hashes that
+form, together with the numeric mode, into a short key for caching and
+deduplication.
+
+Reordering never changes a result:
+
+- The two operands of a single ``+`` or ``*`` are swapped, which is exact
+  in every numeric mode: IEEE 754 and decimal addition and
+  multiplication are commutative, though not associative.
+- Chains such as ``a + b + c`` are flattened and all their operands
+  sorted only where arithmetic is exact. That is everywhere in "fraction"
+  mode, and in "auto" mode for subtrees of integer literals without
+  division.
+
+Only when an evaluation could fail in more than one place (e.g. an unbound
+variable and a division by zero) may equivalent spellings report different
+errors.
+
+Subtrees whose form grows beyond MAX_FORM_LENGTH are replaced by a digest
+of it, so the work stays linear in the size of the tree however deep it
+is.
+"""
+import hashlib
+from fractions import Fraction
+
+try:
+    from .expression_ast import MAX_RECURSIVE_DEPTH, BinaryOp, Negate, Variable
+except ImportError:
+    from expression_ast import MAX_RECURSIVE_DEPTH, BinaryOp, Negate, Variable
+
+# Longest subtree form kept as text; longer ones are replaced by "#" and a digest
+MAX_FORM_LENGTH = 64
+
+# Binding strength: operands bound more loosely than their operator need parentheses
+_PRECEDENCE = {"+": 1, "-": 1, "*": 2, "/": 2}
+_ATOM = 3
+
+_COMMUTATIVE = ("+", "*")
+
+# Which subtrees compute exactly: none, those of integer literals without division, or all
+_NONE, _INTEGERS, _ALL = range(3)
+
+
+def _digest(text, size=16):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=size).hexdigest()
+
+
+def _exactness(numeric):
+    name = numeric.name if numeric is not None else "float"
+    if name == "fraction":
+        return _ALL
+    return _INTEGERS if name == "auto" else _NONE
+
+
+# The form of a subtree is a tuple (text, binding strength, exact, chain):
+# whether the subtree computes exactly, and for an exact chain of "+" or
+# "*", its operator and the (text, binding strength) pairs of its operands.
+# A chain's text is None until it is needed, so that a long chain is sorted
+# and joined once rather than at every level.
+
+def _leaf(node, exactness):
+    if type(node) is Variable:
+        return node.name, _ATOM, exactness == _ALL, None
+    value = node.value
+    if type(value) is float:
+        return repr(value), _ATOM, False, None
+    if type(value) is Fraction and value.denominator != 1:
+        return f"{value.numerator}/{value.denominator}", _PRECEDENCE["/"], True, None
+    if type(value) is Fraction:
+        value = value.numerator
+    return str(value), _ATOM, exactness == _ALL or (exactness == _INTEGERS and type(value) is int), None
+
+
+def _text(form):
+    """The (text, binding strength) of a form, joining a chain's sorted operands if needed."""
+    text = form[0]
+    if text is None:
+        op, terms = form[3]
+        strength = form[1]
+        # Exact, so any order and grouping gives the same result
+        terms.sort()
+        text = op.join(f"({term[0]})" if term[1] <= strength else term[0] for term in terms)
+        if len(text) > MAX_FORM_LENGTH:
+            return "#" + _digest(text), _ATOM
+        return text, strength
+    return text, form[1]
+
+
+def _negate(operand):
+    text, strength = _text(operand)
+    text = f"-({text})" if strength < _ATOM else "-" + text
+    if len(text) > MAX_FORM_LENGTH:
+        text = "#" + _digest(text)
+    return text, _ATOM, operand[2], None
+
+
+def _binary(op, left, right, exactness):
+    strength = _PRECEDENCE[op]
+    exact = exactness == _ALL or (left[2] and right[2] and op != "/")
+    if exact and op in _COMMUTATIVE:
+        parts = [
+            operand[3][1] if operand[3] is not None and operand[3][0] == op else [_text(operand)]
+            for operand in (left, right)
+        ]
+        # Grow the longer list, so a chain of n operands is merged in O(n) whichever way it leans
+        parts.sort(key=len)
+        parts[1].extend(parts[0])
+        return None, strength, True, (op, parts[1])
+
+    left, right = _text(left), _text(right)
+    if op in _COMMUTATIVE and right[0] < left[0]:
+        left, right = right, left
+    # Operators associate to the left, so a right operand of equal strength keeps its parentheses
+    text = (
+        (f"({left[0]})" if left[1] < strength else left[0])
+        + op
+        + (f"({right[0]})" if right[1] <= strength else right[0])
+    )
+    if len(text) > MAX_FORM_LENGTH:
+        return "#" + _digest(text), _ATOM, exact, None
+    return text, strength, exact, None
+
+
+def _recursive_form(node, exactness):
+    """The form of a shallow tree, one Python frame per level."""
+    node_type = type(node)
+    if node_type is BinaryOp:
+        return _binary(
+            node.op, _recursive_form(node.left, exactness), _recursive_form(node.right, exactness), exactness
+        )
+    if node_type is Negate:
+        return _negate(_recursive_form(node.operand, exactness))
+    return _leaf(node, exactness)
+
+
+def _iterative_form(root, exactness):
+    """The form of a tree of any depth, computed with an explicit stack."""
+    forms = []
+    # Each pending item is a node plus whether its operands' forms are already on `forms`
+    pending = [(root, False)]
+    while pending:
+        node, ready = pending.pop()
+        node_type = type(node)
+        if node_type is BinaryOp:
+            if ready:
+                right = forms.pop()
+                forms[-1] = _binary(node.op, forms[-1], right, exactness)
+            else:
+                pending.append((node, True))
+                pending.append((node.right, False))
+                pending.append((node.left, False))
+        elif node_type is Negate:
+            if ready:
+                forms[-1] = _negate(forms[-1])
+            else:
+                pending.append((node, True))
+                pending.append((node.operand, False))
+        else:
+            forms.append(_leaf(node, exactness))
+    return forms[0]
+
+
+def canonical_form(expression):
+    """
+    Get the canonical form of a compiled expression.
+
+    Args:
+        expression (CompiledExpression): The expression
+
+    Returns:
+        str: The canonical text, with subtrees longer than MAX_FORM_LENGTH
+            characters replaced by "#" and a digest of their form
+
+    Example:
+        >>> canonical_form(compile_expression("((3 + 2)) * x"))
+        '(2.0+3.0)*x'
+        >>> canonical_form(compile_expression("c + b + a"))
+        'a+(b+c)'
+        >>> canonical_form(compile_expression("c + b + a", numeric=NumericMode("fraction")))
+        'a+b+c'
+    """
+    exactness = _exactness(expression.numeric)
+    if expression.depth is not None and expression.depth <= MAX_RECURSIVE_DEPTH:
+        form = _recursive_form(expression.root, exactness)
+    else:
+        form = _iterative_form(expression.root, exactness)
+    return _text(form)[0]
+
+
+def fingerprint(expression):
+    """
+    Get a stable, compact key for an expression and every equivalent spelling of it.
+
+    Args:
+        expression (CompiledExpression): The expression
+
+    Returns:
+        str: 32 hex digits of a BLAKE2b hash of the numeric mode and the
+            canonical form; the same in every process and Python version
+
+    Example:
+        >>> fingerprint(compile_expression("2 + 3")) == fingerprint(compile_expression("(3+2)"))
+        True
+    """
+    mode = expression.numeric.key if expression.numeric is not None else "float"
+    return _digest(f"{mode}\0{canonical_form(expression)}")
@@ -0,0 +1,200 @@
+"""
+Generate a Python function for an expression that is evaluated many times.
+
+The optimized program (see optimizer.py) is turned into the source of one
+straight-line function and compiled by CPython, so evaluation runs as
+native bytecode arithmetic instead of walking nodes. The source is built
+only from the four instruction kinds and fixed templates; the expression
+text never reaches it. Identifiers are embedded as string keys only after
+checking that they are plain names, and constants that are not small ints
+or finite floats are passed in through the function's globals. The
+function runs without builtins.
+"""
+import math
+import operator
+import re
+
+try:
+    from .expression_ast import CompiledExpression
+    from .optimizer import BINARY, CONSTANT, NEGATE, VARIABLE, OptimizedExpression, optimize
+except ImportError:
+    from expression_ast import CompiledExpression
+    from optimizer import BINARY, CONSTANT, NEGATE, VARIABLE, OptimizedExpression, optimize
+
+_SYMBOLS = {
+    operator.add: "+",
+    operator.sub: "-",
+    operator.mul: "*",
+    operator.truediv: "/",
+}
+
+_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+# Deepest subexpression written inline; deeper values go through a local
+# variable so CPython's parser and compiler never recurse deeply
+MAX_INLINE_DEPTH = 50
+
+
+class CodeExpression(OptimizedExpression):
+    """
+    An optimized expression with a generated Python function for evaluation.
+
+    It has the same ``source``, ``variables``, ``program`` and statistics as
+    the OptimizedExpression it was generated from, so it can be used
+    anywhere one is. If the function raises, the expression is evaluated
+    again in its original form so that errors are exactly the ones that
+    form raises.
+
+    Attributes:
+        code (str): The generated source
+        numeric (NumericMode or None): The numeric mode of the original expression
+        fallback (CompiledExpression or OptimizedExpression): The original
+            form, used to report errors
+    """
+
+    __slots__ = ("code", "numeric", "fallback", "_function")
+
+    def __init__(self, optimized, code, function, numeric, fallback):
+        super().__init__(
+            optimized.source, optimized.variables, optimized.program, optimized.nodes_before, optimized.folded
+        )
+        object.__setattr__(self, "code", code)
+        object.__setattr__(self, "numeric", numeric)
+        object.__setattr__(self, "fallback", fallback)
+        object.__setattr__(self, "_function", function)
+
+    def evaluate(self, variables=None):
+        """
+        Evaluate the expression by calling the generated function.
+
+        Args:
+            variables (Mapping[str, float], optional): Values for the variables in the expression
+
+        Returns:
+            float: The result of evaluating the expression, or an int,
+                Fraction or Decimal depending on the numeric mode
+
+        Raises:
+            ValueError: If a variable in the expression has no value
+            ZeroDivisionError: If division by zero is attempted
+        """
+        if variables is None:
+            variables = {}
+        numeric = self.numeric
+        try:
+            if numeric is not None and numeric.exact:
+                with numeric.scope():
+                    return self._function(numeric.bind(variables))
+            return self._function(variables)
+        except (LookupError, ArithmeticError):
+            return self.fallback.evaluate(variables)
+
+    def __reduce__(self):
+        # Functions do not pickle, so the receiving side generates its own
+        return (generate, (self.fallback,))
+
+    def __repr__(self):
+        return f"CodeExpression({self.source!r}, nodes={self.nodes_after})"
+
+
+def generate(expression, max_nodes=None):
+    """
+    Compile an expression to a Python function.
+
+    A CompiledExpression is optimized first, under its numeric mode's
+    arithmetic context so that constants fold exactly as they would evaluate.
+
+    Args:
+        expression (CompiledExpression or OptimizedExpression): The expression
+        max_nodes (int, optional): Refuse programs with more instructions
+            than this, since compiling them costs more than it saves
+
+    Returns:
+        CodeExpression: The expression with its generated function
+
+    Raises:
+        ValueError: If the program has more than max_nodes instructions
+
+    Example:
+        >>> generated = generate(compile_expression("x * (1.5 + 2.25) + x * y"))
+        >>> print(generated.code)
+        def evaluate(v):
+            t0 = v['x']
+            return ((t0 * 3.75) + (t0 * v['y']))
+        >>> generated.evaluate({"x": 2.0, "y": 0.5})
+        8.5
+    """
+    numeric = getattr(expression, "numeric", None)
+    if isinstance(expression, CompiledExpression):
+        if numeric is not None:
+            with numeric.scope():
+                optimized = optimize(expression)
+        else:
+            optimized = optimize(expression)
+    else:
+        optimized = expression
+        expression = getattr(expression, "fallback", expression)
+    if max_nodes is not None and optimized.nodes_after > max_nodes:
+        raise ValueError(
+            f"Expression has {optimized.nodes_after} unique nodes, more than the {max_nodes} compiled to code"
+        )
+
+    code, namespace = _source(optimized.program)
+    exec(compile(code, "<expression>", "exec"), namespace)
+    return CodeExpression(optimized, code, namespace["evaluate"], numeric, expression)
+
+
+def _literal(value):
+    """The source of a constant, or None if it has to be passed in as a global."""
+    if type(value) is int and value.bit_length() <= 64:
+        return repr(value) if value >= 0 else f"({value!r})"
+    if type(value) is float and math.isfinite(value):
+        return repr(value) if math.copysign(1.0, value) > 0 else f"({value!r})"
+    return None
+
+
+def _source(program):
+    uses = [0] * len(program)
+    for kind, a, b, _ in program:
+        if kind == BINARY:
+            uses[a] += 1
+            uses[b] += 1
+        elif kind == NEGATE:
+            uses[a] += 1
+
+    namespace = {"__builtins__": {}}
+    lines = ["def evaluate(v):"]
+    # Source and nesting depth of each slot's value
+    sources = []
+    depths = []
+    for slot, (kind, a, b, func) in enumerate(program):
+        if kind == CONSTANT:
+            source = _literal(a)
+            if source is None:
+                source = f"c{slot}"
+                namespace[source] = a
+            depth = 0
+        elif kind == VARIABLE:
+            if not _NAME.fullmatch(a):
+                raise ValueError(f"Invalid variable name: {a!r}")
+            source = f"v[{a!r}]"
+            depth = 0
+        elif kind == NEGATE:
+            source = f"(-{sources[a]})"
+            depth = depths[a] + 1
+        elif kind == BINARY:
+            source = f"({sources[a]} {_SYMBOLS[func]} {sources[b]})"
+            depth = max(depths[a], depths[b]) + 1
+        else:
+            raise TypeError(f"Unsupported instruction kind: {kind}")
+
+        shared = uses[slot] > 1 and kind != CONSTANT
+        if shared or depth >= MAX_INLINE_DEPTH:
+            lines.append(f"    t{slot} = {source}")
+            source = f"t{slot}"
+            depth = 0
+        sources.append(source)
+        depths.append(depth)
+
+    lines.append(f"    return {sources[-1]}")
+    return "\n".join(lines), namespace
@@ -0,0 +1,119 @@
+"""
+Runtime configuration for the expression API.
+
+Every setting can be overridden with an environment variable of the same
+name prefixed with ``EXPRESSION_``, e.g. ``EXPRESSION_CACHE_SIZE=10000``.
+"""
+import os
+
+
+def _env_int(name, default):
+    value = os.environ.get(f"EXPRESSION_{name}")
+    return int(value) if value else default
+
+
+def _env_str(name, default):
+    return os.environ.get(f"EXPRESSION_{name}") or default
+
+
+# Maximum number of normalized expressions kept in the in-process cache (0 disables it)
+CACHE_SIZE = _env_int("CACHE_SIZE", 4096)
+
+# Eviction policy for the in-process cache: "lru" or "fifo"
+CACHE_POLICY = _env_str("CACHE_POLICY", "lru")
+
+# Share cache entries between equivalent spellings of an expression, e.g. "2+3" and "(3 + 2)" (1 enables it);
+# fingerprinting costs more than evaluating, so it only pays off when many spellings repeat
+CANONICAL_CACHE = _env_int("CANONICAL_CACHE", 0)
+
+# Parser used by the API: "iterative" handles any nesting depth, "recursive" is the classic recursive descent
+PARSER_ENGINE = _env_str("PARSER_ENGINE", "iterative")
+
+# Maximum number of expressions accepted by POST /evaluate/batch
+MAX_BATCH_SIZE = _env_int("MAX_BATCH_SIZE", 1000)
+
+# Maximum number of rows accepted by POST /evaluate/vectorized
+MAX_VECTOR_ROWS = _env_int("MAX_VECTOR_ROWS", 5_000_000)
+
+# Longest line accepted by POST /evaluate/stream; longer lines get an error result
+MAX_STREAM_LINE_BYTES = _env_int("MAX_STREAM_LINE_BYTES", 64 * 1024)
+
+# Expressions a WebSocket connection may have in flight; the server stops reading its messages beyond that
+WS_MAX_IN_FLIGHT = _env_int("WS_MAX_IN_FLIGHT", 64)
+
+# Where evaluation runs: "inline" on the event loop, or in a "thread" or "process" pool
+EXECUTION_MODE = _env_str("EXECUTION_MODE", "thread")
+
+# Expressions up to this many characters are always evaluated inline
+INLINE_THRESHOLD = _env_int("INLINE_THRESHOLD", 1024)
+
+# Number of pool workers (0 means one per CPU)
+POOL_WORKERS = _env_int("POOL_WORKERS", 0)
+
+# Work items allowed to wait for a pool worker before requests are refused with 503
+POOL_QUEUE_SIZE = _env_int("POOL_QUEUE_SIZE", 64)
+
+# Seconds to wait for a pooled evaluation before answering 504
+EVALUATION_TIMEOUT = float(_env_str("EVALUATION_TIMEOUT", "5.0"))
+
+# Number type used unless a request asks for another: "auto" (exact int for integer-only
+# expressions, float otherwise), "float", "fraction" or "decimal"
+NUMERIC_MODE = _env_str("NUMERIC_MODE", "auto")
+
+# Significant digits in "decimal" mode when a request does not set a precision
+DECIMAL_PRECISION = _env_int("DECIMAL_PRECISION", 28)
+
+# Largest precision a request may ask for in "decimal" mode
+MAX_DECIMAL_PRECISION = _env_int("MAX_DECIMAL_PRECISION", 1000)
+
+# Evaluations with variables after which a cached expression is compiled to a Python function (0 disables it)
+CODEGEN_THRESHOLD = _env_int("CODEGEN_THRESHOLD", 16)
+
+# Largest optimized expression, in unique nodes, that is compiled to a Python function
+CODEGEN_MAX_NODES = _env_int("CODEGEN_MAX_NODES", 2000)
+
+# Longest expression accepted, in characters; longer ones are refused with 413 (0 disables the limit)
+MAX_EXPRESSION_LENGTH = _env_int("MAX_EXPRESSION_LENGTH", 1_000_000)
+
+# Most tokens an expression may have, estimated before parsing; more are refused with 413
+MAX_TOKENS = _env_int("MAX_TOKENS", 500_000)
+
+# Deepest parenthesis nesting accepted; deeper expressions are refused with 422
+MAX_NESTING_DEPTH = _env_int("MAX_NESTING_DEPTH", 10_000)
+
+# Most steps (node visits) evaluating one expression may take before it fails with 422 (0 disables the limit)
+MAX_EVALUATION_STEPS = _env_int("MAX_EVALUATION_STEPS", 2_000_000)
+
+# Seconds evaluating one expression may take before it fails with 422 (0 disables the limit)
+EVALUATION_BUDGET_SECONDS = float(_env_str("EVALUATION_BUDGET_SECONDS", "2.0"))
+
+# Profiles POST /evaluate may return when asked: "off", "timings" (phase timings and
+# expression statistics) or "cprofile" (timings, or also a cProfile profile)
+PROFILING = _env_str("PROFILING", "off")
+
+# Requests to /evaluate* processed at once; more wait in the admission queue (0 disables admission control)
+MAX_IN_FLIGHT = _env_int("MAX_IN_FLIGHT", 64)
+
+# Requests allowed to wait for a slot; beyond this they are refused with 503
+ADMISSION_QUEUE_SIZE = _env_int("ADMISSION_QUEUE_SIZE", 128)
+
+# Seconds a request may wait for a slot before it is refused with 503
+ADMISSION_QUEUE_TIMEOUT = float(_env_str("ADMISSION_QUEUE_TIMEOUT", "1.0"))
+
+# Retry-After, in seconds, sent with 503 responses from admission control
+ADMISSION_RETRY_AFTER = float(_env_str("ADMISSION_RETRY_AFTER", "1.0"))
+
+# Requests per second allowed per client, refused with 429 beyond it (0 disables rate limiting)
+RATE_LIMIT = float(_env_str("RATE_LIMIT", "0"))
+
+# Requests a client may send in a burst before the rate limit applies
+RATE_LIMIT_BURST = _env_int("RATE_LIMIT_BURST", 20)
+
+# Header identifying a client for rate limiting, e.g. X-API-Key; the client address is used if unset
+CLIENT_ID_HEADER = _env_str("CLIENT_ID_HEADER", "")
+
+# SQLite file for a result cache shared by all worker processes and kept across restarts (unset disables it)
+SHARED_CACHE_PATH = _env_str("SHARED_CACHE_PATH", "")
+
+# Entries kept in the shared cache, across all workers
+SHARED_CACHE_SIZE = _env_int("SHARED_CACHE_SIZE", 1_000_000)
@@ -0,0 +1,359 @@
+"""
+The dependency-free evaluator core.
+
+Everything here depends only on the standard library and the sibling lexer
+and parser modules, so command-line tools, tests and pool workers can
+import it in milliseconds. The web front ends (expression_api,
+streamlit_app and streamlit_expression) import their frameworks
+themselves and build on these classes.
+"""
+try:
+    from .expression_ast import ENGINES, compile_expression
+    from .lexer import END, LPAREN, MINUS, NUMBER, PLUS, RPAREN, SLASH, STAR, tokenize
+except ImportError:
+    from expression_ast import ENGINES, compile_expression
+    from lexer import END, LPAREN, MINUS, NUMBER, PLUS, RPAREN, SLASH, STAR, tokenize
+
+
+class ExpressionEvaluator:
+    """
+    A mathematical expression parser and evaluator that handles basic arithmetic operations.
+
+    This class implements a recursive descent parser to evaluate mathematical expressions
+    supporting the following features:
+    - Basic arithmetic operations (+, -, *, /)
+    - Parentheses for grouping
+    - Negative numbers
+    - Decimal numbers
+
+    The expression is split into tokens up front by the shared lexer; the
+    parser then walks the token buffers.
+
+    Attributes:
+        pos (int): Index of the current token
+        expression (str): The mathematical expression being evaluated
+        tokens (Tokens): The token buffers for the expression
+    """
+
+    def __init__(self):
+        self.pos = 0
+        self.expression = ""
+        self.tokens = None
+    
+    def parse_expression(self, expression):
+        """
+        Parse and evaluate a mathematical expression string.
+
+        Args:
+            expression (str): The mathematical expression to evaluate
+
+        Returns:
+            float: The result of evaluating the expression
+
+        Raises:
+            ValueError: If the expression is malformed or contains invalid characters
+        """
+        self.expression = expression
+        self.tokens = tokenize(expression)
+        self.pos = 0
+        result = self.parse_addition_subtraction()
+        if self.get_current_token() != END:
+            raise ValueError(f"Unexpected token: {self.tokens.text_of(self.pos)}")
+        return result
+    
+    def get_current_token(self):
+        """
+        Get the kind of the current token.
+
+        Returns:
+            int: The lexer token kind at the current position, END if at end
+        """
+        return self.tokens.kinds[self.pos]
+    
+    def parse_addition_subtraction(self):
+        """
+        Parse and evaluate addition and subtraction operations.
+
+        This method handles the lowest precedence operations (+ and -).
+        It first evaluates higher precedence operations by calling parse_multiplication_division().
+
+        Returns:
+            float: The result of evaluating the addition/subtraction expression
+
+        Raises:
+            ValueError: If the expression is malformed
+        """
+        left = self.parse_multiplication_division()
+        
+        while self.get_current_token() in (PLUS, MINUS):
+            operator = self.get_current_token()
+            self.pos += 1
+            right = self.parse_multiplication_division()
+            
+            if operator == PLUS:
+                left += right
+            else:  # operator == MINUS
+                left -= right
+                
+        return left
+    
+    def parse_multiplication_division(self):
+        """
+        Parse and evaluate multiplication and division operations.
+
+        This method handles the higher precedence operations (* and /).
+        It first evaluates parentheses and numbers by calling parse_number_or_parentheses().
+
+        Returns:
+            float: The result of evaluating the multiplication/division expression
+
+        Raises:
+            ValueError: If the expression is malformed
+            ZeroDivisionError: If division by zero is attempted
+        """
+        left = self.parse_number_or_parentheses()
+        
+        while self.get_current_token() in (STAR, SLASH):
+            operator = self.get_current_token()
+            self.pos += 1
+            right = self.parse_number_or_parentheses()
+            
+            if operator == STAR:
+                left *= right
+            else:  # operator == SLASH
+                left /= right
+                
+        return left
+    
+    def parse_number_or_parentheses(self):
+        """
+        Parse a number or an expression inside parentheses.
+
+        This method handles:
+        - Parenthesized expressions: (expression)
+        - Numbers: both integers and floating-point
+
+        Returns:
+            float: The parsed number or result of the parenthesized expression
+
+        Raises:
+            ValueError: If there's a missing closing parenthesis or invalid number format
+        """
+        # Handle parentheses
+        if self.get_current_token() == LPAREN:
+            self.pos += 1
+            result = self.parse_addition_subtraction()
+            
+            # Ensure closing parenthesis
+            if self.get_current_token() == RPAREN:
+                self.pos += 1
+                return result
+            else:
+                raise ValueError("Missing closing parenthesis")
+        
+        # Handle numbers (integers and floats)
+        else:
+            return self.parse_number()
+    
+    def parse_number(self):
+        """
+        Parse a number from the expression.
+
+        Handles:
+        - Integer numbers
+        - Floating-point numbers
+        - Negative numbers
+        - Leading minus sign
+
+        Returns:
+            float: The parsed number value
+
+        Raises:
+            ValueError: If no number is found
+        """
+        sign = 1.0
+        
+        # Handle negative numbers
+        if self.get_current_token() == MINUS:
+            sign = -1.0
+            self.pos += 1
+        
+        if self.get_current_token() != NUMBER:
+            raise ValueError("Expected number")
+        
+        # The lexer has already converted the literal
+        value = self.tokens.values[self.pos]
+        self.pos += 1
+        return sign * value
+
+    def _check_parentheses_balance(self, expression):
+        """
+        Check if parentheses in the expression are properly balanced.
+
+        Args:
+            expression (str): The mathematical expression to check
+
+        Returns:
+            bool: True if parentheses are balanced, False otherwise
+
+        Example:
+            >>> _check_parentheses_balance("(2 + 3) * (4 - 1)")
+            True
+            >>> _check_parentheses_balance("(2 + 3)) * (4 - 1)")
+            False
+        """
+
+
+class EngineEvaluator:
+    """
+    A mathematical expression parser and evaluator with a selectable parser engine.
+
+    This is the evaluator behind the Streamlit front end. Unlike
+    ExpressionEvaluator it checks parentheses before parsing and reports
+    division by zero as a ValueError.
+
+    This class implements a recursive descent parser to evaluate mathematical expressions
+    supporting the following features:
+    - Basic arithmetic operations (+, -, *, /)
+    - Parentheses for grouping
+    - Negative numbers
+    - Decimal numbers
+
+    With engine="iterative" the expression is instead compiled by the
+    shunting-yard parser in expression_ast, which handles arbitrarily deep
+    nesting without recursion.
+
+    Attributes:
+        pos (int): Index of the next token
+        expression (str): The mathematical expression being evaluated
+        tokens (Tokens): The token buffers produced by the shared lexer
+        engine (str): "recursive" or "iterative"
+    """
+
+    def __init__(self, engine="recursive"):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown parser engine: {engine}")
+        self.pos = 0
+        self.expression = ""
+        self.tokens = None
+        self.engine = engine
+        
+    def get_next_token(self):
+        kind = self.tokens.kinds[self.pos]
+        self.pos += 1
+        
+        if kind == END:
+            return None
+            
+        if kind == NUMBER:
+            return self.tokens.values[self.pos - 1]
+            
+        return self.tokens.text_of(self.pos - 1)
+        
+    def parse_expression(self, expression):
+        """
+        Parse and evaluate a mathematical expression string.
+
+        Args:
+            expression (str): The mathematical expression to evaluate
+
+        Returns:
+            float: The result of evaluating the expression
+
+        Raises:
+            ValueError: If the expression is malformed, contains invalid
+                characters or divides by zero
+        """
+        if self.engine == "iterative":
+            try:
+                return compile_expression(expression, engine="iterative").evaluate()
+            except ZeroDivisionError:
+                # Reported like the recursive engine does
+                raise ValueError("Division by zero") from None
+
+        self.expression = expression
+        self.tokens = tokenize(expression)
+        self.pos = 0
+        
+        # Add this validation before processing the expression
+        if not self._check_parentheses_balance(expression):
+            raise ValueError("Mismatched parentheses in expression")
+        
+        return self.parse_addition()
+        
+    def parse_addition(self):
+        result = self.parse_multiplication()
+        
+        while True:
+            token = self.get_next_token()
+            if token not in ('+', '-'):
+                self.pos -= 1
+                break
+                
+            right = self.parse_multiplication()
+            if token == '+':
+                result += right
+            else:
+                result -= right
+                
+        return result
+        
+    def parse_multiplication(self):
+        result = self.parse_parentheses()
+        
+        while True:
+            token = self.get_next_token()
+            if token not in ('*', '/'):
+                self.pos -= 1
+                break
+                
+            right = self.parse_parentheses()
+            if token == '*':
+                result *= right
+            else:
+                if right == 0:
+                    raise ValueError("Division by zero")
+                result /= right
+                
+        return result
+        
+    def parse_parentheses(self):
+        token = self.get_next_token()
+        
+        if token == '(':
+            result = self.parse_addition()
+            if self.get_next_token() != ')':
+                raise ValueError("Missing closing parenthesis")
+            return result
+        elif token == '-':
+            return -self.parse_parentheses()
+        elif isinstance(token, (int, float)):
+            return token
+        else:
+            raise ValueError(f"Unexpected token: {token}")
+
+    def _check_parentheses_balance(self, expression):
+        """
+        Check if parentheses in the expression are properly balanced.
+
+        Args:
+            expression (str): The mathematical expression to check
+
+        Returns:
+            bool: True if parentheses are balanced, False otherwise
+
+        Example:
+            >>> _check_parentheses_balance("(2 + 3) * (4 - 1)")
+            True
+            >>> _check_parentheses_balance("(2 + 3)) * (4 - 1)")
+            False
+        """
+        stack = []
+        for char in expression:
+            if char == '(':
+                stack.append(char)
+            elif char == ')':
+                if not stack:  # No matching opening parenthesis
+                    return False
+                stack.pop()
+        return len(stack) == 0  # Should be empty if all parentheses are matched
@@ -0,0 +1,128 @@
+"""
+Run CPU-bound evaluation work off the event loop.
+"""
+import asyncio
+import os
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when the executor's queue is full and new work is refused."""
+
+
+class EvaluationTimeoutError(TimeoutError):
+    """Raised when a piece of work does not finish within the executor's timeout."""
+
+
+class EvaluationExecutor:
+    """
+    Decide where evaluation work runs and bound how much of it is queued.
+
+    Small expressions are cheap enough to evaluate directly on the event
+    loop; anything larger than ``inline_threshold`` characters is handed to
+    a thread or process pool so it cannot stall other requests. Process
+    pools give full isolation from the event loop; thread pools avoid the
+    pickling cost but still share the GIL with it.
+
+    Work that times out is no longer awaited, but Python cannot interrupt
+    a running thread or process, so it keeps its pool slot until it
+    finishes. It stays counted against the queue until then.
+
+    Attributes:
+        mode (str): "inline", "thread" or "process"
+        inline_threshold (int): Largest expression size (in characters) evaluated inline
+        max_workers (int): Number of pool workers
+        max_queue (int): Work items allowed to wait for a worker
+        timeout (float): Seconds to wait for pooled work before giving up
+    """
+
+    MODES = ("inline", "thread", "process")
+
+    def __init__(self, mode="thread", inline_threshold=1024, max_workers=None, max_queue=64, timeout=5.0):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown execution mode: {mode}")
+        self.mode = mode
+        self.inline_threshold = inline_threshold
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._pool = None
+        self._pending = 0
+
+    def inline(self, size):
+        """
+        Tell whether work of a given size runs directly on the caller's thread.
+
+        Args:
+            size (int): Size of the expression, in characters
+
+        Returns:
+            bool: True if run() would call the function inline
+        """
+        return self.mode == "inline" or size <= self.inline_threshold
+
+    @property
+    def pending(self):
+        """int: Work items submitted to the pool that have not finished yet."""
+        return self._pending
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.mode == "thread":
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="evaluator")
+            else:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    async def run(self, size, func, *args):
+        """
+        Run ``func(*args)`` inline or in the pool, depending on ``size``.
+
+        Args:
+            size (int): Size of the expression being evaluated, in characters
+            func (Callable): The work to run; must be picklable in process mode
+            *args: Arguments for func
+
+        Returns:
+            The return value of func
+
+        Raises:
+            ExecutorBusyError: If the pool already has max_workers + max_queue items pending
+            EvaluationTimeoutError: If pooled work takes longer than timeout seconds
+        """
+        if self.inline(size):
+            return func(*args)
+
+        if self._pending >= self.max_workers + self.max_queue:
+            raise ExecutorBusyError("Evaluation queue is full")
+
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._get_pool().submit(func, *args)
+        except BrokenExecutor:
+            # A crashed process pool cannot be reused; start a fresh one next time
+            self._pool = None
+            raise
+        self._pending += 1
+        future.add_done_callback(lambda _: self._finished(loop))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise EvaluationTimeoutError(f"Evaluation exceeded {self.timeout} seconds") from None
+
+    def _finished(self, loop):
+        # Runs in the worker thread (or the pool's management thread); hand
+        # the bookkeeping back to the event loop unless it has gone away
+        try:
+            loop.call_soon_threadsafe(self._decrement_pending)
+        except RuntimeError:
+            self._decrement_pending()
+
+    def _decrement_pending(self):
+        self._pending -= 1
+
+    def shutdown(self):
+        """Stop the pool without waiting for running work."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
@@ -1,230 +1,823 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-
-class ExpressionEvaluator:
-    """
-    A mathematical expression parser and evaluator that handles basic arithmetic operations.
-
-    This class implements a recursive descent parser to evaluate mathematical expressions
-    supporting the following features:
-    - Basic arithmetic operations (+, -, *, /)
-    - Parentheses for grouping
-    - Negative numbers
-    - Decimal numbers
-
-    Attributes:
-        pos (int): Current position in the expression string
-        expression (str): The mathematical expression being evaluated
-    """
-
-    def __init__(self):
-        self.pos = 0
-        self.expression = ""
-    
-    def parse_expression(self, expression):
-        """
-        Parse and evaluate a mathematical expression string.
-
-        Args:
-            expression (str): The mathematical expression to evaluate
-
-        Returns:
-            float: The result of evaluating the expression
-
-        Raises:
-            ValueError: If the expression is malformed or contains invalid characters
-        """
-        self.expression = expression.replace(" ", "")  # Remove spaces
-        self.pos = 0
-        return self.parse_addition_subtraction()
-    
-    def get_current_char(self):
-        """
-        Get the current character in the expression.
-
-        Returns:
-            str or None: The current character at the current position, or None if at end
-        """
-        if self.pos < len(self.expression):
-            return self.expression[self.pos]
-        return None
-    
-    def parse_addition_subtraction(self):
-        """
-        Parse and evaluate addition and subtraction operations.
-
-        This method handles the lowest precedence operations (+ and -).
-        It first evaluates higher precedence operations by calling parse_multiplication_division().
-
-        Returns:
-            float: The result of evaluating the addition/subtraction expression
-
-        Raises:
-            ValueError: If the expression is malformed
-        """
-        left = self.parse_multiplication_division()
-        
-        while self.get_current_char() in ['+', '-']:
-            operator = self.get_current_char()
-            self.pos += 1
-            right = self.parse_multiplication_division()
-            
-            if operator == '+':
-                left += right
-            else:  # operator == '-'
-                left -= right
-                
-        return left
-    
-    def parse_multiplication_division(self):
-        """
-        Parse and evaluate multiplication and division operations.
-
-        This method handles the higher precedence operations (* and /).
-        It first evaluates parentheses and numbers by calling parse_number_or_parentheses().
-
-        Returns:
-            float: The result of evaluating the multiplication/division expression
-
-        Raises:
-            ValueError: If the expression is malformed
-            ZeroDivisionError: If division by zero is attempted
-        """
-        left = self.parse_number_or_parentheses()
-        
-        while self.get_current_char() in ['*', '/']:
-            operator = self.get_current_char()
-            self.pos += 1
-            right = self.parse_number_or_parentheses()
-            
-            if operator == '*':
-                left *= right
-            else:  # operator == '/'
-                left /= right
-                
-        return left
-    
-    def parse_number_or_parentheses(self):
-        """
-        Parse a number or an expression inside parentheses.
-
-        This method handles:
-        - Parenthesized expressions: (expression)
-        - Numbers: both integers and floating-point
-
-        Returns:
-            float: The parsed number or result of the parenthesized expression
-
-        Raises:
-            ValueError: If there's a missing closing parenthesis or invalid number format
-        """
-        char = self.get_current_char()
-        
-        # Handle parentheses
-        if char == '(':
-            self.pos += 1
-            result = self.parse_addition_subtraction()
-            
-            # Ensure closing parenthesis
-            if self.get_current_char() == ')':
-                self.pos += 1
-                return result
-            else:
-                raise ValueError("Missing closing parenthesis")
-        
-        # Handle numbers (integers and floats)
-        else:
-            return self.parse_number()
-    
-    def parse_number(self):
-        """
-        Parse a number from the expression.
-
-        Handles:
-        - Integer numbers
-        - Floating-point numbers
-        - Negative numbers
-        - Leading minus sign
-
-        Returns:
-            float: The parsed number value
-
-        Raises:
-            ValueError: If the number format is invalid or no number is found
-        """
-        start_pos = self.pos
-        
-        # Handle negative numbers
-        if self.get_current_char() == '-':
-            self.pos += 1
-        
-        # Parse digits before decimal point
-        while self.get_current_char() and self.get_current_char().isdigit():
-            self.pos += 1
-        
-        # Parse decimal point and digits after it
-        if self.get_current_char() == '.':
-            self.pos += 1
-            if not self.get_current_char() or not self.get_current_char().isdigit():
-                raise ValueError("Invalid number format")
-            
-            while self.get_current_char() and self.get_current_char().isdigit():
-                self.pos += 1
-        
-        if self.pos == start_pos:
-            raise ValueError("Expected number")
-        
-        # Convert the substring to a number
-        return float(self.expression[start_pos:self.pos])
-
-    def _check_parentheses_balance(self, expression):
-        """
-        Check if parentheses in the expression are properly balanced.
-
-        Args:
-            expression (str): The mathematical expression to check
-
-        Returns:
-            bool: True if parentheses are balanced, False otherwise
-
-        Example:
-            >>> _check_parentheses_balance("(2 + 3) * (4 - 1)")
-            True
-            >>> _check_parentheses_balance("(2 + 3)) * (4 - 1)")
-            False
-        """
-
-app = FastAPI()
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Dict, List, Literal, Optional, Union
+
+from fastapi import FastAPI, HTTPException, Request, WebSocket
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, ValidationError
+
+from . import config
+from .admission import (
+    AdmissionController, AdmissionMiddleware, OverloadedError, RateLimiter, client_identity, retry_after_seconds,
+)
+from .codegen import generate
+from .evaluator import ExpressionEvaluator  # noqa: F401 (re-exported for existing imports)
+from .execution import EvaluationExecutor, EvaluationTimeoutError, ExecutorBusyError
+from .expression_ast import compile_expression, normalize_expression
+from .expression_cache import ExpressionCache, build_entry
+from .limits import EvaluationBudget, LimitExceededError, check_expression, estimate_cost
+from .metrics import LATENCY_BUCKETS, SIZE_BUCKETS, PhaseTimingMiddleware, Registry
+from .numeric import NumericMode, format_number
+from .profiling import profile_expression
+from .serialization import decode_frame, encode_frame, encode_json, read_model, request_body, respond
+from .shared_cache import SharedCache
+from .streaming import BodyStreamingResponse, ndjson_results
+from .vectorized import evaluate_vectorized
+
+expression_cache = ExpressionCache(maxsize=config.CACHE_SIZE, policy=config.CACHE_POLICY)
+
+# Fingerprint -> entry, so that equivalent spellings share one entry (see canonical.py)
+fingerprint_index = ExpressionCache(maxsize=config.CACHE_SIZE, policy=config.CACHE_POLICY)
+
+# Second tier behind expression_cache, shared by every worker process on the host
+shared_cache = SharedCache(config.SHARED_CACHE_PATH, config.SHARED_CACHE_SIZE) if config.SHARED_CACHE_PATH else None
+
+executor = EvaluationExecutor(
+    mode=config.EXECUTION_MODE,
+    inline_threshold=config.INLINE_THRESHOLD,
+    max_workers=config.POOL_WORKERS,
+    max_queue=config.POOL_QUEUE_SIZE,
+    timeout=config.EVALUATION_TIMEOUT,
+)
+
+admission = AdmissionController(
+    max_in_flight=config.MAX_IN_FLIGHT,
+    max_queue=config.ADMISSION_QUEUE_SIZE,
+    queue_timeout=config.ADMISSION_QUEUE_TIMEOUT,
+)
+rate_limiter = RateLimiter(config.RATE_LIMIT, config.RATE_LIMIT_BURST) if config.RATE_LIMIT else None
+# Header identifying a client to the rate limiter, as it appears in an ASGI scope
+client_header = config.CLIENT_ID_HEADER.lower().encode("latin-1") if config.CLIENT_ID_HEADER else None
+
+@asynccontextmanager
+async def lifespan(app):
+    if shared_cache is not None:
+        # Start with the entries other workers, or this one before a restart, used most recently
+        for key, entry in shared_cache.recent(config.CACHE_SIZE):
+            expression_cache.put(key, entry)
+    yield
+    executor.shutdown()
+    if shared_cache is not None:
+        shared_cache.close()
+
+metrics = Registry()
+phase_seconds = metrics.histogram(
+    "expression_phase_seconds",
+    "Time spent in each phase of handling an expression",
+    LATENCY_BUCKETS,
+    labelnames=("phase",),
+)
+evaluations_total = metrics.counter(
+    "expression_evaluations_total",
+    "Expressions evaluated, by outcome",
+    labelnames=("outcome",),
+)
+expression_size = metrics.histogram(
+    "expression_size_characters",
+    "Length of evaluated expressions",
+    SIZE_BUCKETS,
+)
+codegen_total = metrics.counter(
+    "expression_codegen_total",
+    "Cached expressions compiled to Python functions after being evaluated often",
+)
+canonical_matches_total = metrics.counter(
+    "expression_canonical_matches_total",
+    "Cache misses answered by the entry of an equivalent spelling of the expression",
+)
+shared_cache_total = metrics.counter(
+    "expression_shared_cache_lookups_total",
+    "Lookups in the shared cache after a miss in the in-process cache, by outcome",
+    labelnames=("outcome",),
+)
+shed_total = metrics.counter(
+    "expression_requests_shed_total",
+    "Requests refused by admission control, by reason",
+    labelnames=("reason",),
+)
+metrics.gauge("expression_admission_in_flight", "Requests holding an admission slot", lambda: admission.in_flight)
+metrics.gauge("expression_admission_queue_depth", "Requests waiting for an admission slot", lambda: admission.queued)
+metrics.gauge("expression_cache_entries", "Entries in the expression cache", lambda: len(expression_cache))
+metrics.gauge("expression_pool_pending", "Work items submitted to the evaluation pool", lambda: executor.pending)
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(PhaseTimingMiddleware, phases=phase_seconds)
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=admission,
+    limiter=rate_limiter,
+    shed=shed_total,
+    phases=phase_seconds,
+    client_header=config.CLIENT_ID_HEADER or None,
+    retry_after=config.ADMISSION_RETRY_AFTER,
+)
 
 class ExpressionRequest(BaseModel):
     expression: str
+    variables: Optional[Dict[str, float]] = None
+    numeric_mode: Optional[str] = None
+    precision: Optional[int] = None
+    # Evaluate from scratch and report where the time went (see EXPRESSION_PROFILING)
+    profile: Optional[Literal["timings", "cprofile"]] = None
+
+class BatchRequest(BaseModel):
+    expressions: List[str]
+    numeric_mode: Optional[str] = None
+    precision: Optional[int] = None
+
+class SocketRequest(ExpressionRequest):
+    # Echoed in the reply, which may arrive after replies to later messages
+    id: Union[int, str, None] = None
+
+class VectorizedRequest(BaseModel):
+    expression: str
+    columns: Dict[str, List[float]] = {}
+    division_by_zero: str = "null"
+
+# Beyond this nesting depth or token count, expressions are parsed by the
+# iterative engine even if the recursive one is configured; each level of
+# parentheses costs the recursive parser four Python frames, and long
+# chains make trees too deep to evaluate recursively
+RECURSIVE_ENGINE_MAX_DEPTH = 100
+RECURSIVE_ENGINE_MAX_TOKENS = 1000
+
+@lru_cache(maxsize=64)
+def _numeric_mode(name, precision):
+    return NumericMode(name, precision)
+
+def resolve_numeric(name=None, precision=None):
+    """
+    Get the numeric mode a request asked for, falling back to the configured defaults.
+
+    Args:
+        name (str, optional): The requested mode, EXPRESSION_NUMERIC_MODE if omitted
+        precision (int, optional): Significant digits for "decimal" mode,
+            EXPRESSION_DECIMAL_PRECISION if omitted
+
+    Returns:
+        NumericMode: The mode
+
+    Raises:
+        HTTPException: 400 status code if the mode is unknown or the precision
+            is invalid or above EXPRESSION_MAX_DECIMAL_PRECISION
+    """
+    name = name or config.NUMERIC_MODE
+    if name == "decimal" and precision is None:
+        precision = config.DECIMAL_PRECISION
+    if precision is not None and precision > config.MAX_DECIMAL_PRECISION:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Precision {precision} exceeds the maximum of {config.MAX_DECIMAL_PRECISION}",
+        )
+    try:
+        return _numeric_mode(name, precision)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def parser_engine(cost):
+    """
+    Choose the parser for an expression.
+
+    Args:
+        cost (ExpressionCost): The expression's estimated cost
+
+    Returns:
+        str: EXPRESSION_PARSER_ENGINE, or "iterative" if the expression is
+            too deep or long for the recursive engine
+    """
+    if cost.depth > RECURSIVE_ENGINE_MAX_DEPTH or cost.tokens > RECURSIVE_ENGINE_MAX_TOKENS:
+        return "iterative"
+    return config.PARSER_ENGINE
+
+def evaluation_budget():
+    """
+    Get a budget for evaluating one expression.
+
+    Returns:
+        EvaluationBudget or None: The configured limits, or None if there are none
+    """
+    if config.MAX_EVALUATION_STEPS or config.EVALUATION_BUDGET_SECONDS:
+        return EvaluationBudget(config.MAX_EVALUATION_STEPS, config.EVALUATION_BUDGET_SECONDS)
+    return None
+
+async def lookup_cached(expression, numeric):
+    """
+    Get the cache entry for an expression, compiling and evaluating it on a miss.
+
+    The expression's cost is estimated first, and expressions over the
+    configured limits are refused before any parsing. Both successful
+    results and errors are cached under the numeric mode and the
+    whitespace-normalized expression, so a malformed input sent repeatedly
+    is only parsed once. Misses in the in-process cache are looked up in
+    the shared cache, if one is configured, and misses in both are
+    evaluated through the executor, so large expressions do not block the
+    event loop, within the configured evaluation budget. Once parsed, an
+    expression equivalent to one already cached (e.g. "3+2" after "2 + 3")
+    shares that entry, including its optimized or generated code.
+
+    Args:
+        expression (str): The mathematical expression
+        numeric (NumericMode): The numeric mode to evaluate in
+
+    Returns:
+        CacheEntry: The compiled expression and its result or error
+
+    Raises:
+        LimitExceededError: If the expression or its evaluation exceeds a configured limit
+        ExecutorBusyError: If the evaluation pool is full
+        EvaluationTimeoutError: If evaluation takes longer than EXPRESSION_EVALUATION_TIMEOUT
+    """
+    cost = check_expression(
+        expression, config.MAX_EXPRESSION_LENGTH, config.MAX_TOKENS, config.MAX_NESTING_DEPTH
+    )
+    key = normalize_expression(expression)
+    cache_key = (numeric.key, key)
+    entry = expression_cache.get(cache_key)
+    if entry is None and shared_cache is not None:
+        entry = await shared_cache.lookup(numeric.key, key)
+        shared_cache_total.inc("miss" if entry is None else "hit")
+        if entry is not None:
+            expression_cache.put(cache_key, entry)
+    if entry is None:
+        engine = parser_engine(cost)
+        budget = evaluation_budget()
+        canonical = bool(config.CANONICAL_CACHE)
+        # The index can only be consulted before evaluating when the work stays on the event loop
+        known = fingerprint_index.peek if canonical and executor.inline(len(key)) else None
+        entry = await executor.run(len(key), build_entry, key, engine, numeric, budget, canonical, known)
+        for phase, seconds in entry.timings.items():
+            phase_seconds.observe(seconds, phase)
+        if entry.fingerprint is not None:
+            match = fingerprint_index.get(entry.fingerprint)
+            if match is None:
+                fingerprint_index.put(entry.fingerprint, entry)
+            else:
+                entry = match
+                canonical_matches_total.inc()
+        expression_cache.put(cache_key, entry)
+        if shared_cache is not None:
+            shared_cache.store(numeric.key, key, entry)
+    return entry
+
+async def evaluate_cached(expression, variables=None, numeric=None):
+    """
+    Evaluate an expression, reusing earlier parses and results when possible.
+
+    Args:
+        expression (str): The mathematical expression to evaluate
+        variables (Mapping[str, float], optional): Values for the variables in the expression
+        numeric (NumericMode, optional): The numeric mode, the configured default if omitted
+
+    Returns:
+        float, int, Fraction or Decimal: The result of evaluating the expression
+
+    Raises:
+        ValueError: If the expression is malformed or a variable has no value
+        ZeroDivisionError: If division by zero is attempted
+        ExecutorBusyError: If the evaluation pool is full
+        EvaluationTimeoutError: If evaluation takes longer than EXPRESSION_EVALUATION_TIMEOUT
+    """
+    if numeric is None:
+        numeric = resolve_numeric()
+    expression_size.observe(len(expression))
+    try:
+        entry = await lookup_cached(expression, numeric)
+        if variables is None or entry.compiled is None:
+            result = entry.unwrap()
+        else:
+            compiled = promote(entry)
+            start = time.perf_counter()
+            try:
+                result = await executor.run(len(compiled.source), compiled.evaluate, variables)
+            finally:
+                phase_seconds.observe(time.perf_counter() - start, "evaluate")
+    except Exception as e:
+        evaluations_total.inc(error_kind(e))
+        raise
+    evaluations_total.inc("ok")
+    return result
+
+def promote(entry):
+    """
+    Count an evaluation of a cached expression with variables, and replace
+    its compiled form with generated code once it has been evaluated
+    EXPRESSION_CODEGEN_THRESHOLD times.
+
+    Expressions larger than EXPRESSION_CODEGEN_MAX_NODES are left as they are,
+    and so are expressions evaluated in a process pool: generated code does
+    not pickle, so each evaluation would generate it again in the worker.
+
+    Args:
+        entry (CacheEntry): The entry about to be evaluated
+
+    Returns:
+        CompiledExpression, OptimizedExpression or CodeExpression: The form to evaluate
+    """
+    entry.uses += 1
+    pickled = executor.mode == "process" and not executor.inline(len(entry.compiled.source))
+    if entry.uses == config.CODEGEN_THRESHOLD and not pickled:
+        start = time.perf_counter()
+        try:
+            entry.compiled = generate(entry.compiled, config.CODEGEN_MAX_NODES)
+        except ValueError:
+            pass
+        else:
+            codegen_total.inc()
+            phase_seconds.observe(time.perf_counter() - start, "codegen")
+    return entry.compiled
+
+def format_result(result):
+    """
+    Prepare an evaluation result for the JSON response.
+
+    Args:
+        result (float, int, Fraction or Decimal): The evaluated result
+
+    Returns:
+        int, float or str: The result, as an int if it is a whole number,
+            or as a string if it is a Fraction or Decimal
+    """
+    return format_number(result)
+
+def error_kind(error):
+    """
+    Classify an evaluation error.
+
+    Args:
+        error (Exception): The error raised while evaluating
+
+    Returns:
+        str: "division_by_zero", "limit_exceeded", "timeout", "overloaded" or "invalid_expression"
+    """
+    if isinstance(error, ZeroDivisionError):
+        return "division_by_zero"
+    if isinstance(error, LimitExceededError):
+        return "limit_exceeded"
+    if isinstance(error, EvaluationTimeoutError):
+        return "timeout"
+    if isinstance(error, ExecutorBusyError):
+        return "overloaded"
+    return "invalid_expression"
+
+def error_object(error):
+    """
+    Describe an evaluation error for a per-item batch response.
+
+    Args:
+        error (Exception): The error raised while evaluating
+
+    Returns:
+        dict: type (see error_kind()) and detail
+    """
+    return {"type": error_kind(error), "detail": str(error)}
+
+def observe_validation(http_request):
+    """
+    Record the time from the request's arrival until its handler started.
+
+    This covers reading the body and validating it against the request model.
+
+    Args:
+        http_request (Request): The request being handled
+    """
+    start = getattr(http_request.state, "request_start", None)
+    if start is not None:
+        phase_seconds.observe(time.perf_counter() - start, "validate")
+
+def mark_handler_end(http_request):
+    """
+    Note that the handler is about to return, so PhaseTimingMiddleware can
+    time serialization of the response.
+
+    Args:
+        http_request (Request): The request being handled
+    """
+    http_request.state.handler_end = time.perf_counter()
+
+def http_error(error):
+    """
+    Map an evaluation error to an HTTP error response.
 
-@app.post("/evaluate")
-async def evaluate_expression_endpoint(request: ExpressionRequest):
+    Args:
+        error (Exception): The error raised while evaluating
+
+    Returns:
+        HTTPException: 413 or 422 naming the limit (also in the
+            X-Expression-Limit header) if a limit was exceeded, 503 if the
+            evaluation pool is full, 504 if evaluation timed out, 400 otherwise
+    """
+    if isinstance(error, LimitExceededError):
+        return HTTPException(
+            status_code=error.status_code, detail=str(error), headers={"X-Expression-Limit": error.limit}
+        )
+    if isinstance(error, ExecutorBusyError):
+        return HTTPException(status_code=503, detail=str(error))
+    if isinstance(error, EvaluationTimeoutError):
+        return HTTPException(status_code=504, detail=str(error))
+    return HTTPException(status_code=400, detail=str(error))
+
+async def evaluate_profiled(request, numeric, http_request):
+    """
+    Evaluate an expression from scratch and report where the time went.
+
+    Caches are bypassed and left untouched, so the expression is lexed,
+    parsed and evaluated exactly as on its first request. The time to
+    encode the response without the profile is measured as "serialize".
+
+    Args:
+        request (ExpressionRequest): The request, with profile set
+        numeric (NumericMode): The numeric mode
+        http_request (Request): The raw request
+
+    Returns:
+        Response: The usual response plus a "profile" object (see
+            profiling.profile_expression()); if evaluation fails, the
+            error's status code, with its message as "detail"
+
+    Raises:
+        HTTPException: 403 status code if EXPRESSION_PROFILING does not
+            allow the requested profile, or as for /evaluate if the
+            expression exceeds a limit or the evaluation pool is busy
+    """
+    allowed = {"timings": ("timings", "cprofile"), "cprofile": ("cprofile",)}[request.profile]
+    if config.PROFILING not in allowed:
+        raise HTTPException(
+            status_code=403, detail=f"Profile {request.profile!r} is not enabled (EXPRESSION_PROFILING)"
+        )
+    try:
+        cost = check_expression(
+            request.expression, config.MAX_EXPRESSION_LENGTH, config.MAX_TOKENS, config.MAX_NESTING_DEPTH
+        )
+        key = normalize_expression(request.expression)
+        result, error, profile = await executor.run(
+            len(key), profile_expression, key, request.variables, parser_engine(cost), numeric,
+            evaluation_budget(), request.profile == "cprofile",
+        )
+    except Exception as e:
+        raise http_error(e)
+    content = {"expression": request.expression}
+    if error is None:
+        try:
+            content["result"] = format_result(result)
+        except (ValueError, ArithmeticError) as e:
+            # Results with too many digits, or too large for a float, are refused
+            error = e
+    status_code = 200
+    if error is not None:
+        status_code = http_error(error).status_code
+        content["detail"] = str(error)
+    start = time.perf_counter()
+    encode_json(content)
+    profile["timings"]["serialize"] = time.perf_counter() - start
+    content["profile"] = profile
+    mark_handler_end(http_request)
+    return respond(http_request, content, status_code)
+
+async def evaluate_outcome(expression, numeric=None):
+    """
+    Evaluate an expression for a multi-expression response.
+
+    Args:
+        expression (str): The mathematical expression to evaluate
+        numeric (NumericMode, optional): The numeric mode, the configured default if omitted
+
+    Returns:
+        dict: {"result": ...} on success, {"error": {...}} on failure
+    """
+    try:
+        return {"result": format_result(await evaluate_cached(expression, numeric=numeric))}
+    except Exception as e:
+        return {"error": error_object(e)}
+
+@app.post("/evaluate", openapi_extra=request_body(ExpressionRequest))
+async def evaluate_expression_endpoint(http_request: Request):
     """
     Evaluate a mathematical expression via HTTP POST request.
 
     Args:
-        request (ExpressionRequest): Request body containing the expression to evaluate
+        http_request (Request): The request, whose JSON or MessagePack body
+            (an ExpressionRequest) contains the expression to evaluate,
+            optional variables, and optionally a numeric_mode ("auto",
+            "float", "fraction" or "decimal"), decimal precision and
+            profile ("timings" or "cprofile", see evaluate_profiled())
 
     Returns:
-        dict: JSON response containing:
+        Response: JSON, or MessagePack if the Accept header prefers it, containing:
             - expression: The original expression
-            - result: The evaluated result (int or float)
+            - result: The evaluated result (int or float, or a string in
+              the "fraction" and "decimal" modes)
 
     Raises:
-        HTTPException: 400 status code if expression is invalid or evaluation fails
+        HTTPException: 400 status code if expression is invalid or evaluation fails,
+            413 or 422 status code if it exceeds a configured limit,
+            403 status code if a profile was asked for but is not enabled
     """
+    request = await read_model(http_request, ExpressionRequest)
+    observe_validation(http_request)
+    numeric = resolve_numeric(request.numeric_mode, request.precision)
+    if request.profile is not None:
+        return await evaluate_profiled(request, numeric, http_request)
     try:
-        evaluator = ExpressionEvaluator()
-        result = evaluator.parse_expression(request.expression)
-        
-        # Convert to int if it's a whole number
-        if result == int(result):
-            result = int(result)
-            
-        return {"expression": request.expression, "result": result}
+        result = format_result(await evaluate_cached(request.expression, request.variables, numeric))
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise http_error(e)
+    mark_handler_end(http_request)
+    return respond(http_request, {"expression": request.expression, "result": result})
+
+@app.post("/evaluate/vectorized", openapi_extra=request_body(VectorizedRequest))
+async def evaluate_vectorized_endpoint(http_request: Request):
+    """
+    Evaluate one expression over columns of variable bindings.
+
+    Args:
+        http_request (Request): The request, whose JSON or MessagePack body
+            (a VectorizedRequest) contains:
+            - expression: The expression, e.g. "(a + b) * c"
+            - columns: One equally long list of values per variable
+            - division_by_zero: "null" to return null for rows that divide by
+              zero or overflow, or "error" to fail the request instead
+
+    Returns:
+        Response: JSON, or MessagePack if the Accept header prefers it, containing:
+            - expression: The original expression
+            - results: One result per row (null where the row has no finite value)
+
+    Raises:
+        HTTPException: 400 status code if the expression or columns are invalid,
+            413 status code if there are more than EXPRESSION_MAX_VECTOR_ROWS rows,
+            413 or 422 status code if the expression exceeds a configured limit
+    """
+    request = await read_model(http_request, VectorizedRequest)
+    observe_validation(http_request)
+    if request.division_by_zero not in ("null", "error"):
+        raise HTTPException(status_code=400, detail=f"Unknown division by zero policy: {request.division_by_zero}")
+    rows = max((len(column) for column in request.columns.values()), default=0)
+    if rows > config.MAX_VECTOR_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{rows} rows exceeds the maximum of {config.MAX_VECTOR_ROWS}",
+        )
+
+    try:
+        # NumPy evaluates in float64 whatever the configured numeric mode
+        numeric = resolve_numeric("float")
+        entry = await lookup_cached(request.expression, numeric)
+        if entry.compiled is None:
+            # Entries from the shared cache, or loaded from it at startup, only
+            # carry the outcome; malformed expressions fail to compile again
+            key = normalize_expression(request.expression)
+            entry.compiled = await executor.run(
+                len(key), compile_expression, key, parser_engine(estimate_cost(key)), None, numeric
+            )
+        policy = "error" if request.division_by_zero == "error" else "inf"
+        start = time.perf_counter()
+        values = evaluate_vectorized(entry.compiled, request.columns, division_by_zero=policy).values
+        phase_seconds.observe(time.perf_counter() - start, "evaluate")
+    except Exception as e:
+        raise http_error(e)
+
+    # The array is encoded directly, with rows without a finite value as null
+    mark_handler_end(http_request)
+    return respond(http_request, {"expression": request.expression, "results": values})
+
+@app.post("/evaluate/batch", openapi_extra=request_body(BatchRequest))
+async def evaluate_batch_endpoint(http_request: Request):
+    """
+    Evaluate a list of expressions in one request.
+
+    Results are returned in the same order as the input. An expression that
+    fails gets an error object in its slot instead of failing the batch.
+    Identical expressions (ignoring whitespace) are evaluated once.
+
+    Args:
+        http_request (Request): The request, whose JSON or MessagePack body
+            (a BatchRequest) contains the expressions to evaluate, and
+            optionally a numeric_mode and precision for all of them
+
+    Returns:
+        Response: JSON, or MessagePack if the Accept header prefers it, containing:
+            - results: One item per expression, each with the original
+              expression and either a result or an error object
+
+    Raises:
+        HTTPException: 400 status code if the numeric mode is invalid,
+            413 status code if the batch exceeds EXPRESSION_MAX_BATCH_SIZE
+            (given in the X-Max-Batch-Size header)
+    """
+    request = await read_model(http_request, BatchRequest)
+    observe_validation(http_request)
+    numeric = resolve_numeric(request.numeric_mode, request.precision)
+    if len(request.expressions) > config.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(request.expressions)} expressions exceeds the maximum of {config.MAX_BATCH_SIZE}",
+            headers={"X-Expression-Limit": "MAX_BATCH_SIZE", "X-Max-Batch-Size": str(config.MAX_BATCH_SIZE)},
+        )
+
+    outcomes = {}
+    results = []
+    for expression in request.expressions:
+        key = normalize_expression(expression)
+        outcome = outcomes.get(key)
+        if outcome is None:
+            outcome = outcomes[key] = await evaluate_outcome(expression, numeric)
+        results.append({"expression": expression, **outcome})
+    mark_handler_end(http_request)
+    return respond(http_request, {"results": results})
+
+@app.post("/evaluate/stream")
+async def evaluate_stream_endpoint(request: Request):
+    """
+    Evaluate newline-delimited expressions streamed in the request body.
 
- 
\ No newline at end of file
+    Results are streamed back as NDJSON while the body is still being read,
+    one object per non-blank input line:
+        {"line": 1, "expression": "2 + 2", "result": 4}
+        {"line": 2, "expression": "1 / 0", "error": {"type": "division_by_zero", "detail": "..."}}
+
+    The numeric mode can be chosen with the ``numeric_mode`` and
+    ``precision`` query parameters.
+
+    Args:
+        request (Request): The raw request; its body is one expression per line
+
+    Returns:
+        StreamingResponse: An application/x-ndjson stream of results
+
+    Raises:
+        HTTPException: 400 status code if the numeric mode is invalid
+    """
+    precision = request.query_params.get("precision")
+    try:
+        precision = int(precision) if precision is not None else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid precision: {precision}")
+    numeric = resolve_numeric(request.query_params.get("numeric_mode"), precision)
+
+    async def evaluate_line(expression):
+        return {"expression": expression, **(await evaluate_outcome(expression, numeric))}
+
+    return BodyStreamingResponse(
+        ndjson_results(request.stream(), evaluate_line, config.MAX_STREAM_LINE_BYTES),
+        media_type="application/x-ndjson",
+    )
+
+async def admit_message(client):
+    """
+    Apply the rate limit and admission control of HTTP requests to one WebSocket message.
+
+    Refusals are counted in expression_requests_shed_total, like refused requests.
+
+    Args:
+        client (str): The connection's client (see admission.client_identity())
+
+    Returns:
+        dict or None: None if the message was given an admission slot, which
+            the caller must release; otherwise an error object of type
+            "rate_limited" or "overloaded", with retry_after in seconds
+    """
+    if rate_limiter is not None:
+        wait = rate_limiter.check(client)
+        if wait:
+            shed_total.inc("rate_limited")
+            return {"type": "rate_limited", "detail": "Rate limit exceeded", "retry_after": retry_after_seconds(wait)}
+    start = time.perf_counter()
+    try:
+        await admission.acquire()
+    except OverloadedError as e:
+        shed_total.inc(e.reason)
+        return {
+            "type": "overloaded", "detail": str(e), "retry_after": retry_after_seconds(config.ADMISSION_RETRY_AFTER),
+        }
+    phase_seconds.observe(time.perf_counter() - start, "queue")
+    return None
+
+async def socket_reply(data):
+    """
+    Evaluate one WebSocket message.
+
+    Args:
+        data: The decoded message, a SocketRequest
+
+    Returns:
+        dict: id and expression, plus either a result or an error object;
+            a message that is not a valid SocketRequest gets an error of
+            type "invalid_request"
+    """
+    try:
+        request = SocketRequest.model_validate(data)
+        numeric = resolve_numeric(request.numeric_mode, request.precision)
+    except ValidationError as e:
+        tag = data.get("id") if isinstance(data, dict) else None
+        detail = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+        return {"id": tag, "error": {"type": "invalid_request", "detail": detail}}
+    except HTTPException as e:
+        return {"id": request.id, "error": {"type": "invalid_request", "detail": e.detail}}
+    if request.profile is not None:
+        detail = "Profiles are only returned by POST /evaluate"
+        return {"id": request.id, "error": {"type": "invalid_request", "detail": detail}}
+    reply = {"id": request.id, "expression": request.expression}
+    try:
+        reply["result"] = format_result(await evaluate_cached(request.expression, request.variables, numeric))
+    except Exception as e:
+        reply["error"] = error_object(e)
+    return reply
+
+@app.websocket("/ws")
+async def evaluate_socket_endpoint(websocket: WebSocket):
+    """
+    Evaluate expressions sent over one persistent WebSocket connection.
+
+    Each message is one expression, tagged with an id of the client's
+    choosing, as JSON in a text frame or MessagePack in a binary frame:
+        {"id": 1, "expression": "(a + b) * c", "variables": {"a": 1, "b": 2, "c": 3}}
+
+    Messages are evaluated concurrently and each is answered, in the same
+    format, as soon as it is done, so replies may arrive out of order:
+        {"id": 1, "expression": "(a + b) * c", "result": 9}
+        {"id": 2, "expression": "1 / 0", "error": {"type": "division_by_zero", "detail": "..."}}
+
+    Up to EXPRESSION_WS_MAX_IN_FLIGHT messages per connection are evaluated
+    at once; further messages are not read until a reply has been sent,
+    which propagates backpressure to the client. Each message is also
+    subject to the client's rate limit and takes an admission slot while it
+    is evaluated, as an HTTP request would (see admit_message()); refused
+    messages are answered with an error of type "rate_limited" or
+    "overloaded".
+
+    Args:
+        websocket (WebSocket): The connection
+    """
+    await websocket.accept()
+    client = client_identity(websocket.scope, client_header)
+    slots = asyncio.Semaphore(config.WS_MAX_IN_FLIGHT)
+    sending = asyncio.Lock()
+    tasks = set()
+
+    async def answer(message):
+        try:
+            try:
+                data = decode_frame(message)
+            except ValueError as e:
+                reply = {"id": None, "error": {"type": "invalid_request", "detail": str(e)}}
+            else:
+                refusal = await admit_message(client)
+                if refusal is None:
+                    try:
+                        reply = await socket_reply(data)
+                    finally:
+                        admission.release()
+                else:
+                    reply = {"id": data.get("id") if isinstance(data, dict) else None, "error": refusal}
+            async with sending:
+                await websocket.send(encode_frame(reply, binary=message.get("text") is None))
+        finally:
+            slots.release()
+
+    try:
+        while True:
+            await slots.acquire()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            task = asyncio.ensure_future(answer(message))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    finally:
+        # Replies to a closed connection cannot be sent
+        for task in tasks:
+            task.cancel()
+
+@app.get("/cache/stats")
+async def cache_stats_endpoint():
+    """
+    Report the hit, miss and eviction counters of the expression cache.
+
+    Returns:
+        dict: The counters from ExpressionCache.stats(), with those of the
+            fingerprint index under "canonical" (its hits are misses answered
+            by an equivalent expression's entry) and this worker's
+            SharedCache.stats() under "shared" if a shared cache is configured
+    """
+    stats = expression_cache.stats()
+    stats["canonical"] = fingerprint_index.stats()
+    if shared_cache is not None:
+        # Counting the shared table's rows can wait on another process's write
+        stats["shared"] = await asyncio.get_running_loop().run_in_executor(None, shared_cache.stats)
+    return stats
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """
+    Expose request metrics in the Prometheus text format.
+
+    Includes per-phase latency histograms (validate, lex, parse, evaluate,
+    serialize), evaluation counts by outcome and the distribution of
+    expression sizes.
+
+    Returns:
+        PlainTextResponse: The text exposition
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,535 @@
+import operator
+import re
+import time
+from contextlib import nullcontext
+from decimal import InvalidOperation
+
+try:
+    from .lexer import (END, IDENTIFIER, KIND_SYMBOLS, LPAREN, MINUS, NUMBER, PLUS,
+                        RPAREN, SLASH, STAR, tokenize)
+except ImportError:
+    from lexer import (END, IDENTIFIER, KIND_SYMBOLS, LPAREN, MINUS, NUMBER, PLUS,
+                       RPAREN, SLASH, STAR, tokenize)
+
+
+class Node:
+    """
+    Base class for the nodes of a compiled expression tree.
+
+    Nodes are immutable once built and use ``__slots__`` so a compiled
+    expression costs a handful of small objects instead of a dict per node.
+    Subclasses define ``__reduce__`` so trees can be pickled, e.g. to and
+    from a process pool, despite rejecting attribute assignment.
+    """
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} nodes are immutable")
+
+    def evaluate(self, variables):
+        """
+        Evaluate the subtree rooted at this node.
+
+        Args:
+            variables (Mapping[str, float]): Values for the variables in the subtree
+
+        Returns:
+            float: The value of the subtree
+        """
+        raise NotImplementedError
+
+
+class Number(Node):
+    """
+    A numeric literal.
+
+    Attributes:
+        value (float): The literal value
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        object.__setattr__(self, "value", value)
+
+    def evaluate(self, variables):
+        return self.value
+
+    def __reduce__(self):
+        return (Number, (self.value,))
+
+    def __repr__(self):
+        return f"Number({self.value!r})"
+
+
+class Variable(Node):
+    """
+    A reference to a named variable bound at evaluation time.
+
+    Attributes:
+        name (str): The variable name
+    """
+
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        object.__setattr__(self, "name", name)
+
+    def evaluate(self, variables):
+        try:
+            return variables[self.name]
+        except KeyError:
+            raise ValueError(f"Undefined variable: {self.name}") from None
+
+    def __reduce__(self):
+        return (Variable, (self.name,))
+
+    def __repr__(self):
+        return f"Variable({self.name!r})"
+
+
+class Negate(Node):
+    """
+    Unary minus applied to a subexpression.
+
+    Attributes:
+        operand (Node): The negated subexpression
+    """
+
+    __slots__ = ("operand",)
+
+    def __init__(self, operand):
+        object.__setattr__(self, "operand", operand)
+
+    def evaluate(self, variables):
+        return -self.operand.evaluate(variables)
+
+    def __reduce__(self):
+        return (Negate, (self.operand,))
+
+    def __repr__(self):
+        return f"Negate({self.operand!r})"
+
+
+class BinaryOp(Node):
+    """
+    A binary arithmetic operation.
+
+    Attributes:
+        op (str): One of '+', '-', '*', '/'
+        left (Node): The left operand
+        right (Node): The right operand
+    """
+
+    __slots__ = ("op", "left", "right", "_func")
+
+    FUNCTIONS = {
+        '+': operator.add,
+        '-': operator.sub,
+        '*': operator.mul,
+        '/': operator.truediv,
+    }
+
+    def __init__(self, op, left, right):
+        object.__setattr__(self, "op", op)
+        object.__setattr__(self, "left", left)
+        object.__setattr__(self, "right", right)
+        object.__setattr__(self, "_func", self.FUNCTIONS[op])
+
+    def evaluate(self, variables):
+        return self._func(self.left.evaluate(variables), self.right.evaluate(variables))
+
+    def __reduce__(self):
+        return (BinaryOp, (self.op, self.left, self.right))
+
+    def __repr__(self):
+        return f"BinaryOp({self.op!r}, {self.left!r}, {self.right!r})"
+
+
+# Deepest tree evaluated with recursive Node.evaluate calls (one Python frame per level)
+MAX_RECURSIVE_DEPTH = 200
+
+
+class CompiledExpression:
+    """
+    An expression that has been lexed and parsed once and can be evaluated many times.
+
+    Attributes:
+        source (str): The expression text the tree was compiled from
+        root (Node): The root node of the expression tree
+        variables (frozenset): Names of the variables the expression refers to
+        depth (int or None): Height of the tree, if the parser measured it.
+            Trees deeper than MAX_RECURSIVE_DEPTH are evaluated without recursion.
+        numeric (NumericMode or None): The numeric mode the literals were
+            converted with; exact modes also convert bound variables and
+            evaluate under the mode's context
+    """
+
+    __slots__ = ("source", "root", "variables", "depth", "numeric")
+
+    def __init__(self, source, root, variables=frozenset(), depth=None, numeric=None):
+        object.__setattr__(self, "source", source)
+        object.__setattr__(self, "root", root)
+        object.__setattr__(self, "variables", variables)
+        object.__setattr__(self, "depth", depth)
+        object.__setattr__(self, "numeric", numeric)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledExpression is immutable")
+
+    def evaluate(self, variables=None, budget=None):
+        """
+        Evaluate the compiled expression.
+
+        Args:
+            variables (Mapping[str, float], optional): Values for the variables in the expression
+            budget (EvaluationBudget, optional): Limits on evaluation steps and
+                time; the tree is then evaluated iteratively so they can be checked
+
+        Returns:
+            float: The result of evaluating the expression, or an int,
+                Fraction or Decimal depending on the numeric mode
+
+        Raises:
+            ValueError: If a variable in the expression has no value
+            ZeroDivisionError: If division by zero is attempted
+            LimitExceededError: If the budget is exceeded
+        """
+        if variables is None:
+            variables = {}
+        numeric = self.numeric
+        if numeric is not None and numeric.exact:
+            variables = numeric.bind(variables)
+            try:
+                with numeric.scope():
+                    return self._evaluate(variables, budget)
+            except (ZeroDivisionError, InvalidOperation):
+                # Fraction and Decimal name their internals in the message, and
+                # Decimal signals 0 / 0 (the only invalid operation here) separately
+                raise ZeroDivisionError(f"{numeric.name} division by zero") from None
+        try:
+            return self._evaluate(variables, budget)
+        except ZeroDivisionError:
+            # Python adds "float" to the message when either operand is a float
+            raise ZeroDivisionError("division by zero") from None
+
+    def _evaluate(self, variables, budget):
+        if budget is not None or (self.depth is not None and self.depth > MAX_RECURSIVE_DEPTH):
+            return evaluate_iterative(self.root, variables, budget)
+        return self.root.evaluate(variables)
+
+    def __reduce__(self):
+        return (CompiledExpression, (self.source, self.root, self.variables, self.depth, self.numeric))
+
+    def __repr__(self):
+        return f"CompiledExpression({self.source!r})"
+
+
+_SPACES = re.compile(r"\s+")
+_REDUNDANT_SPACE = re.compile(r"(?<![\w.]) | (?![\w.])")
+
+
+def normalize_expression(expression):
+    """
+    Remove whitespace that cannot change the meaning of an expression.
+
+    Whitespace only matters between two numbers or names ("2 3" is an error,
+    "23" is not), so those gaps are collapsed to a single space and every
+    other run of whitespace is dropped.
+
+    Args:
+        expression (str): The raw expression text
+
+    Returns:
+        str: The normalized expression
+
+    Example:
+        >>> normalize_expression(" 2 *  (x + 3) ")
+        '2*(x+3)'
+    """
+    return _REDUNDANT_SPACE.sub("", _SPACES.sub(" ", expression.strip()))
+
+
+def evaluate_iterative(root, variables, budget=None):
+    """
+    Evaluate a tree with an explicit stack instead of recursive calls.
+
+    Args:
+        root (Node): The root of the tree
+        variables (Mapping[str, float]): Values for the variables in the tree
+        budget (EvaluationBudget, optional): Checked every
+            ``budget.CHECK_INTERVAL`` steps; a step is one visit to a node
+
+    Returns:
+        float: The value of the tree
+
+    Raises:
+        ValueError: If a variable in the tree has no value
+        ZeroDivisionError: If division by zero is attempted
+        LimitExceededError: If the budget is exceeded
+    """
+    values = []
+    # Each pending item is a node plus whether its operands are already on `values`
+    pending = [(root, False)]
+    interval = budget.CHECK_INTERVAL if budget is not None else 0
+    steps = 0
+    while pending:
+        if interval:
+            steps += 1
+            if steps % interval == 0:
+                budget.check(steps)
+        node, ready = pending.pop()
+        node_type = type(node)
+        if node_type is BinaryOp:
+            if ready:
+                right = values.pop()
+                values[-1] = node._func(values[-1], right)
+            else:
+                pending.append((node, True))
+                pending.append((node.right, False))
+                pending.append((node.left, False))
+        elif node_type is Negate:
+            if ready:
+                values[-1] = -values[-1]
+            else:
+                pending.append((node, True))
+                pending.append((node.operand, False))
+        else:
+            values.append(node.evaluate(variables))
+    return values[0]
+
+
+def _unexpected_token(tokens, pos):
+    if tokens.kinds[pos] in (NUMBER, IDENTIFIER):
+        return ValueError("Missing operator between operands")
+    return ValueError(f"Unexpected character '{tokens.text_of(pos)}'")
+
+
+class _RecursiveParser:
+    """
+    Recursive descent parser that builds a tree instead of computing a value.
+
+    The grammar matches ExpressionEvaluator: '+' and '-' bind looser than
+    '*' and '/', parentheses group, and a leading '-' negates the operand
+    that follows it. Operands are numbers or variable names.
+    """
+
+    def __init__(self, tokens, literals=None):
+        self.tokens = tokens
+        self.kinds = tokens.kinds
+        self.literals = tokens.values if literals is None else literals
+        self.pos = 0
+        # Not measured, so evaluation recurses just like this parser does
+        self.depth = None
+
+    def parse(self):
+        root = self.parse_addition_subtraction()
+        if self.kinds[self.pos] != END:
+            raise _unexpected_token(self.tokens, self.pos)
+        return root
+
+    def parse_addition_subtraction(self):
+        kinds = self.kinds
+        left = self.parse_multiplication_division()
+        while kinds[self.pos] == PLUS or kinds[self.pos] == MINUS:
+            op = KIND_SYMBOLS[kinds[self.pos]]
+            self.pos += 1
+            left = BinaryOp(op, left, self.parse_multiplication_division())
+        return left
+
+    def parse_multiplication_division(self):
+        kinds = self.kinds
+        left = self.parse_unary()
+        while kinds[self.pos] == STAR or kinds[self.pos] == SLASH:
+            op = KIND_SYMBOLS[kinds[self.pos]]
+            self.pos += 1
+            left = BinaryOp(op, left, self.parse_unary())
+        return left
+
+    def parse_unary(self):
+        if self.kinds[self.pos] == MINUS:
+            self.pos += 1
+            operand = self.parse_unary()
+            # Fold "-<literal>" so negative numbers stay a single node
+            if type(operand) is Number:
+                return Number(-operand.value)
+            return Negate(operand)
+        return self.parse_number_or_parentheses()
+
+    def parse_number_or_parentheses(self):
+        kind = self.kinds[self.pos]
+        if kind == LPAREN:
+            self.pos += 1
+            node = self.parse_addition_subtraction()
+            if self.kinds[self.pos] == RPAREN:
+                self.pos += 1
+                return node
+            raise ValueError("Missing closing parenthesis")
+        if kind == NUMBER:
+            self.pos += 1
+            return Number(self.literals[self.pos - 1])
+        if kind == IDENTIFIER:
+            self.pos += 1
+            return Variable(self.tokens.name_of(self.pos - 1))
+        raise ValueError("Expected number")
+
+
+# Marker for unary minus on the iterative parser's operator stack
+_NEGATE = -1
+
+# Binding strength of operators on the iterative parser's stack; unary minus
+# binds tighter than any binary operator, and '(' is a barrier
+_PRECEDENCE = {LPAREN: 0, PLUS: 1, MINUS: 1, STAR: 2, SLASH: 2, _NEGATE: 3}
+
+
+class _IterativeParser:
+    """
+    Shunting-yard parser that builds the same tree as _RecursiveParser.
+
+    Operators and operands live on explicit stacks, so the Python stack
+    depth stays constant no matter how deeply the input is nested. The
+    height of the tree is tracked alongside so that evaluation can avoid
+    recursion for deep trees too.
+    """
+
+    def __init__(self, tokens, literals=None):
+        self.tokens = tokens
+        self.literals = tokens.values if literals is None else literals
+        self.depth = None
+
+    def parse(self):
+        tokens = self.tokens
+        kinds = tokens.kinds
+        operands = []
+        depths = []
+        operators = []
+        expect_operand = True
+        pos = 0
+
+        while True:
+            kind = kinds[pos]
+            if expect_operand:
+                if kind == LPAREN:
+                    operators.append(LPAREN)
+                elif kind == MINUS:
+                    operators.append(_NEGATE)
+                elif kind == NUMBER:
+                    operands.append(Number(self.literals[pos]))
+                    depths.append(1)
+                    expect_operand = False
+                elif kind == IDENTIFIER:
+                    operands.append(Variable(tokens.name_of(pos)))
+                    depths.append(1)
+                    expect_operand = False
+                else:
+                    raise ValueError("Expected number")
+            elif kind == END:
+                break
+            elif kind == PLUS or kind == MINUS or kind == STAR or kind == SLASH:
+                precedence = _PRECEDENCE[kind]
+                while operators and _PRECEDENCE[operators[-1]] >= precedence:
+                    self._reduce(operators.pop(), operands, depths)
+                operators.append(kind)
+                expect_operand = True
+            elif kind == RPAREN:
+                while operators and operators[-1] != LPAREN:
+                    self._reduce(operators.pop(), operands, depths)
+                if not operators:
+                    raise _unexpected_token(tokens, pos)
+                operators.pop()
+            elif LPAREN in operators:
+                # Same message as the recursive parser, which is still looking for ')'
+                raise ValueError("Missing closing parenthesis")
+            else:
+                raise _unexpected_token(tokens, pos)
+            pos += 1
+
+        while operators:
+            operator_ = operators.pop()
+            if operator_ == LPAREN:
+                raise ValueError("Missing closing parenthesis")
+            self._reduce(operator_, operands, depths)
+        self.depth = depths[0]
+        return operands[0]
+
+    @staticmethod
+    def _reduce(operator_, operands, depths):
+        if operator_ == _NEGATE:
+            operand = operands[-1]
+            # Fold "-<literal>" so negative numbers stay a single node
+            if type(operand) is Number:
+                operands[-1] = Number(-operand.value)
+            else:
+                operands[-1] = Negate(operand)
+                depths[-1] += 1
+        else:
+            right = operands.pop()
+            right_depth = depths.pop()
+            operands[-1] = BinaryOp(KIND_SYMBOLS[operator_], operands[-1], right)
+            depths[-1] = max(depths[-1], right_depth) + 1
+
+
+ENGINES = {
+    "recursive": _RecursiveParser,
+    "iterative": _IterativeParser,
+}
+
+
+def compile_expression(expression, engine="recursive", timings=None, numeric=None):
+    """
+    Lex and parse an expression once into an immutable tree.
+
+    The returned object can be evaluated repeatedly without re-scanning the
+    expression text.
+
+    Args:
+        expression (str): The mathematical expression to compile
+        engine (str): "recursive" for the recursive descent parser, or
+            "iterative" for the shunting-yard parser, which also evaluates
+            without recursion and so accepts arbitrarily deep nesting
+        timings (dict, optional): If given, receives the "lex" and "parse"
+            durations in seconds
+        numeric (NumericMode, optional): The number type for literals and
+            results; literals are floats if omitted
+
+    Returns:
+        CompiledExpression: The compiled expression
+
+    Raises:
+        ValueError: If the expression is malformed, contains invalid
+            characters or the engine is unknown
+
+    Example:
+        >>> compiled = compile_expression("2 * (x + 4)")
+        >>> compiled.evaluate({"x": 3})
+        14.0
+    """
+    try:
+        parser_class = ENGINES[engine]
+    except KeyError:
+        raise ValueError(f"Unknown parser engine: {engine}") from None
+    literals = None
+    with numeric.scope() if numeric is not None else nullcontext():
+        if timings is None:
+            tokens = tokenize(expression)
+            if numeric is not None:
+                literals = numeric.literals(tokens)
+            parser = parser_class(tokens, literals)
+            root = parser.parse()
+        else:
+            # Phases that fail are timed too, up to the point of failure
+            start = time.perf_counter()
+            try:
+                tokens = tokenize(expression)
+            finally:
+                lexed = time.perf_counter()
+                timings["lex"] = lexed - start
+            try:
+                if numeric is not None:
+                    literals = numeric.literals(tokens)
+                parser = parser_class(tokens, literals)
+                root = parser.parse()
+            finally:
+                timings["parse"] = time.perf_counter() - lexed
+    return CompiledExpression(expression, root, frozenset(tokens.names), parser.depth, numeric)
@@ -0,0 +1,238 @@
+import time
+from collections import OrderedDict
+
+try:
+    from .canonical import fingerprint
+    from .expression_ast import compile_expression
+    from .optimizer import optimize
+except ImportError:
+    from canonical import fingerprint
+    from expression_ast import compile_expression
+    from optimizer import optimize
+
+
+class CacheEntry:
+    """
+    The outcome of compiling and evaluating one expression.
+
+    Exactly one of ``result`` or ``error_type`` is meaningful. Errors are kept
+    as a type and message rather than an exception instance so that raising
+    them again does not keep stale tracebacks alive.
+
+    Attributes:
+        compiled (CompiledExpression, OptimizedExpression or None): The parsed
+            expression, if parsing succeeded
+        result (float, int, Fraction, Decimal or None): The evaluated result
+        error_type (type or None): The exception class raised while compiling or evaluating
+        error_message (str or None): The message of that exception
+        timings (dict or None): Seconds spent in the "lex", "parse",
+            "optimize" and "evaluate" phases while building the entry
+        uses (int): Times the compiled expression was evaluated with variables
+            after being cached; hot entries get their compiled form replaced
+            by generated code
+        fingerprint (str or None): The fingerprint of the compiled
+            expression, shared by all equivalent spellings, if it was computed
+    """
+
+    __slots__ = ("compiled", "result", "error_type", "error_message", "timings", "uses", "fingerprint")
+
+    def __init__(self, compiled=None, result=None, error=None, timings=None):
+        self.compiled = compiled
+        self.timings = timings
+        self.uses = 0
+        self.fingerprint = None
+        self.result = result
+        self.error_type = type(error) if error is not None else None
+        self.error_message = str(error) if error is not None else None
+
+    def unwrap(self):
+        """
+        Return the cached result or raise the cached error.
+
+        Returns:
+            float: The cached result
+
+        Raises:
+            Exception: A new instance of the cached error type
+        """
+        if self.error_type is not None:
+            raise self.error_type(self.error_message)
+        return self.result
+
+
+def build_entry(key, engine="iterative", numeric=None, budget=None, canonical=False, known=None):
+    """
+    Compile and evaluate a normalized expression into a cache entry.
+
+    This is the unit of work handed to an evaluation pool, so it only
+    depends on dependency-free modules and returns a picklable entry.
+
+    Expressions with variables are evaluated again for every set of
+    bindings, so they are optimized first; the cached result of a constant
+    expression makes optimizing it pointless. Expressions in an exact
+    numeric mode are not optimized, because folding would have to happen
+    under the mode's arithmetic context.
+
+    With ``canonical``, the entry records the expression's fingerprint (see
+    canonical.py), and if ``known`` already has an entry for an equivalent
+    spelling, its outcome is reused instead of optimizing and evaluating
+    the expression again.
+
+    Args:
+        key (str): The normalized expression
+        engine (str): The parser engine passed to compile_expression
+        numeric (NumericMode, optional): The numeric mode passed to compile_expression
+        budget (EvaluationBudget, optional): Limits on evaluating a constant
+            expression; expressions with variables had their constant parts
+            computed by optimize() and fail at their first unbound variable
+        canonical (bool): Whether to compute the fingerprint
+        known (Callable[[str], CacheEntry or None], optional): Looks up the
+            entry for a fingerprint; only used with canonical
+
+    Returns:
+        CacheEntry: The compiled expression, its result or error, and the
+            time spent in each phase (including "canonicalize")
+
+    Raises:
+        LimitExceededError: If evaluation exceeds the budget; this depends on
+            load as well as on the expression, so it is not cached
+    """
+    compiled = None
+    key_fingerprint = None
+    timings = {}
+    try:
+        compiled = compile_expression(key, engine, timings, numeric)
+        if canonical:
+            start = time.perf_counter()
+            key_fingerprint = fingerprint(compiled)
+            timings["canonicalize"] = time.perf_counter() - start
+            match = known(key_fingerprint) if known is not None else None
+            if match is not None:
+                entry = CacheEntry(match.compiled, match.result, timings=timings)
+                entry.error_type, entry.error_message = match.error_type, match.error_message
+                entry.fingerprint = key_fingerprint
+                return entry
+        if compiled.variables and (numeric is None or not numeric.exact):
+            start = time.perf_counter()
+            compiled = optimize(compiled)
+            timings["optimize"] = time.perf_counter() - start
+        start = time.perf_counter()
+        try:
+            if budget is not None and not compiled.variables:
+                result = compiled.evaluate(budget=budget.start())
+            else:
+                result = compiled.evaluate()
+        finally:
+            timings["evaluate"] = time.perf_counter() - start
+        entry = CacheEntry(compiled, result=result, timings=timings)
+    except (ValueError, ArithmeticError) as e:
+        # ArithmeticError also covers results too large for a float or a Decimal
+        entry = CacheEntry(compiled, error=e, timings=timings)
+    entry.fingerprint = key_fingerprint
+    return entry
+
+
+class ExpressionCache:
+    """
+    A bounded in-process mapping with hit, miss and eviction counters.
+
+    Attributes:
+        maxsize (int): Maximum number of entries; 0 disables caching
+        policy (str): "lru" evicts the least recently used entry, "fifo" the oldest inserted one
+        hits (int): Number of successful lookups
+        misses (int): Number of failed lookups
+        evictions (int): Number of entries dropped to stay within maxsize
+    """
+
+    POLICIES = ("lru", "fifo")
+
+    def __init__(self, maxsize=4096, policy="lru"):
+        if maxsize < 0:
+            raise ValueError("maxsize must not be negative")
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown cache policy: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Look up a key, counting the hit or miss.
+
+        Args:
+            key (str): The normalized expression
+
+        Returns:
+            The cached value, or None if the key is not cached
+        """
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.policy == "lru":
+            self._entries.move_to_end(key)
+        return value
+
+    def peek(self, key):
+        """
+        Look up a key without counting it or changing its recency.
+
+        Args:
+            key: The key
+
+        Returns:
+            The cached value, or None if the key is not cached
+        """
+        return self._entries.get(key)
+
+    def put(self, key, value):
+        """
+        Store a value, evicting entries as needed to stay within maxsize.
+
+        Args:
+            key (str): The normalized expression
+            value: The value to cache
+        """
+        if self.maxsize == 0:
+            return
+        if key in self._entries:
+            self._entries[key] = value
+            if self.policy == "lru":
+                self._entries.move_to_end(key)
+            return
+        while len(self._entries) >= self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        self._entries[key] = value
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        """
+        Report the cache counters.
+
+        Returns:
+            dict: size, maxsize, policy, hits, misses, evictions and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "policy": self.policy,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,220 @@
+"""
+Evaluate an expression repeatedly as it is edited, reusing earlier work.
+
+Each call re-lexes only the edited region (see lexer.retokenize) and skips
+every parenthesized group whose text was evaluated before, using its
+memoized value instead, so only the groups containing the edit and the
+top-level terms are parsed again.
+"""
+try:
+    from .expression_ast import _unexpected_token, compile_expression
+    from .expression_cache import CacheEntry, ExpressionCache
+    from .lexer import END, IDENTIFIER, LPAREN, MINUS, NUMBER, PLUS, RPAREN, SLASH, STAR, retokenize
+except ImportError:
+    from expression_ast import _unexpected_token, compile_expression
+    from expression_cache import CacheEntry, ExpressionCache
+    from lexer import END, IDENTIFIER, LPAREN, MINUS, NUMBER, PLUS, RPAREN, SLASH, STAR, retokenize
+
+
+class _MemoEvaluator:
+    """
+    A recursive descent parser that computes values as it parses.
+
+    The grammar and error messages are those of compile_expression. To
+    keep its error precedence (any parse error wins over an evaluation
+    error), the first evaluation error is recorded instead of raised, the
+    affected values become None, and the error is raised once the whole
+    expression has parsed.
+
+    Attributes:
+        matches (dict): Index of '(' -> index of its ')' for groups known to
+            match; filled in as groups are parsed
+        memo (ExpressionCache): Group text -> CacheEntry with its value or error
+        error (Exception or None): The first evaluation error
+    """
+
+    def __init__(self, tokens, matches, memo):
+        self.tokens = tokens
+        self.kinds = tokens.kinds
+        self.values = tokens.values
+        self.starts, self.ends = tokens.spans()
+        self.matches = matches
+        self.memo = memo
+        self.pos = 0
+        self.error = None
+
+    def parse(self):
+        value = self.parse_addition_subtraction()
+        if self.kinds[self.pos] != END:
+            raise _unexpected_token(self.tokens, self.pos)
+        if self.error is not None:
+            raise self.error
+        return value
+
+    def fail(self, error):
+        if self.error is None:
+            self.error = error
+
+    def parse_addition_subtraction(self):
+        kinds = self.kinds
+        left = self.parse_multiplication_division()
+        while kinds[self.pos] == PLUS or kinds[self.pos] == MINUS:
+            subtract = kinds[self.pos] == MINUS
+            self.pos += 1
+            right = self.parse_multiplication_division()
+            if left is None or right is None:
+                left = None
+            else:
+                left = left - right if subtract else left + right
+        return left
+
+    def parse_multiplication_division(self):
+        kinds = self.kinds
+        left = self.parse_unary()
+        while kinds[self.pos] == STAR or kinds[self.pos] == SLASH:
+            divide = kinds[self.pos] == SLASH
+            self.pos += 1
+            right = self.parse_unary()
+            if left is None or right is None:
+                left = None
+            elif divide:
+                try:
+                    left = left / right
+                except ZeroDivisionError:
+                    # Same message as full evaluation gives
+                    self.fail(ZeroDivisionError("division by zero"))
+                    left = None
+            else:
+                left = left * right
+        return left
+
+    def parse_unary(self):
+        if self.kinds[self.pos] == MINUS:
+            self.pos += 1
+            operand = self.parse_unary()
+            return None if operand is None else -operand
+        return self.parse_number_or_parentheses()
+
+    def parse_number_or_parentheses(self):
+        pos = self.pos
+        kind = self.kinds[pos]
+        if kind == LPAREN:
+            close = self.matches.get(pos)
+            if close is not None:
+                entry = self.memo.get(self.tokens.text[self.starts[pos]:self.ends[close]])
+                if entry is not None:
+                    if entry.error_type is not None:
+                        self.fail(entry.error_type(entry.error_message))
+                    self.pos = close + 1
+                    return entry.result
+            return self.parse_group()
+        if kind == NUMBER:
+            self.pos += 1
+            return self.values[pos]
+        if kind == IDENTIFIER:
+            self.pos += 1
+            self.fail(ValueError(f"Undefined variable: {self.tokens.name_of(pos)}"))
+            return None
+        raise ValueError("Expected number")
+
+    def parse_group(self):
+        start = self.pos
+        outer_error = self.error
+        self.error = None
+        self.pos += 1
+        value = self.parse_addition_subtraction()
+        if self.kinds[self.pos] != RPAREN:
+            raise ValueError("Missing closing parenthesis")
+        close = self.pos
+        self.pos += 1
+
+        self.matches[start] = close
+        key = self.tokens.text[self.starts[start]:self.ends[close]]
+        self.memo.put(key, CacheEntry(result=value, error=self.error))
+        if outer_error is not None:
+            self.error = outer_error
+        return value
+
+
+class IncrementalEvaluator:
+    """
+    Evaluate successive versions of an expression, such as the contents of
+    a text box as the user types.
+
+    An edit costs roughly the size of the edited region, the groups that
+    contain it and the number of top-level terms, rather than the size of
+    the whole expression. Results and errors are identical to
+    ``compile_expression(text).evaluate()``.
+
+    Instances keep the previous version's tokens, so use one per editing
+    session and do not share it between threads.
+
+    Attributes:
+        tokens (Tokens or None): The tokens of the last evaluated version
+        matches (dict): Matching parentheses known for those tokens
+        memo (ExpressionCache): Group text -> CacheEntry with its value or error
+    """
+
+    def __init__(self, memo_size=4096):
+        self.tokens = None
+        self.matches = {}
+        self.memo = ExpressionCache(maxsize=memo_size)
+
+    def evaluate(self, text):
+        """
+        Evaluate the latest version of the expression.
+
+        Args:
+            text (str): The expression
+
+        Returns:
+            float: The result of evaluating the expression
+
+        Raises:
+            ValueError: If the expression is malformed or refers to a variable
+            ZeroDivisionError: If division by zero is attempted
+        """
+        previous = self.tokens
+        tokens = retokenize(previous, text)
+        matches = _carry_matches(previous, tokens, self.matches) if previous is not None else {}
+        self.tokens = tokens
+        self.matches = matches
+
+        try:
+            return _MemoEvaluator(tokens, matches, self.memo).parse()
+        except RecursionError:
+            # Nested too deeply to parse recursively
+            return compile_expression(text, engine="iterative").evaluate()
+
+
+def _common_prefix_length(a, b):
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _carry_matches(previous, tokens, matches):
+    """
+    Keep the parenthesis matches that an edit cannot have changed.
+
+    A pair stays valid if it lies entirely before or entirely after the
+    tokens that changed, because matching only depends on the token kinds
+    in between; pairs after the edit are renumbered. Groups that contain
+    the edit are parsed again and re-register their match.
+    """
+    old = previous.kinds.tobytes()
+    new = tokens.kinds.tobytes()
+    prefix = _common_prefix_length(old, new)
+    suffix = _common_prefix_length(old[prefix:][::-1], new[prefix:][::-1])
+    old_suffix_start = len(old) - suffix
+    shift = len(new) - len(old)
+    carried = {start: close for start, close in matches.items() if close < prefix}
+    carried.update(
+        (start + shift, close + shift) for start, close in matches.items() if start >= old_suffix_start
+    )
+    return carried
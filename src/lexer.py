@@ -0,0 +1,291 @@
+"""
+Single-pass tokenizer shared by every expression parser.
+
+Token kinds and numeric values are stored column-wise in ``array``
+buffers rather than as one Python object per token.
+"""
+import re
+import string
+from array import array
+from bisect import bisect_left, bisect_right
+
+# Token kinds
+END = 0
+NUMBER = 1
+IDENTIFIER = 2
+PLUS = 3
+MINUS = 4
+STAR = 5
+SLASH = 6
+LPAREN = 7
+RPAREN = 8
+
+OPERATOR_KINDS = {
+    '+': PLUS,
+    '-': MINUS,
+    '*': STAR,
+    '/': SLASH,
+    '(': LPAREN,
+    ')': RPAREN,
+}
+
+KIND_SYMBOLS = {kind: symbol for symbol, kind in OPERATOR_KINDS.items()}
+
+# Every token kind is decided by its first character
+_KIND_OF_FIRST_CHAR = dict.fromkeys("0123456789", NUMBER)
+_KIND_OF_FIRST_CHAR.update(dict.fromkeys(string.ascii_letters + "_", IDENTIFIER))
+_KIND_OF_FIRST_CHAR.update(OPERATOR_KINDS)
+
+_INVALID = -1
+
+_TOKEN = re.compile(
+    r"\s*("
+    r"[0-9]+(?:\.[0-9]+)?"      # number
+    r"|[A-Za-z_][A-Za-z0-9_]*"  # identifier
+    r"|[-+*/()]"                # operator or parenthesis
+    r"|\S"                      # anything else is an error
+    r")"
+)
+
+
+class Tokens:
+    """
+    The token buffers for one expression.
+
+    The buffers always end with an END token, so parsers can look at the
+    current kind without a bounds check.
+
+    Attributes:
+        text (str): The tokenized expression
+        kinds (array): Token kinds ('b')
+        values (array): Number values, or the index into names for identifiers ('d')
+        texts (list): The source text of each token
+        names (list): Identifier names, in order of first appearance
+    """
+
+    __slots__ = ("text", "kinds", "values", "texts", "names", "_spans")
+
+    def __init__(self, text, kinds, values, texts, names):
+        self.text = text
+        self.kinds = kinds
+        self.values = values
+        self.texts = texts
+        self.names = names
+        self._spans = None
+
+    def __len__(self):
+        """Number of tokens, not counting the END token."""
+        return len(self.kinds) - 1
+
+    def text_of(self, index):
+        """
+        Get the source text of a token.
+
+        Args:
+            index (int): The token index
+
+        Returns:
+            str: The characters the token was read from ("" for END)
+        """
+        return self.texts[index] if index < len(self.texts) else ""
+
+    def name_of(self, index):
+        """
+        Get the name of an identifier token.
+
+        Args:
+            index (int): The index of an IDENTIFIER token
+
+        Returns:
+            str: The identifier name
+        """
+        return self.names[int(self.values[index])]
+
+    def spans(self):
+        """
+        Get the character offsets of every token.
+
+        Offsets are not needed to parse, so they are only computed (and then
+        kept) when something asks for them.
+
+        Returns:
+            tuple: (starts, ends) arrays ('l'), including the END token
+        """
+        if self._spans is None:
+            starts = array('l')
+            ends = array('l')
+            for match in _TOKEN.finditer(self.text):
+                start, end = match.span(1)
+                starts.append(start)
+                ends.append(end)
+            starts.append(len(self.text))
+            ends.append(len(self.text))
+            self._spans = (starts, ends)
+        return self._spans
+
+
+def tokenize(text):
+    """
+    Split an expression into tokens in a single regex-driven pass.
+
+    Whitespace separates tokens and is otherwise ignored. The regex finds
+    the token boundaries in C; kinds are then looked up from each token's
+    first character and number literals converted in bulk.
+
+    Args:
+        text (str): The mathematical expression
+
+    Returns:
+        Tokens: The token buffers, terminated by an END token
+
+    Raises:
+        ValueError: If the expression contains a malformed number (such as
+            "2." or ".5") or a character that cannot start a token
+
+    Example:
+        >>> tokens = tokenize("2 * (x + 3)")
+        >>> list(tokens.kinds) == [NUMBER, STAR, LPAREN, IDENTIFIER, PLUS, NUMBER, RPAREN, END]
+        True
+    """
+    texts = _TOKEN.findall(text)
+    kinds = array('b', [_KIND_OF_FIRST_CHAR.get(token[0], _INVALID) for token in texts])
+    _check_invalid(kinds, texts)
+
+    values = array('d', [float(token) if kind == NUMBER else 0.0 for token, kind in zip(texts, kinds)])
+    kinds.append(END)
+    values.append(0.0)
+    return Tokens(text, kinds, values, texts, _index_names(kinds, values, texts))
+
+
+def _check_invalid(kinds, texts):
+    if _INVALID in kinds:
+        char = texts[kinds.index(_INVALID)]
+        if char == '.':
+            raise ValueError("Invalid number format")
+        raise ValueError(f"Unexpected character '{char}'")
+
+
+def _index_names(kinds, values, texts):
+    # Point each identifier's value at its name's position in the returned list
+    names = []
+    if IDENTIFIER in kinds:
+        name_index = {}
+        for index, kind in enumerate(kinds):
+            if kind == IDENTIFIER:
+                name = texts[index]
+                position = name_index.get(name)
+                if position is None:
+                    position = name_index[name] = len(names)
+                    names.append(name)
+                values[index] = position
+    return names
+
+
+def _common_prefix_length(a, b, limit):
+    # Binary search over slice comparisons, which run in C
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _common_suffix_length(a, b, limit):
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:] == b[len(b) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def retokenize(previous, text):
+    """
+    Tokenize an edited expression, reusing the tokens of the previous version.
+
+    Only the region between the longest common prefix and suffix of the two
+    texts is lexed again; tokens before it are copied and tokens after it
+    are copied with their offsets shifted. Lexing resumes from the last
+    token that cannot have been affected by the edit (a number's extent can
+    depend on the two characters after it) and stops as soon as a new
+    token ends where an old one did inside the unchanged suffix, since the
+    lexer is stateless from there on.
+
+    Args:
+        previous (Tokens or None): The tokens of the previous version, with
+            tokenize() used instead if None
+        text (str): The edited expression
+
+    Returns:
+        Tokens: The same buffers tokenize(text) would return, with spans
+            already computed
+
+    Raises:
+        ValueError: If the expression contains a malformed number or a
+            character that cannot start a token
+    """
+    if previous is None:
+        return tokenize(text)
+    old = previous.text
+    if text == old:
+        return previous
+
+    limit = min(len(old), len(text))
+    prefix = _common_prefix_length(old, text, limit)
+    suffix = _common_suffix_length(old, text, limit - prefix)
+    delta = len(text) - len(old)
+    suffix_start = len(text) - suffix
+
+    old_starts, old_ends = previous.spans()
+    count = len(previous)
+    # Tokens whose extent and following two characters lie inside the prefix are unchanged
+    keep = bisect_right(old_ends, prefix - 2, 0, count)
+    pos = old_ends[keep - 1] if keep else 0
+
+    starts = []
+    ends = []
+    texts = []
+    resume = count
+    while pos < len(text):
+        if pos >= suffix_start:
+            old_pos = pos - delta
+            if old_pos == 0:
+                resume = 0
+                break
+            index = bisect_left(old_ends, old_pos, 0, count)
+            if index < count and old_ends[index] == old_pos:
+                resume = index + 1
+                break
+        match = _TOKEN.match(text, pos)
+        if match is None:
+            # Only trailing whitespace is left
+            break
+        start, pos = match.span(1)
+        starts.append(start)
+        ends.append(pos)
+        texts.append(match.group(1))
+
+    kinds = array('b', [_KIND_OF_FIRST_CHAR.get(token[0], _INVALID) for token in texts])
+    _check_invalid(kinds, texts)
+    values = array('d', [float(token) if kind == NUMBER else 0.0 for token, kind in zip(texts, kinds)])
+
+    kinds = previous.kinds[:keep] + kinds + previous.kinds[resume:]
+    values = previous.values[:keep] + values + previous.values[resume:]
+    texts = previous.texts[:keep] + texts + previous.texts[resume:count]
+    if delta:
+        tail_starts = array('l', [start + delta for start in old_starts[resume:count]])
+        tail_ends = array('l', [end + delta for end in old_ends[resume:count]])
+    else:
+        tail_starts = old_starts[resume:count]
+        tail_ends = old_ends[resume:count]
+    starts = old_starts[:keep] + array('l', starts) + tail_starts + array('l', [len(text)])
+    ends = old_ends[:keep] + array('l', ends) + tail_ends + array('l', [len(text)])
+
+    tokens = Tokens(text, kinds, values, texts, _index_names(kinds, values, texts))
+    tokens._spans = (starts, ends)
+    return tokens
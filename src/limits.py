@@ -0,0 +1,171 @@
+"""
+Resource limits for untrusted expressions.
+
+``estimate_cost`` is a pre-scan made of a few C-level string passes, plus a
+Python pass over the parentheses alone when groups may be nested. It is
+cheap enough to run on every request before the expression is normalized,
+lexed or parsed. ``check_expression`` rejects expressions over the configured
+limits, and ``EvaluationBudget`` caps the steps and time evaluation may take.
+"""
+import re
+import time
+from collections import namedtuple
+from itertools import accumulate
+
+ExpressionCost = namedtuple("ExpressionCost", ["length", "tokens", "depth"])
+ExpressionCost.__doc__ = """
+Estimates of how much work an expression is.
+
+Attributes:
+    length (int): Number of characters
+    tokens (int): Estimated number of tokens: every operator and parenthesis,
+        plus one operand per binary operator and one more
+    depth (int): Deepest parenthesis nesting
+"""
+
+_NOT_PARENTHESIS = re.compile(r"[^()]+")
+
+
+class LimitExceededError(Exception):
+    """
+    Raised when an expression or its evaluation exceeds a configured limit.
+
+    Attributes:
+        limit (str): The name of the setting that was exceeded, e.g. "MAX_NESTING_DEPTH"
+        status_code (int): 413 for limits on the size of the input, 422 for
+            limits on its shape or on evaluation
+    """
+
+    def __init__(self, message, limit, status_code):
+        super().__init__(message)
+        self.limit = limit
+        self.status_code = status_code
+
+    def __reduce__(self):
+        # Exceptions pickle their args only, which would drop limit and status_code
+        return (type(self), (str(self), self.limit, self.status_code))
+
+
+def estimate_cost(expression):
+    """
+    Estimate the size of an expression without tokenizing it.
+
+    The nesting depth is at most the number of opening parentheses, so it is
+    only scanned for when there are two or more.
+
+    Args:
+        expression (str): The raw expression text
+
+    Returns:
+        ExpressionCost: The estimates
+
+    Example:
+        >>> estimate_cost("2 * (3 + (4 - 1))")
+        ExpressionCost(length=17, tokens=11, depth=2)
+    """
+    parentheses = _NOT_PARENTHESIS.sub("", expression)
+    operators = (
+        expression.count("+") + expression.count("-") + expression.count("*") + expression.count("/")
+    )
+    opening = parentheses.count("(")
+    if opening <= 1:
+        # One group is a level deep unless a stray ")" comes before it
+        depth = int(parentheses.startswith("("))
+    else:
+        depth = max(0, max(accumulate(1 if char == "(" else -1 for char in parentheses)))
+    return ExpressionCost(len(expression), 2 * operators + len(parentheses) + 1, depth)
+
+
+def check_expression(expression, max_length=0, max_tokens=0, max_depth=0):
+    """
+    Reject an expression whose estimated cost is over a limit.
+
+    The length is checked before anything else is scanned, so oversized
+    input costs nothing more than reading it.
+
+    Args:
+        expression (str): The raw expression text
+        max_length (int): Maximum number of characters (0 means no limit)
+        max_tokens (int): Maximum estimated number of tokens (0 means no limit)
+        max_depth (int): Maximum parenthesis nesting (0 means no limit)
+
+    Returns:
+        ExpressionCost: The estimates, for deciding how to evaluate the expression
+
+    Raises:
+        LimitExceededError: Naming the first limit exceeded
+    """
+    if max_length and len(expression) > max_length:
+        raise LimitExceededError(
+            f"Expression of {len(expression)} characters exceeds the MAX_EXPRESSION_LENGTH limit of {max_length}",
+            "MAX_EXPRESSION_LENGTH", 413,
+        )
+    cost = estimate_cost(expression)
+    if max_tokens and cost.tokens > max_tokens:
+        raise LimitExceededError(
+            f"Expression of about {cost.tokens} tokens exceeds the MAX_TOKENS limit of {max_tokens}",
+            "MAX_TOKENS", 413,
+        )
+    if max_depth and cost.depth > max_depth:
+        raise LimitExceededError(
+            f"Nesting depth of {cost.depth} exceeds the MAX_NESTING_DEPTH limit of {max_depth}",
+            "MAX_NESTING_DEPTH", 422,
+        )
+    return cost
+
+
+class EvaluationBudget:
+    """
+    A cap on the work one evaluation may do.
+
+    Pass a budget to CompiledExpression.evaluate(); evaluation then checks
+    it every CHECK_INTERVAL nodes. A budget is started when it is created
+    (or by start()), so create one per evaluation.
+
+    Attributes:
+        max_steps (int): Maximum evaluation steps, one per visit to a node (0 means no limit)
+        max_seconds (float): Maximum evaluation time (0 means no limit)
+    """
+
+    CHECK_INTERVAL = 1024
+
+    __slots__ = ("max_steps", "max_seconds", "_deadline")
+
+    def __init__(self, max_steps=0, max_seconds=0.0):
+        self.max_steps = max_steps
+        self.max_seconds = max_seconds
+        self.start()
+
+    def start(self):
+        """
+        Restart the clock, e.g. after the budget was sent to a pool worker.
+
+        Returns:
+            EvaluationBudget: This budget
+        """
+        self._deadline = time.perf_counter() + self.max_seconds if self.max_seconds else None
+        return self
+
+    def check(self, steps):
+        """
+        Raise if the budget is spent.
+
+        Args:
+            steps (int): Steps taken so far
+
+        Raises:
+            LimitExceededError: If max_steps or max_seconds was exceeded
+        """
+        if self.max_steps and steps > self.max_steps:
+            raise LimitExceededError(
+                f"Evaluation exceeded the MAX_EVALUATION_STEPS limit of {self.max_steps}",
+                "MAX_EVALUATION_STEPS", 422,
+            )
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise LimitExceededError(
+                f"Evaluation exceeded the EVALUATION_BUDGET_SECONDS limit of {self.max_seconds}",
+                "EVALUATION_BUDGET_SECONDS", 422,
+            )
+
+    def __reduce__(self):
+        return (EvaluationBudget, (self.max_steps, self.max_seconds))
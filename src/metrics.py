@@ -0,0 +1,250 @@
+"""
+In-process metrics exposed in the Prometheus text format.
+
+Recording a value is a dictionary lookup and a few integer additions; the
+text exposition is only built when ``/metrics`` is scraped. Metrics are
+only updated from the event loop, so they need no locking.
+"""
+import time
+from bisect import bisect_left
+
+# Upper bounds (seconds) for latency histograms, from 1 microsecond to 10 seconds
+LATENCY_BUCKETS = (
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+    1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Upper bounds (characters) for expression size histograms
+SIZE_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """
+    A monotonically increasing count, optionally split by label values.
+
+    Attributes:
+        name (str): The metric name
+        documentation (str): The HELP text
+        labelnames (tuple): Label names; inc() takes one value per name
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def inc(self, *labelvalues, amount=1):
+        """
+        Add to the count for one combination of label values.
+
+        Args:
+            *labelvalues (str): One value per label name
+            amount (int or float): How much to add
+        """
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        """Get the current count for one combination of label values."""
+        return self._values.get(labelvalues, 0)
+
+    def clear(self):
+        self._values.clear()
+
+    def samples(self):
+        for labelvalues, value in sorted(self._values.items()):
+            yield self.name, _format_labels(self.labelnames, labelvalues), value
+
+
+class Gauge:
+    """
+    A value read from a callback at scrape time.
+
+    Attributes:
+        name (str): The metric name
+        documentation (str): The HELP text
+        read (Callable[[], float]): Returns the current value
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, read):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def clear(self):
+        pass
+
+    def samples(self):
+        yield self.name, "", self.read()
+
+
+class Histogram:
+    """
+    Counts of observed values in cumulative buckets, optionally split by label values.
+
+    Each observation is stored in exactly one bucket; the cumulative counts
+    Prometheus expects are computed when the histogram is rendered.
+
+    Attributes:
+        name (str): The metric name
+        documentation (str): The HELP text
+        buckets (tuple): Sorted bucket upper bounds, without +Inf
+        labelnames (tuple): Label names; observe() takes one value per name
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+
+    def observe(self, value, *labelvalues):
+        """
+        Record one value.
+
+        Args:
+            value (float): The observed value
+            *labelvalues (str): One value per label name
+        """
+        series = self._series.get(labelvalues)
+        if series is None:
+            # One count per bucket, one for +Inf, then the sum
+            series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *labelvalues):
+        """Get the number of observations for one combination of label values."""
+        series = self._series.get(labelvalues)
+        return sum(series[:-1]) if series else 0
+
+    def clear(self):
+        self._series.clear()
+
+    def samples(self):
+        bounds = self.buckets + (float("inf"),)
+        for labelvalues, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), labelvalues + (_format_number(bound),))
+                yield self.name + "_bucket", labels, cumulative
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield self.name + "_sum", labels, series[-1]
+            yield self.name + "_count", labels, cumulative
+
+
+class Registry:
+    """A named collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """
+        Add a metric to the registry.
+
+        Args:
+            metric (Counter, Gauge or Histogram): The metric
+
+        Returns:
+            The metric, so registration can be chained with construction
+
+        Raises:
+            ValueError: If a metric with the same name is already registered
+        """
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, read):
+        return self.register(Gauge(name, documentation, read))
+
+    def histogram(self, name, documentation, buckets, labelnames=()):
+        return self.register(Histogram(name, documentation, buckets, labelnames))
+
+    def clear(self):
+        """Reset every counter and histogram; gauges always read live values."""
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format (0.0.4).
+
+        Returns:
+            str: The exposition, ending with a newline
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class PhaseTimingMiddleware:
+    """
+    ASGI middleware that times the parts of a request outside the endpoint.
+
+    It stores the arrival time in ``scope["state"]["request_start"]`` so the
+    endpoint can measure how long reading and validating the body took. An
+    endpoint that sets ``scope["state"]["handler_end"]`` when it returns also
+    gets the time until the response starts, i.e. serialization, recorded
+    as the "serialize" phase.
+
+    Args:
+        app: The ASGI application to wrap
+        phases (Histogram): Histogram labelled by phase
+    """
+
+    def __init__(self, app, phases):
+        self.app = app
+        self.phases = phases
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        state = scope.setdefault("state", {})
+        state["request_start"] = time.perf_counter()
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                handler_end = state.get("handler_end")
+                if handler_end is not None:
+                    self.phases.observe(time.perf_counter() - handler_end, "serialize")
+            await send(message)
+
+        await self.app(scope, receive, timed_send)
@@ -0,0 +1,170 @@
+"""
+Numeric modes: the number type that expression literals and results use.
+
+- "auto" (the default) keeps expressions whose literals are all integers
+  in exact Python ``int`` arithmetic; a division, a decimal literal or a
+  variable bound to a float makes the result a float, as in Python.
+- "float" converts every literal to a binary ``float``.
+- "fraction" evaluates exactly with ``fractions.Fraction``.
+- "decimal" evaluates with ``decimal.Decimal`` rounded to a configurable
+  number of significant digits.
+"""
+import decimal
+import math
+from contextlib import nullcontext
+from fractions import Fraction
+
+try:
+    from .lexer import NUMBER
+except ImportError:
+    from lexer import NUMBER
+
+MODES = ("auto", "float", "fraction", "decimal")
+
+# Significant digits used by "decimal" mode unless another precision is given
+DEFAULT_PRECISION = 28
+
+# Longest integer result returned; Python refuses to convert much longer ints to text
+MAX_INT_DIGITS = 4000
+
+_LOG10_2 = 0.30103
+
+
+class NumericMode:
+    """
+    How the literals of an expression are converted and its operations computed.
+
+    Attributes:
+        name (str): One of MODES
+        precision (int or None): Significant digits, for "decimal" mode only
+        key (str): Identifies the mode in cache keys, e.g. "decimal:50"
+        exact (bool): Whether evaluation needs bound variables converted to
+            the mode's type and runs under the mode's context
+        context (decimal.Context or None): The arithmetic context, for "decimal" mode only
+    """
+
+    __slots__ = ("name", "precision", "key", "exact", "context")
+
+    def __init__(self, name="auto", precision=None):
+        if name not in MODES:
+            raise ValueError(f"Unknown numeric mode: {name}")
+        if precision is not None and name != "decimal":
+            raise ValueError("precision only applies to the decimal numeric mode")
+        if name == "decimal":
+            if precision is None:
+                precision = DEFAULT_PRECISION
+            if precision < 1:
+                raise ValueError("precision must be at least 1")
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "precision", precision)
+        object.__setattr__(self, "key", f"{name}:{precision}" if precision is not None else name)
+        object.__setattr__(self, "exact", name in ("fraction", "decimal"))
+        object.__setattr__(
+            self, "context", decimal.Context(prec=precision) if name == "decimal" else None
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError("NumericMode is immutable")
+
+    def literals(self, tokens):
+        """
+        Convert the number literals of an expression to this mode's type.
+
+        Args:
+            tokens (Tokens): The expression's tokens
+
+        Returns:
+            Sequence: The literal value at the index of every NUMBER token
+                (other indexes are unspecified), suitable as a parser's literals
+        """
+        if self.name == "float":
+            return tokens.values
+        if self.name == "auto":
+            # '.' can only appear inside a number, so this checks every literal at once
+            if "." in tokens.text:
+                return tokens.values
+            convert = int
+        elif self.name == "fraction":
+            convert = Fraction
+        else:
+            convert = self.context.create_decimal
+        return [convert(text) if kind == NUMBER else None for text, kind in zip(tokens.texts, tokens.kinds)]
+
+    def scope(self):
+        """
+        Get a context manager under which this mode's arithmetic is done.
+
+        Returns:
+            ContextManager: A local decimal context with the mode's
+                precision in "decimal" mode, a no-op otherwise
+        """
+        if self.context is None:
+            return nullcontext()
+        return decimal.localcontext(self.context)
+
+    def bind(self, variables):
+        """
+        Convert variable bindings to this mode's type.
+
+        Floats are converted from their shortest repr, so a binding of 0.1
+        means one tenth, as it was most likely written.
+
+        Args:
+            variables (Mapping[str, float]): The bindings
+
+        Returns:
+            Mapping: The converted bindings (the same mapping unless the mode is exact)
+        """
+        if self.name == "fraction":
+            return {name: Fraction(repr(value)) for name, value in variables.items()}
+        if self.name == "decimal":
+            create = self.context.create_decimal
+            return {name: create(repr(value)) for name, value in variables.items()}
+        return variables
+
+    def __eq__(self, other):
+        return isinstance(other, NumericMode) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __reduce__(self):
+        return (NumericMode, (self.name, self.precision))
+
+    def __repr__(self):
+        return f"NumericMode({self.key!r})"
+
+
+def format_number(value):
+    """
+    Convert a result to a JSON-compatible value.
+
+    Integers stay exact, whole floats become ints, and exact results are
+    returned as strings so that no precision is lost on the way to the client.
+
+    Args:
+        value (int, float, Fraction or Decimal): The result
+
+    Returns:
+        int, float or str: The JSON-compatible result
+
+    Raises:
+        ValueError: If an integer result has more than MAX_INT_DIGITS digits,
+            or a float result overflowed to infinity (or to NaN)
+
+    Example:
+        >>> format_number(Fraction(1, 3))
+        '1/3'
+    """
+    if type(value) is int:
+        if value.bit_length() * _LOG10_2 > MAX_INT_DIGITS:
+            raise ValueError(f"Result has more than {MAX_INT_DIGITS} digits")
+        return value
+    if isinstance(value, (Fraction, decimal.Decimal)):
+        return str(value)
+    if not math.isfinite(value):
+        # inf - inf gives NaN, so NaN also means an intermediate result overflowed
+        raise ValueError("Result is too large")
+    if value == int(value):
+        return int(value)
+    return value
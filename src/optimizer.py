@@ -0,0 +1,220 @@
+"""
+Constant folding and common-subexpression elimination for compiled expressions.
+
+The tree is hash-consed into a DAG: structurally identical subtrees become
+one node, and every node whose operands are all constants is replaced by
+its value. The DAG is then flattened into a linear program in evaluation
+order, so each unique subexpression is computed once per evaluation and no
+recursion is needed however deep the original tree was.
+"""
+import math
+
+try:
+    from .expression_ast import BinaryOp, Negate, Number, Variable
+except ImportError:
+    from expression_ast import BinaryOp, Negate, Number, Variable
+
+# Instruction kinds; every instruction is a (kind, a, b, func) tuple
+CONSTANT = 0    # a: the value
+VARIABLE = 1    # a: the variable name
+NEGATE = 2      # a: operand slot
+BINARY = 3      # a, b: operand slots; func: the operator function
+
+
+class OptimizedExpression:
+    """
+    A compiled expression reduced to a program over its unique subexpressions.
+
+    It can be used wherever a CompiledExpression is evaluated: it has the
+    same ``source``, ``variables`` and ``evaluate()``.
+
+    Attributes:
+        source (str): The expression text the tree was compiled from
+        variables (frozenset): Names of the variables the expression refers to
+        program (tuple): Instructions in evaluation order; the last one is the result
+        nodes_before (int): Number of nodes in the original tree
+        nodes_after (int): Number of instructions left after optimization
+        folded (int): Number of operations computed at optimization time
+    """
+
+    __slots__ = ("source", "variables", "program", "nodes_before", "nodes_after", "folded")
+
+    def __init__(self, source, variables, program, nodes_before, folded):
+        object.__setattr__(self, "source", source)
+        object.__setattr__(self, "variables", variables)
+        object.__setattr__(self, "program", program)
+        object.__setattr__(self, "nodes_before", nodes_before)
+        object.__setattr__(self, "nodes_after", len(program))
+        object.__setattr__(self, "folded", folded)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("OptimizedExpression is immutable")
+
+    def evaluate(self, variables=None):
+        """
+        Evaluate the optimized expression.
+
+        Args:
+            variables (Mapping[str, float], optional): Values for the variables in the expression
+
+        Returns:
+            float: The result of evaluating the expression
+
+        Raises:
+            ValueError: If a variable in the expression has no value
+            ZeroDivisionError: If division by zero is attempted
+        """
+        if variables is None:
+            variables = {}
+        values = []
+        append = values.append
+        for kind, a, b, func in self.program:
+            if kind == BINARY:
+                try:
+                    append(func(values[a], values[b]))
+                except ZeroDivisionError:
+                    # Reported like CompiledExpression does, whatever the operand types
+                    raise ZeroDivisionError("division by zero") from None
+            elif kind == CONSTANT:
+                append(a)
+            elif kind == VARIABLE:
+                try:
+                    append(variables[a])
+                except KeyError:
+                    raise ValueError(f"Undefined variable: {a}") from None
+            else:
+                append(-values[a])
+        return values[-1]
+
+    def stats(self):
+        """
+        Report how much the optimization removed.
+
+        Returns:
+            dict: nodes_before, nodes_after and folded
+        """
+        return {"nodes_before": self.nodes_before, "nodes_after": self.nodes_after, "folded": self.folded}
+
+    def __reduce__(self):
+        return (OptimizedExpression, (self.source, self.variables, self.program, self.nodes_before, self.folded))
+
+    def __repr__(self):
+        return f"OptimizedExpression({self.source!r}, nodes={self.nodes_before}->{self.nodes_after})"
+
+
+def optimize(compiled):
+    """
+    Fold constants and merge identical subexpressions.
+
+    Operations on constants are computed once, here, except divisions by
+    zero, which are kept so that evaluation still raises at the same point.
+    Operands are never reordered, so evaluation order, and therefore which
+    error is raised first, is unchanged.
+
+    Args:
+        compiled (CompiledExpression): The expression to optimize
+
+    Returns:
+        OptimizedExpression: The equivalent program over unique subexpressions
+
+    Example:
+        >>> optimized = optimize(compile_expression("x * (1.5 + 2.25) + (1.5 + 2.25)"))
+        >>> optimized.stats()
+        {'nodes_before': 9, 'nodes_after': 4, 'folded': 2}
+    """
+    program = []
+    slots = {}
+    folded = 0
+    nodes_before = 0
+    # Slot of each finished operand, in post-order
+    results = []
+    # Each pending item is a node plus whether its operands are already on `results`
+    pending = [(compiled.root, False)]
+
+    def emit(key, instruction):
+        slot = slots.get(key)
+        if slot is None:
+            slot = slots[key] = len(program)
+            program.append(instruction)
+        results.append(slot)
+
+    def emit_constant(value):
+        # 2 == 2.0 and -0.0 == 0.0, so the type and the sign of a float are part of the key
+        sign = math.copysign(1.0, value) if type(value) is float else None
+        emit((CONSTANT, type(value), value, sign), (CONSTANT, value, None, None))
+
+    while pending:
+        node, ready = pending.pop()
+        node_type = type(node)
+        if node_type is BinaryOp:
+            if not ready:
+                pending.append((node, True))
+                pending.append((node.right, False))
+                pending.append((node.left, False))
+                continue
+            nodes_before += 1
+            right = results.pop()
+            left = results.pop()
+            left_instruction = program[left]
+            right_instruction = program[right]
+            if left_instruction[0] == CONSTANT and right_instruction[0] == CONSTANT:
+                try:
+                    value = node._func(left_instruction[1], right_instruction[1])
+                except ZeroDivisionError:
+                    pass
+                else:
+                    folded += 1
+                    emit_constant(value)
+                    continue
+            emit((BINARY, node.op, left, right), (BINARY, left, right, node._func))
+        elif node_type is Negate:
+            if not ready:
+                pending.append((node, True))
+                pending.append((node.operand, False))
+                continue
+            nodes_before += 1
+            operand = results.pop()
+            if program[operand][0] == CONSTANT:
+                folded += 1
+                emit_constant(-program[operand][1])
+            else:
+                emit((NEGATE, operand), (NEGATE, operand, None, None))
+        elif node_type is Number:
+            nodes_before += 1
+            emit_constant(node.value)
+        elif node_type is Variable:
+            nodes_before += 1
+            emit((VARIABLE, node.name), (VARIABLE, node.name, None, None))
+        else:
+            raise TypeError(f"Unsupported node type: {node_type.__name__}")
+
+    return OptimizedExpression(
+        compiled.source, compiled.variables, _prune(program, results[-1]), nodes_before, folded
+    )
+
+
+def _prune(program, root):
+    """Drop instructions only used by operations that were folded away, renumbering slots."""
+    live = [False] * len(program)
+    live[root] = True
+    for slot in range(root, -1, -1):
+        if live[slot]:
+            kind, a, b, _ = program[slot]
+            if kind == BINARY:
+                live[a] = live[b] = True
+            elif kind == NEGATE:
+                live[a] = True
+
+    renumbered = {}
+    pruned = []
+    for slot, instruction in enumerate(program):
+        if not live[slot]:
+            continue
+        kind, a, b, func = instruction
+        if kind == BINARY:
+            instruction = (kind, renumbered[a], renumbered[b], func)
+        elif kind == NEGATE:
+            instruction = (kind, renumbered[a], None, None)
+        renumbered[slot] = len(pruned)
+        pruned.append(instruction)
+    return tuple(pruned)
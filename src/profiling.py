@@ -0,0 +1,164 @@
+"""
+Profiling a single evaluation, to find out why a particular expression is slow.
+
+``profile_expression`` compiles and evaluates an expression from scratch,
+bypassing every cache, and reports the time spent in each phase together
+with the size and shape of the expression. It can also capture a cProfile
+profile of the whole evaluation, in the format ``pstats`` and tools like
+snakeviz read.
+
+Nothing here runs unless a profile is asked for, so normal requests pay
+nothing for it.
+"""
+import base64
+import cProfile
+import marshal
+import pstats
+import threading
+import time
+from contextlib import nullcontext
+
+try:
+    from .expression_ast import BinaryOp, Negate, compile_expression
+    from .lexer import tokenize
+    from .limits import estimate_cost
+    from .optimizer import optimize
+except ImportError:
+    from expression_ast import BinaryOp, Negate, compile_expression
+    from lexer import tokenize
+    from limits import estimate_cost
+    from optimizer import optimize
+
+PROFILE_MODES = ("timings", "cprofile")
+
+# Functions listed in a captured profile's summary, by cumulative time
+TOP_FUNCTIONS = 25
+
+# Only one profiler can be active per process (on Python 3.12 and later, per interpreter)
+_profiler_lock = threading.Lock()
+
+
+def tree_stats(root):
+    """
+    Count the nodes of an expression tree and measure its height.
+
+    Args:
+        root (Node): The root node
+
+    Returns:
+        tuple: (nodes, depth), where a tree of a single number has depth 1
+    """
+    nodes = 0
+    depth = 0
+    pending = [(root, 1)]
+    while pending:
+        node, level = pending.pop()
+        nodes += 1
+        if level > depth:
+            depth = level
+        node_type = type(node)
+        if node_type is BinaryOp:
+            pending.append((node.left, level + 1))
+            pending.append((node.right, level + 1))
+        elif node_type is Negate:
+            pending.append((node.operand, level + 1))
+    return nodes, depth
+
+
+def _summary(profiler):
+    stats = pstats.Stats(profiler).stats
+    top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+    return [
+        {
+            "function": f"{filename}:{line}({name})",
+            "calls": calls,
+            "total_seconds": total,
+            "cumulative_seconds": cumulative,
+        }
+        for (filename, line, name), (_, calls, total, cumulative, _) in top
+    ]
+
+
+def profile_expression(expression, variables=None, engine="iterative", numeric=None, budget=None, capture=False):
+    """
+    Compile and evaluate an expression from scratch, timing each phase.
+
+    The expression is optimized first if it has variables, as it would be
+    when cached. Like a cache entry, a constant expression is evaluated
+    within ``budget``.
+
+    Args:
+        expression (str): The normalized expression
+        variables (Mapping[str, float], optional): Values for its variables
+        engine (str): The parser engine passed to compile_expression
+        numeric (NumericMode, optional): The numeric mode passed to compile_expression
+        budget (EvaluationBudget, optional): Limits on evaluating a constant expression
+        capture (bool): Whether to also capture a cProfile profile
+
+    Returns:
+        tuple: (result, error, profile), where exactly one of result and error
+            is None, and profile is a dict of:
+            - mode: "cprofile" if captured, "timings" otherwise
+            - engine: The parser engine
+            - timings: Seconds spent in "lex", "parse", "optimize" (with
+              variables only) and "evaluate", as far as evaluation got
+            - tokens, nesting, depth, nodes: Token count, deepest parenthesis
+              nesting, tree height and number of tree nodes (None where
+              evaluation failed before they were known)
+            - pstats: With capture, the profile in the format of
+              ``cProfile.Profile.dump_stats()``, base64-encoded
+            - top: With capture, the functions with the most cumulative time
+
+    Raises:
+        LimitExceededError: If evaluation exceeds the budget
+    """
+    profile = {
+        "mode": "cprofile" if capture else "timings",
+        "engine": engine,
+        "timings": {},
+        "tokens": None,
+        "nesting": estimate_cost(expression).depth,
+        "depth": None,
+        "nodes": None,
+    }
+    # Counted apart from the timed phases, which lex again
+    try:
+        profile["tokens"] = len(tokenize(expression))
+    except ValueError:
+        pass
+
+    timings = profile["timings"]
+    result = error = tree = None
+    profiler = cProfile.Profile() if capture else None
+    with _profiler_lock if capture else nullcontext():
+        if profiler is not None:
+            profiler.enable()
+        try:
+            compiled = compile_expression(expression, engine, timings, numeric)
+            tree = compiled.root
+            if compiled.variables and (numeric is None or not numeric.exact):
+                start = time.perf_counter()
+                compiled = optimize(compiled)
+                timings["optimize"] = time.perf_counter() - start
+            start = time.perf_counter()
+            try:
+                if budget is not None and not compiled.variables:
+                    result = compiled.evaluate(budget=budget.start())
+                else:
+                    result = compiled.evaluate(variables)
+            finally:
+                timings["evaluate"] = time.perf_counter() - start
+        except (ValueError, ArithmeticError) as e:
+            error = e
+        finally:
+            if profiler is not None:
+                profiler.disable()
+
+    if tree is not None:
+        profile["nodes"], profile["depth"] = tree_stats(tree)
+    if profiler is not None:
+        profiler.create_stats()
+        profile["pstats"] = base64.b64encode(marshal.dumps(profiler.stats)).decode("ascii")
+        profile["top"] = _summary(profiler)
+    return result, error, profile
+
@@ -0,0 +1,281 @@
+"""
+Fast request decoding and response encoding for the API, in JSON or MessagePack.
+
+FastAPI turns an endpoint's return value into JSON by first walking it with
+``jsonable_encoder``, in pure Python, and then calling ``json.dumps``. It
+also parses a JSON body into Python objects before validating them against
+the request model. For the small payloads of ``/evaluate`` at high request
+rates, that overhead costs more than evaluating a cached expression.
+
+Here, request bodies are validated by pydantic-core directly from bytes, and
+responses are encoded in one pass, with orjson when it is installed. Both
+also speak MessagePack when the msgpack package is installed. A request
+body with a MessagePack ``Content-Type`` is decoded as MessagePack, and a
+response is encoded as MessagePack when the ``Accept`` header prefers it.
+WebSocket messages are JSON in text frames and MessagePack in binary ones.
+"""
+import json
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+# Media types accepted for MessagePack; the x- and vnd. forms predate the registered one
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack", "application/vnd.msgpack")
+
+# Media types in an Accept header that a JSON response satisfies
+_JSON_TYPES = (JSON, "application/*", "*/*")
+
+
+def _finite_list(values):
+    # JSON has no NaN or infinity, so elements without a finite value become null
+    results = values.tolist()
+    for index in np.flatnonzero(~np.isfinite(values)).tolist():
+        results[index] = None
+    return results
+
+
+def _default(value):
+    if isinstance(value, np.ndarray):
+        return _finite_list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def encode_json(content):
+    """
+    Encode a response body as compact JSON.
+
+    Args:
+        content: dicts, lists, str, int, float, bool, None and float NumPy
+            arrays, whose non-finite elements are encoded as null
+
+    Returns:
+        bytes: UTF-8 JSON
+
+    Example:
+        >>> encode_json({"expression": "2 + 2", "result": 4})
+        b'{"expression":"2 + 2","result":4}'
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            # orjson only encodes integers up to 64 bits; exact results can be far longer
+            pass
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _msgpack_default(value):
+    # msgpack only hands over integers that do not fit its 64 bits
+    if type(value) is int:
+        return str(value)
+    return _default(value)
+
+
+def encode_msgpack(content):
+    """
+    Encode a response body as MessagePack.
+
+    Integers beyond MessagePack's 64 bits are encoded as decimal strings,
+    the same way exact Fraction and Decimal results are.
+
+    Args:
+        content: The same values as encode_json() accepts
+
+    Returns:
+        bytes: The MessagePack encoding
+
+    Raises:
+        RuntimeError: If msgpack is not installed
+    """
+    if msgpack is None:
+        raise RuntimeError("MessagePack responses require the msgpack package")
+    return msgpack.packb(content, default=_msgpack_default)
+
+
+class FastJSONResponse(Response):
+    """A JSON response encoded by encode_json() instead of FastAPI's jsonable_encoder and json.dumps."""
+
+    media_type = JSON
+
+    def render(self, content):
+        return encode_json(content)
+
+
+class MsgpackResponse(Response):
+    """A MessagePack response encoded by encode_msgpack()."""
+
+    media_type = MSGPACK
+
+    def render(self, content):
+        return encode_msgpack(content)
+
+
+def _media_type(header):
+    return header.split(";", 1)[0].strip().lower()
+
+
+def prefers_msgpack(accept):
+    """
+    Decide from an Accept header whether to answer in MessagePack.
+
+    Args:
+        accept (str): The header, e.g. "application/msgpack, application/json;q=0.5"
+
+    Returns:
+        bool: True if msgpack is installed and a MessagePack type has a
+            positive quality no lower than that of any type JSON satisfies;
+            JSON is the default otherwise
+    """
+    if msgpack is None or "msgpack" not in accept:
+        return False
+    best_msgpack = best_json = 0.0
+    for part in accept.split(","):
+        media_type, _, parameters = part.partition(";")
+        media_type = media_type.strip().lower()
+        quality = 1.0
+        for parameter in parameters.split(";"):
+            name, _, value = parameter.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type in MSGPACK_TYPES:
+            best_msgpack = max(best_msgpack, quality)
+        elif media_type in _JSON_TYPES:
+            best_json = max(best_json, quality)
+    return best_msgpack > 0 and best_msgpack >= best_json
+
+
+def respond(request, content, status_code=200):
+    """
+    Encode a response body in the format the client asked for.
+
+    Args:
+        request (Request): The request being answered
+        content: The response body (see encode_json())
+        status_code (int): The HTTP status code
+
+    Returns:
+        Response: A MsgpackResponse if the Accept header prefers
+            MessagePack, a FastJSONResponse otherwise
+    """
+    response_class = MsgpackResponse if prefers_msgpack(request.headers.get("accept", "")) else FastJSONResponse
+    return response_class(content, status_code=status_code, headers={"Vary": "Accept"})
+
+
+async def read_model(request, model):
+    """
+    Read and validate a request body as JSON or, by its Content-Type, MessagePack.
+
+    Validation errors are reported as FastAPI reports them for a body
+    parameter: 422, with each error's location under "body".
+
+    Args:
+        request (Request): The request
+        model (type[BaseModel]): The request model
+
+    Returns:
+        BaseModel: The validated body
+
+    Raises:
+        HTTPException: 415 status code for a MessagePack body if msgpack is
+            not installed
+        RequestValidationError: If the body cannot be decoded or does not
+            match the model
+    """
+    body = await request.body()
+    try:
+        if _media_type(request.headers.get("content-type", "")) in MSGPACK_TYPES:
+            if msgpack is None:
+                raise HTTPException(status_code=415, detail="MessagePack bodies require the msgpack package")
+            try:
+                data = msgpack.unpackb(body)
+            except (ValueError, TypeError) as e:
+                raise RequestValidationError(
+                    [{"type": "msgpack_invalid", "loc": ("body",), "msg": f"Invalid MessagePack: {e}", "input": None}]
+                )
+            return model.model_validate(data)
+        return model.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
+
+
+def decode_frame(message):
+    """
+    Decode a WebSocket message: JSON from a text frame, MessagePack from a binary one.
+
+    Args:
+        message (dict): An ASGI "websocket.receive" message
+
+    Returns:
+        The decoded value
+
+    Raises:
+        ValueError: If the frame cannot be decoded, or is binary and msgpack
+            is not installed
+    """
+    text = message.get("text")
+    if text is not None:
+        return orjson.loads(text) if orjson is not None else json.loads(text)
+    if msgpack is None:
+        raise ValueError("Binary (MessagePack) messages require the msgpack package")
+    try:
+        return msgpack.unpackb(message.get("bytes") or b"")
+    except TypeError as e:
+        raise ValueError(str(e))
+
+
+def encode_frame(content, binary=False):
+    """
+    Encode a WebSocket message in the same format as the one it answers.
+
+    Args:
+        content: The message (see encode_json())
+        binary (bool): MessagePack in a binary frame if True, JSON in a text frame otherwise
+
+    Returns:
+        dict: An ASGI "websocket.send" message
+    """
+    if binary:
+        return {"type": "websocket.send", "bytes": encode_msgpack(content)}
+    return {"type": "websocket.send", "text": encode_json(content).decode("utf-8")}
+
+
+def request_body(model):
+    """
+    Describe a body read with read_model() for the OpenAPI schema.
+
+    Args:
+        model (type[BaseModel]): The request model
+
+    Returns:
+        dict: ``openapi_extra`` for the route, listing the JSON and MessagePack encodings
+    """
+    schema = model.model_json_schema()
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {media_type: {"schema": schema} for media_type in (JSON, MSGPACK)},
+        }
+    }
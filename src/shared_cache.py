@@ -0,0 +1,401 @@
+"""
+A result cache shared by every worker process on a host, kept on disk.
+
+The in-process ExpressionCache is duplicated in each uvicorn or gunicorn
+worker and empty after every restart. SharedCache is a second tier behind
+it: a SQLite database in WAL mode, which any number of processes can read
+while one writes, with no service to run. Entries outlive the processes
+that wrote them, so a restarted or newly added worker starts warm.
+
+Only outcomes that do not depend on variable bindings are shared:
+results of constant expressions and errors. Compiled trees stay in the
+process that built them. Values are stored as tagged text rather than
+pickles, so reading the file can never run code.
+"""
+import asyncio
+import decimal
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+
+try:
+    from .expression_cache import CacheEntry
+except ImportError:
+    from expression_cache import CacheEntry
+
+# Longest normalized expression stored; longer ones are cheaper to
+# evaluate again than to copy in and out of the database
+MAX_KEY_LENGTH = 4096
+
+# Entries written by one process between checks of the table size
+TRIM_INTERVAL = 256
+
+# Hits recorded by one process before their recency is written in one statement
+TOUCH_INTERVAL = 64
+
+# Background stores one process may have queued; further stores are dropped
+MAX_PENDING_STORES = 1024
+
+# Error types that can be stored; any other type is read back as ValueError
+_ERRORS = {
+    cls.__name__: cls
+    for cls in (
+        ValueError, ZeroDivisionError, OverflowError, ArithmeticError,
+        decimal.Overflow, decimal.InvalidOperation, decimal.DivisionByZero,
+    )
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    mode TEXT NOT NULL,
+    expression TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    used REAL NOT NULL,
+    UNIQUE (mode, expression)
+);
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+"""
+
+
+def encode_value(value):
+    """
+    Encode a result as a (kind, text) pair that round-trips exactly.
+
+    Args:
+        value (int, float, Fraction or Decimal): The result
+
+    Returns:
+        tuple: (kind, text) where kind is "i", "f", "q" or "d"
+
+    Raises:
+        TypeError: For any other type of value
+    """
+    if type(value) is int:
+        return "i", format(value, "x")
+    if type(value) is float:
+        return "f", value.hex()
+    if type(value) is Fraction:
+        return "q", f"{value.numerator:x}/{value.denominator:x}"
+    if type(value) is decimal.Decimal:
+        return "d", str(value)
+    raise TypeError(f"Cannot store a result of type {type(value).__name__}")
+
+
+def decode_value(kind, text):
+    """
+    Decode a result written by encode_value().
+
+    Args:
+        kind (str): "i", "f", "q" or "d"
+        text (str): The encoded value
+
+    Returns:
+        int, float, Fraction or Decimal: The result
+    """
+    if kind == "i":
+        return int(text, 16)
+    if kind == "f":
+        return float.fromhex(text)
+    if kind == "q":
+        numerator, denominator = text.split("/")
+        return Fraction(int(numerator, 16), int(denominator, 16))
+    if kind == "d":
+        return decimal.Decimal(text)
+    raise ValueError(f"Unknown value kind: {kind!r}")
+
+
+def _entry(kind, value):
+    if kind.startswith("e:"):
+        return CacheEntry(error=_ERRORS.get(kind[2:], ValueError)(value))
+    return CacheEntry(result=decode_value(kind, value))
+
+
+class SharedCache:
+    """
+    A bounded on-disk cache of expression outcomes, shared between processes.
+
+    Every process opens its own connection (a new one after a fork), and
+    lookups and stores are serialized within a process. The cache is an
+    optimization only: if the database is locked for longer than
+    ``busy_timeout`` or cannot be used at all, lookups miss and stores are
+    dropped, and the error is counted.
+
+    get() and put() block while SQLite waits for another process's write,
+    so an event loop should use lookup() and store() instead, which run
+    them on a thread of the cache's own, in the order they were called.
+
+    Recency is recorded when an entry is stored and when it is read, which
+    happens about once per entry per process because hits are kept in the
+    in-process cache in front. Reads only note the time, and the recency
+    of TOUCH_INTERVAL hits is written at once, so lookups from many
+    processes do not each take the write lock. Every TRIM_INTERVAL stores,
+    a process trims the least recently used entries beyond ``maxsize``, so
+    the table may briefly hold up to TRIM_INTERVAL entries more per process.
+
+    Attributes:
+        path (str): The database file
+        maxsize (int): Entries kept across all processes
+        busy_timeout (float): Seconds to wait for another process's write
+        hits (int): Lookups answered by this process
+        misses (int): Lookups that found nothing
+        errors (int): Lookups and stores that failed, including stores
+            dropped because MAX_PENDING_STORES were already queued
+        evictions (int): Entries trimmed by this process
+    """
+
+    def __init__(self, path, maxsize=1_000_000, busy_timeout=0.05):
+        if maxsize < 1:
+            raise ValueError("maxsize must be positive")
+        self.path = path
+        self.maxsize = maxsize
+        self.busy_timeout = busy_timeout
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.evictions = 0
+        self._stores = 0
+        self._pending_stores = 0
+        self._touched = {}
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        self._thread = None
+        self._thread_pid = None
+
+    def _connect(self):
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+        # A connection inherited across fork must not be used, or closed, by the child
+        connection = sqlite3.connect(
+            self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(_SCHEMA)
+        self._connection = connection
+        self._pid = os.getpid()
+        return connection
+
+    def get(self, mode, expression):
+        """
+        Look up the outcome of an expression.
+
+        Args:
+            mode (str): The numeric mode's key
+            expression (str): The normalized expression
+
+        Returns:
+            CacheEntry or None: An entry without a compiled expression, or
+                None on a miss
+        """
+        if len(expression) > MAX_KEY_LENGTH:
+            return None
+        with self._lock:
+            try:
+                connection = self._connect()
+                row = connection.execute(
+                    "SELECT kind, value FROM results WHERE mode = ? AND expression = ?", (mode, expression)
+                ).fetchone()
+            except sqlite3.Error:
+                self.errors += 1
+                return None
+            if row is not None:
+                self._touched[mode, expression] = time.time()
+                if len(self._touched) >= TOUCH_INTERVAL:
+                    self._touch(connection)
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return _entry(*row)
+
+    def put(self, mode, expression, entry):
+        """
+        Store the outcome of an expression, if it can be shared.
+
+        Entries for expressions with variables are skipped: their cached
+        outcome is only the error for evaluating them unbound.
+
+        Args:
+            mode (str): The numeric mode's key
+            expression (str): The normalized expression
+            entry (CacheEntry): The entry built for it
+
+        Returns:
+            bool: Whether the entry was stored
+        """
+        if len(expression) > MAX_KEY_LENGTH:
+            return False
+        if entry.compiled is not None and entry.compiled.variables:
+            return False
+        if entry.error_type is not None:
+            kind, value = f"e:{entry.error_type.__name__}", entry.error_message
+        else:
+            try:
+                kind, value = encode_value(entry.result)
+            except TypeError:
+                return False
+
+        with self._lock:
+            try:
+                connection = self._connect()
+                connection.execute(
+                    "INSERT OR REPLACE INTO results (mode, expression, kind, value, used) VALUES (?, ?, ?, ?, ?)",
+                    (mode, expression, kind, value, time.time()),
+                )
+                self._stores += 1
+                if self._stores % TRIM_INTERVAL == 0:
+                    self._touch(connection)
+                    self._trim(connection)
+            except sqlite3.Error:
+                self.errors += 1
+                return False
+        return True
+
+    def _touch(self, connection):
+        # Write the recency of the hits noted since the last call
+        touched, self._touched = self._touched, {}
+        try:
+            connection.executemany(
+                "UPDATE results SET used = ? WHERE mode = ? AND expression = ?",
+                [(used, mode, expression) for (mode, expression), used in touched.items()],
+            )
+        except sqlite3.Error:
+            self.errors += 1
+
+    def _submit(self, func, *args):
+        if self._thread is None or self._thread_pid != os.getpid():
+            # Threads do not survive a fork, so a child starts its own
+            self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-cache")
+            self._thread_pid = os.getpid()
+        return self._thread.submit(func, *args)
+
+    async def lookup(self, mode, expression):
+        """
+        Like get(), but on the cache's thread, without blocking the event loop.
+
+        Args:
+            mode (str): The numeric mode's key
+            expression (str): The normalized expression
+
+        Returns:
+            CacheEntry or None: As for get()
+        """
+        return await asyncio.wrap_future(self._submit(self.get, mode, expression))
+
+    def store(self, mode, expression, entry):
+        """
+        Like put(), but in the background on the cache's thread.
+
+        Must be called from the event loop. Lookups made later are answered
+        after the store, so a process sees its own stores. Stores beyond
+        MAX_PENDING_STORES queued ones are dropped and counted as errors.
+
+        Args:
+            mode (str): The numeric mode's key
+            expression (str): The normalized expression
+            entry (CacheEntry): The entry built for it
+        """
+        if self._pending_stores >= MAX_PENDING_STORES:
+            self.errors += 1
+            return
+        loop = asyncio.get_running_loop()
+        self._pending_stores += 1
+        future = self._submit(self.put, mode, expression, entry)
+        future.add_done_callback(lambda _: self._stored(loop))
+
+    def _stored(self, loop):
+        # Runs on the cache's thread; count down on the event loop, which counts up
+        try:
+            loop.call_soon_threadsafe(self._decrement_pending)
+        except RuntimeError:
+            self._decrement_pending()
+
+    def _decrement_pending(self):
+        self._pending_stores -= 1
+
+    def _trim(self, connection):
+        excess = connection.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.maxsize
+        if excess > 0:
+            connection.execute(
+                "DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY used LIMIT ?)", (excess,)
+            )
+            self.evictions += excess
+
+    def recent(self, limit):
+        """
+        Read the most recently used entries, e.g. to warm an in-process cache at startup.
+
+        Args:
+            limit (int): Most entries to read
+
+        Returns:
+            list[tuple]: ((mode, expression), CacheEntry) pairs, least recent
+                first, so that putting them into an LRU cache in order leaves
+                the most recent ones as the last to be evicted
+        """
+        with self._lock:
+            try:
+                rows = self._connect().execute(
+                    "SELECT mode, expression, kind, value FROM results ORDER BY used DESC LIMIT ?", (limit,)
+                ).fetchall()
+            except sqlite3.Error:
+                self.errors += 1
+                return []
+        return [((mode, expression), _entry(kind, value)) for mode, expression, kind, value in reversed(rows)]
+
+    def __len__(self):
+        with self._lock:
+            try:
+                return self._connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            except sqlite3.Error:
+                self.errors += 1
+                return 0
+
+    def clear(self):
+        """Delete every entry, for all processes, and reset this process's counters."""
+        with self._lock:
+            self._connect().execute("DELETE FROM results")
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.evictions = 0
+
+    def close(self):
+        """
+        Finish queued stores, write the recency of recent hits and close
+        this process's connection; the next call opens a new one.
+        """
+        if self._thread is not None and self._thread_pid == os.getpid():
+            self._thread.shutdown(wait=True)
+        self._thread = None
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                if self._touched:
+                    self._touch(self._connection)
+                self._connection.close()
+            self._connection = None
+            self._touched = {}
+
+    def stats(self):
+        """
+        Report this process's counters and the shared table's size.
+
+        Returns:
+            dict: path, size, maxsize, hits, misses, errors, evictions and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -1,13 +1,63 @@
-#ONLY WORKS IF YOU HAVE API RUNNING 
+#ONLY WORKS IF YOU HAVE API RUNNING
+"""
+Command-line client for the expression API.
+
+Interactive mode (the default) evaluates one expression at a time. Bulk
+mode reads one expression per line from a file or stdin and sends them
+concurrently over a pool of keep-alive connections:
+
+    python src/simple_client.py --bulk expressions.txt --concurrency 64 --output results.ndjson
+    cat expressions.txt | python src/simple_client.py --bulk -
+
+With --websocket, both modes send expressions over one persistent
+WebSocket connection instead, with up to --concurrency of them in flight:
+
+    python src/simple_client.py --websocket --bulk expressions.txt --concurrency 256
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+
+import httpx
 import requests
 
-def evaluate_expression(expression):
+try:
+    from .api_client import SocketClient
+except ImportError:
+    from api_client import SocketClient
+
+API_URL = "http://localhost:8000"
+
+# Responses worth retrying: the server was overloaded or timed out, not the expression's fault
+RETRY_STATUSES = (429, 503, 504)
+
+def evaluate_expression(expression, session=None, url=API_URL, socket=None):
+    """
+    Evaluate one expression through the API.
+
+    Args:
+        expression (str): The mathematical expression
+        session (requests.Session, optional): Session whose connection is reused
+            across calls; a one-off connection is used if omitted
+        url (str): Base URL of the API
+        socket (SocketClient, optional): WebSocket connection to send the
+            expression over instead of an HTTP request
+
+    Returns:
+        int, float or str: The result, or an "Error: ..." message
+    """
     try:
-        response = requests.post(
-            "http://localhost:8000/evaluate",
+        if socket is not None:
+            outcome = socket.evaluate(expression)
+            return outcome["result"] if "result" in outcome else f"Error: {outcome['error']['detail']}"
+        response = (session or requests).post(
+            f"{url}/evaluate",
             json={"expression": expression}
         )
-        
+
         if response.status_code == 200:
             return response.json()["result"]
         else:
@@ -15,14 +65,252 @@ def evaluate_expression(expression):
     except Exception as e:
         return f"Error: {str(e)}"
 
-def main():
+async def post_with_retries(client, expression, retries, backoff=0.1):
+    """
+    POST one expression, retrying transport errors and overload responses.
+
+    Waits ``backoff * 2**attempt`` seconds between attempts, or the
+    server's Retry-After if it sent one in seconds. Any other failure, such
+    as a response that is not the API's JSON, is returned as the
+    expression's error without a retry, so one bad reply cannot end a bulk run.
+
+    Args:
+        client (httpx.AsyncClient): Client with the API as its base URL
+        expression (str): The mathematical expression
+        retries (int): Additional attempts after the first one
+        backoff (float): Initial delay between attempts, in seconds
+
+    Returns:
+        tuple: (record, attempts) where record is {"expression": ...} plus
+            "result" or "error", and attempts is the number of requests made
+    """
+    attempt = 0
     while True:
-        expression = input("Enter an expression (or 'quit' to exit): ")
-        if expression.lower() == 'quit':
-            break
-            
-        result = evaluate_expression(expression)
-        print(f"Result: {result}")
+        attempt += 1
+        try:
+            response = await client.post("/evaluate", json={"expression": expression})
+        except httpx.TransportError as e:
+            if attempt > retries:
+                return {"expression": expression, "error": f"{type(e).__name__}: {e}"}, attempt
+            delay = backoff * 2 ** (attempt - 1)
+        except httpx.HTTPError as e:
+            return {"expression": expression, "error": f"{type(e).__name__}: {e}"}, attempt
+        else:
+            if response.status_code == 200:
+                try:
+                    return {"expression": expression, "result": response.json()["result"]}, attempt
+                except (ValueError, KeyError, TypeError) as e:
+                    return {"expression": expression, "error": f"Invalid response: {type(e).__name__}: {e}"}, attempt
+            if response.status_code not in RETRY_STATUSES or attempt > retries:
+                return {"expression": expression, "error": _detail(response)}, attempt
+            delay = _retry_after(response)
+            if delay is None:
+                delay = backoff * 2 ** (attempt - 1)
+        await asyncio.sleep(delay)
+
+def _retry_after(response):
+    # Retry-After may also be an HTTP date, which falls back to the exponential backoff
+    try:
+        delay = float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+    return delay if math.isfinite(delay) and delay >= 0 else None
+
+def _numbered(lines):
+    numbered = ((number, line.strip()) for number, line in enumerate(lines, 1))
+    return ((number, line) for number, line in numbered if line)
+
+def _bulk_stats(latencies, counts, elapsed):
+    latencies.sort()
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] if latencies else 0.0
+
+    return {
+        "expressions": len(latencies),
+        "ok": counts["ok"],
+        "errors": counts["error"],
+        "requests": counts["requests"],
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "p99": percentile(0.99),
+    }
+
+def _detail(response):
+    try:
+        return response.json()["detail"]
+    except (ValueError, KeyError, TypeError):
+        return f"HTTP {response.status_code}"
+
+async def run_bulk(lines, client, concurrency=32, retries=3, output=None):
+    """
+    Evaluate every expression from ``lines`` with bounded concurrency.
+
+    Blank lines are skipped. Results are written to ``output`` as NDJSON
+    objects tagged with their input line number, in completion order.
+    Lines are read in a thread, so a slow input such as a pipe does not
+    stall the requests in flight.
+
+    Args:
+        lines (Iterable[str]): Input lines, read lazily
+        client (httpx.AsyncClient): Client with the API as its base URL
+        concurrency (int): Number of requests in flight at once
+        retries (int): Retries per expression for transport errors and 429/503/504
+        output (TextIO, optional): Where to write results; discarded if None
+
+    Returns:
+        dict: Throughput statistics (see format_stats())
+    """
+    numbered = _numbered(lines)
+    pending = asyncio.Queue(maxsize=concurrency)
+    latencies = []
+    counts = {"ok": 0, "error": 0, "requests": 0}
+
+    async def reader():
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await loop.run_in_executor(None, next, numbered, None)
+            if item is None:
+                break
+            await pending.put(item)
+        for _ in range(concurrency):
+            await pending.put(None)
+
+    async def worker():
+        while True:
+            item = await pending.get()
+            if item is None:
+                return
+            number, expression = item
+            start = time.perf_counter()
+            record, attempts = await post_with_retries(client, expression, retries)
+            latencies.append(time.perf_counter() - start)
+            counts["requests"] += attempts
+            counts["ok" if "result" in record else "error"] += 1
+            if output is not None:
+                output.write(json.dumps({"line": number, **record}) + "\n")
+
+    started = time.perf_counter()
+    await asyncio.gather(reader(), *(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return _bulk_stats(latencies, counts, elapsed)
+
+def run_bulk_socket(lines, socket, window=32, output=None):
+    """
+    Evaluate every expression from ``lines`` over one WebSocket connection.
+
+    Like run_bulk(), but with up to ``window`` expressions in flight on a
+    single connection instead of one request per expression. Every
+    expression is sent once; overload errors are reported, not retried.
+
+    Args:
+        lines (Iterable[str]): Input lines, read lazily
+        socket (SocketClient): The connection
+        window (int): Number of expressions in flight at once
+        output (TextIO, optional): Where to write results; discarded if None
+
+    Returns:
+        dict: Throughput statistics (see format_stats())
+    """
+    numbers = []
+    def expressions():
+        for number, expression in _numbered(lines):
+            numbers.append((number, expression))
+            yield expression
+
+    latencies = []
+    counts = {"ok": 0, "error": 0, "requests": 0}
+    started = time.perf_counter()
+    for index, outcome, seconds in socket.pipeline(expressions(), window):
+        number, expression = numbers[index]
+        latencies.append(seconds)
+        counts["requests"] += 1
+        if "result" in outcome:
+            counts["ok"] += 1
+            record = {"expression": expression, "result": outcome["result"]}
+        else:
+            counts["error"] += 1
+            record = {"expression": expression, "error": outcome["error"]["detail"]}
+        if output is not None:
+            output.write(json.dumps({"line": number, **record}) + "\n")
+    elapsed = time.perf_counter() - started
+    return _bulk_stats(latencies, counts, elapsed)
+
+def format_stats(stats):
+    """
+    Summarize bulk statistics for the terminal.
+
+    Args:
+        stats (dict): The return value of run_bulk()
+
+    Returns:
+        str: A multi-line summary
+    """
+    return (
+        f"{stats['expressions']} expressions in {stats['elapsed']:.2f}s "
+        f"({stats['throughput']:.0f}/s), {stats['ok']} ok, {stats['errors']} errors, "
+        f"{stats['requests'] - stats['expressions']} retries\n"
+        f"latency p50 {stats['p50'] * 1e3:.1f} ms, p90 {stats['p90'] * 1e3:.1f} ms, "
+        f"p99 {stats['p99'] * 1e3:.1f} ms"
+    )
+
+async def bulk_http(args, source, output):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        return await run_bulk(source, client, args.concurrency, args.retries, output)
+
+def bulk_main(args):
+    source = sys.stdin if args.bulk == "-" else open(args.bulk)
+    output = None
+    if args.output == "-":
+        output = sys.stdout
+    elif args.output:
+        output = open(args.output, "w")
+    try:
+        if args.websocket:
+            # The WebSocket client is synchronous and runs without an event loop
+            with SocketClient(args.url, args.timeout) as socket:
+                stats = run_bulk_socket(source, socket, args.concurrency, output)
+        else:
+            stats = asyncio.run(bulk_http(args, source, output))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output not in (None, sys.stdout):
+            output.close()
+    print(format_stats(stats), file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate expressions through the API")
+    parser.add_argument("--url", default=API_URL, help="Base URL of the API")
+    parser.add_argument("--bulk", metavar="FILE", help="Evaluate every line of FILE ('-' for stdin)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight at once in bulk mode")
+    parser.add_argument("--retries", type=int, default=3, help="Retries for connection errors and 429/503/504")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Per-request timeout in seconds")
+    parser.add_argument("--output", metavar="FILE", help="Write NDJSON results to FILE ('-' for stdout)")
+    parser.add_argument(
+        "--websocket", action="store_true", help="Send expressions over one WebSocket connection (/ws)"
+    )
+    args = parser.parse_args(argv)
+
+    if args.bulk:
+        bulk_main(args)
+        return
+
+    socket = SocketClient(args.url, args.timeout) if args.websocket else None
+    with requests.Session() as session:
+        try:
+            while True:
+                expression = input("Enter an expression (or 'quit' to exit): ")
+                if expression.lower() == 'quit':
+                    break
+
+                result = evaluate_expression(expression, session, args.url, socket)
+                print(f"Result: {result}")
+        finally:
+            if socket is not None:
+                socket.close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
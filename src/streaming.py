@@ -0,0 +1,93 @@
+"""
+Helpers for evaluating newline-delimited expressions from a streamed request body.
+"""
+import json
+
+from starlette.responses import StreamingResponse
+
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse whose body iterator consumes the request body itself.
+
+    The stock StreamingResponse may listen for client disconnects by calling
+    ``receive()`` while it streams, which would steal request body chunks
+    from an iterator that is still reading them. Here only the body iterator
+    calls ``receive()``; a disconnect surfaces through ``request.stream()``.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def ndjson_results(chunks, evaluate_line, max_line_bytes):
+    """
+    Turn a stream of body chunks into a stream of NDJSON result blocks.
+
+    Each complete input line is evaluated as soon as it arrives, and the
+    results for all lines completed by one chunk are yielded together. Only
+    the current partial line is buffered, so memory use does not grow with
+    the size of the input. The next chunk is not read until the previous
+    block has been sent, which propagates backpressure from a slow reader.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The request body, e.g. ``request.stream()``
+        evaluate_line (Callable[[str], Awaitable[dict]]): Builds the result object for one expression
+        max_line_bytes (int): Lines longer than this are rejected without being buffered
+
+    Yields:
+        bytes: One or more newline-terminated JSON objects
+    """
+    pending = b""
+    line_number = 0
+    oversized = False
+
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        output = []
+        for line in lines:
+            line_number += 1
+            if oversized:
+                oversized = False
+                output.append(_line_error(line_number, f"Line exceeds {max_line_bytes} bytes"))
+            else:
+                output.append(await _evaluate_raw_line(line_number, line, evaluate_line))
+        if len(pending) > max_line_bytes:
+            # Drop the partial line; its error is reported once the newline arrives
+            pending = b""
+            oversized = True
+        block = b"".join(item for item in output if item is not None)
+        if block:
+            yield block
+
+    if pending or oversized:
+        line_number += 1
+        if oversized:
+            last = _line_error(line_number, f"Line exceeds {max_line_bytes} bytes")
+        else:
+            last = await _evaluate_raw_line(line_number, pending, evaluate_line)
+        if last is not None:
+            yield last
+
+
+async def _evaluate_raw_line(line_number, line, evaluate_line):
+    try:
+        expression = line.decode("utf-8").strip()
+    except UnicodeDecodeError:
+        return _line_error(line_number, "Line is not valid UTF-8")
+    if not expression:
+        return None
+    return _encode({"line": line_number, **(await evaluate_line(expression))})
+
+
+def _line_error(line_number, detail):
+    return _encode({"line": line_number, "error": {"type": "invalid_expression", "detail": detail}})
+
+
+def _encode(item):
+    return json.dumps(item, separators=(",", ":")).encode("utf-8") + b"\n"
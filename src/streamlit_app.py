@@ -1,32 +1,186 @@
+import pandas as pd
 import streamlit as st
 import requests
 
-st.title("Mathematical Expression Evaluator")
+try:
+    from .api_client import API_URL, SocketClient, cacheable, evaluate_many, make_session
+    from .expression_ast import normalize_expression
+    from .expression_cache import ExpressionCache
+except ImportError:
+    from api_client import API_URL, SocketClient, cacheable, evaluate_many, make_session
+    from expression_ast import normalize_expression
+    from expression_cache import ExpressionCache
 
-# Input field for the expression
-expression = st.text_input("Enter a mathematical expression:", "2 * (3 + 4)")
+@st.cache_resource
+def get_session():
+    """One pooled, keep-alive session shared by every rerun and browser session."""
+    return make_session(pool_size=8)
 
-# Add some example expressions
+def get_result_cache():
+    """
+    The client-side result cache for this browser session.
 
+    Returns:
+        ExpressionCache: Normalized expression -> outcome
+    """
+    if "result_cache" not in st.session_state:
+        st.session_state["result_cache"] = ExpressionCache(maxsize=200_000)
+    return st.session_state["result_cache"]
+
+def get_socket():
+    """
+    This browser session's WebSocket connection to the API, opened on first use.
+
+    Returns:
+        SocketClient: The connection
+    """
+    if "socket" not in st.session_state:
+        st.session_state["socket"] = SocketClient(API_URL, timeout=5)
+    return st.session_state["socket"]
+
+def evaluate_over_socket(expression):
+    """
+    Evaluate one expression over this session's WebSocket connection.
+
+    A lost connection is dropped, so the next call opens a new one.
+
+    Args:
+        expression (str): The mathematical expression
+
+    Returns:
+        dict or None: {"result": ...} or {"error": {...}}, or None if the
+            connection failed
+    """
+    # Only loaded once the WebSocket toggle is used
+    from websockets.exceptions import WebSocketException
+
+    try:
+        outcome = get_socket().evaluate(expression)
+    except (OSError, TimeoutError, WebSocketException):
+        socket = st.session_state.pop("socket", None)
+        if socket is not None:
+            socket.close()
+        st.warning("Cannot reach the server's WebSocket endpoint. Please make sure the API is running.")
+        return None
+    if cacheable(outcome):
+        get_result_cache().put(normalize_expression(expression), outcome)
+    return outcome
+
+def single_expression_mode(use_socket=False):
+    # Input field for the expression
+    expression = st.text_input("Enter a mathematical expression:", "2 * (3 + 4)")
+
+    # Add some example expressions
+
+    if expression:  # Only evaluate if there's input
+        cache = get_result_cache()
+        outcome = cache.get(normalize_expression(expression))
+        if outcome is None and use_socket:
+            outcome = evaluate_over_socket(expression)
+            if outcome is None:
+                return
+        try:
+            if outcome is None:
+                # Make API call to the FastAPI endpoint
+                response = get_session().post(
+                    f"{API_URL}/evaluate",
+                    json={"expression": expression},
+                    timeout=5  # Add timeout to prevent hanging
+                )
+
+                if response.status_code == 200:
+                    outcome = {"result": response.json()["result"]}
+                    cache.put(normalize_expression(expression), outcome)
+                elif response.status_code == 400:
+                    outcome = {"error": {"detail": response.json()["detail"]}}
+                    cache.put(normalize_expression(expression), outcome)
+
+            if outcome is not None and "result" in outcome:
+                st.success(f"Result: {outcome['result']}")
+            else:
+                st.warning("Please check your expression and try again.")
+        except requests.exceptions.ConnectionError:
+            st.warning("Cannot connect to the server. Please make sure the API is running.")
+        except requests.exceptions.Timeout:
+            st.warning("Server request timed out. Please try again.")
+        except Exception:
+            st.warning("Please enter a valid mathematical expression.")
+
+def csv_upload_mode():
+    uploaded = st.file_uploader("Upload a CSV of expressions", type="csv")
+    if uploaded is None:
+        return
+
+    frame = pd.read_csv(uploaded, dtype=str, keep_default_na=False)
+    if frame.empty:
+        st.warning("The uploaded file has no rows.")
+        return
+    columns = list(frame.columns)
+    column = st.selectbox(
+        "Expression column", columns,
+        index=columns.index("expression") if "expression" in columns else 0,
+    )
+    # Batches over the server's limit are split by the client
+    batch_size = st.sidebar.number_input("Batch size", min_value=1, value=1000)
+    workers = st.sidebar.number_input("Parallel requests", min_value=1, max_value=8, value=4)
+
+    if st.button(f"Evaluate {len(frame)} rows"):
+        evaluate_csv(frame, column, int(batch_size), int(workers))
+
+    # Kept in the session so the results survive the rerun a download triggers
+    results = st.session_state.get("csv_results")
+    if results is not None:
+        st.dataframe(results.head(1000))
+        st.download_button(
+            "Download results", results.to_csv(index=False), file_name="results.csv", mime="text/csv"
+        )
+
+def evaluate_csv(frame, column, batch_size, workers):
+    """
+    Evaluate one column of an uploaded CSV through the batch endpoint,
+    showing progress as batches complete.
+
+    Args:
+        frame (pandas.DataFrame): The uploaded rows
+        column (str): The column holding the expressions
+        batch_size (int): Expressions per request
+        workers (int): Requests in flight at once
+    """
+    progress = st.progress(0.0, text="Evaluating...")
+    def on_progress(done, total):
+        progress.progress(done / total if total else 1.0, text=f"Evaluated {done} of {total} distinct expressions")
 
-if expression:  # Only evaluate if there's input
     try:
-        # Make API call to the FastAPI endpoint
-        response = requests.post(
-            "http://localhost:8000/evaluate",
-            json={"expression": expression},
-            timeout=5  # Add timeout to prevent hanging
+        outcomes = evaluate_many(
+            get_session(), frame[column].tolist(), get_result_cache(),
+            url=API_URL, batch_size=batch_size, workers=workers, on_progress=on_progress,
         )
-        
-        if response.status_code == 200:
-            result = response.json()
-            st.success(f"Result: {result['result']}")
-        else:
-            st.warning("Please check your expression and try again.")
     except requests.exceptions.ConnectionError:
         st.warning("Cannot connect to the server. Please make sure the API is running.")
-    except requests.exceptions.Timeout:
-        st.warning("Server request timed out. Please try again.")
-    except Exception:
-        st.warning("Please enter a valid mathematical expression.")
+        return
+    except requests.exceptions.RequestException as e:
+        st.warning(f"Batch request failed: {e}")
+        return
+
+    frame = frame.copy()
+    frame["result"] = [outcome.get("result") for outcome in outcomes]
+    frame["error"] = [outcome["error"]["detail"] if "error" in outcome else None for outcome in outcomes]
+    errors = int(frame["error"].notna().sum())
+    st.success(f"Evaluated {len(frame)} rows ({errors} errors)")
+    st.session_state["csv_results"] = frame
+
+def main():
+    st.title("Mathematical Expression Evaluator")
+
+    mode = st.sidebar.radio("Mode", ["Single expression", "CSV upload"])
+    if mode == "CSV upload":
+        csv_upload_mode()
+    else:
+        use_socket = st.sidebar.checkbox(
+            "Keep a WebSocket connection open", help="Lower latency per expression than an HTTP request each"
+        )
+        single_expression_mode(use_socket)
 
+# Streamlit runs this file as __main__; importing it has no UI side effects
+if __name__ == "__main__":
+    main()
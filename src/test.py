@@ -1,32 +1,38 @@
+try:
+    from .lexer import LPAREN, MINUS, NUMBER, PLUS, RPAREN, SLASH, STAR, tokenize
+except ImportError:
+    from lexer import LPAREN, MINUS, NUMBER, PLUS, RPAREN, SLASH, STAR, tokenize
+
+
 class ExpressionEvaluator:
     def __init__(self):
         self.pos = 0
         self.expression = ""
+        self.tokens = None
     
     def parse_expression(self, expression):
         """Parse and evaluate a mathematical expression string."""
-        self.expression = expression.replace(" ", "")  # Remove spaces
+        self.expression = expression
+        self.tokens = tokenize(expression)
         self.pos = 0
         return self.parse_addition_subtraction()
     
-    def get_current_char(self):
-        """Get the current character in the expression."""
-        if self.pos < len(self.expression):
-            return self.expression[self.pos]
-        return None
+    def get_current_token(self):
+        """Get the kind of the current token."""
+        return self.tokens.kinds[self.pos]
     
     def parse_addition_subtraction(self):
         """Parse and evaluate addition and subtraction operations."""
         left = self.parse_multiplication_division()
         
-        while self.get_current_char() in ['+', '-']:
-            operator = self.get_current_char()
+        while self.get_current_token() in (PLUS, MINUS):
+            operator = self.get_current_token()
             self.pos += 1
             right = self.parse_multiplication_division()
             
-            if operator == '+':
+            if operator == PLUS:
                 left += right
-            else:  # operator == '-'
+            else:  # operator == MINUS
                 left -= right
                 
         return left
@@ -35,29 +41,27 @@ class ExpressionEvaluator:
         """Parse and evaluate multiplication and division operations."""
         left = self.parse_number_or_parentheses()
         
-        while self.get_current_char() in ['*', '/']:
-            operator = self.get_current_char()
+        while self.get_current_token() in (STAR, SLASH):
+            operator = self.get_current_token()
             self.pos += 1
             right = self.parse_number_or_parentheses()
             
-            if operator == '*':
+            if operator == STAR:
                 left *= right
-            else:  # operator == '/'
+            else:  # operator == SLASH
                 left /= right
                 
         return left
     
     def parse_number_or_parentheses(self):
         """Parse a number or an expression inside parentheses."""
-        char = self.get_current_char()
-        
         # Handle parentheses
-        if char == '(':
+        if self.get_current_token() == LPAREN:
             self.pos += 1
             result = self.parse_addition_subtraction()
             
             # Ensure closing parenthesis
-            if self.get_current_char() == ')':
+            if self.get_current_token() == RPAREN:
                 self.pos += 1
                 return result
             else:
@@ -69,30 +73,20 @@ class ExpressionEvaluator:
     
     def parse_number(self):
         """Parse a number from the expression."""
-        start_pos = self.pos
+        sign = 1.0
         
         # Handle negative numbers
-        if self.get_current_char() == '-':
-            self.pos += 1
-        
-        # Parse digits before decimal point
-        while self.get_current_char() and self.get_current_char().isdigit():
+        if self.get_current_token() == MINUS:
+            sign = -1.0
             self.pos += 1
         
-        # Parse decimal point and digits after it
-        if self.get_current_char() == '.':
-            self.pos += 1
-            if not self.get_current_char() or not self.get_current_char().isdigit():
-                raise ValueError("Invalid number format")
-            
-            while self.get_current_char() and self.get_current_char().isdigit():
-                self.pos += 1
-        
-        if self.pos == start_pos:
+        if self.get_current_token() != NUMBER:
             raise ValueError("Expected number")
         
-        # Convert the substring to a number
-        return float(self.expression[start_pos:self.pos])
+        # The lexer has already converted the literal
+        value = self.tokens.values[self.pos]
+        self.pos += 1
+        return sign * value
 
 
 def evaluate_expression(expression):
@@ -0,0 +1,88 @@
+import asyncio
+import httpx
+import pytest
+from src.admission import AdmissionController, AdmissionMiddleware, OverloadedError, RateLimiter, TokenBucket
+from src.metrics import Registry
+
+def make_app(controller, limiter=None, delay=0.05):
+    async def app(scope, receive, send):
+        await asyncio.sleep(delay)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+    shed = Registry().counter("shed", "Shed requests", labelnames=("reason",))
+    return AdmissionMiddleware(app, controller, limiter=limiter, shed=shed, retry_after=2), shed
+
+async def post_many(app, count, path="/evaluate"):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*(client.post(path) for _ in range(count)))
+
+def test_waiting_requests_get_a_slot_in_order():
+    async def run():
+        controller = AdmissionController(max_in_flight=1, max_queue=2, queue_timeout=1.0)
+        order = []
+
+        async def request(name):
+            await controller.acquire()
+            order.append(name)
+            await asyncio.sleep(0.01)
+            controller.release()
+
+        await asyncio.gather(*(request(name) for name in "abc"))
+        return order, controller.in_flight, controller.queued
+
+    assert asyncio.run(run()) == (["a", "b", "c"], 0, 0)
+
+def test_full_queue_sheds_with_retry_after():
+    controller = AdmissionController(max_in_flight=2, max_queue=1, queue_timeout=1.0)
+    app, shed = make_app(controller)
+    responses = asyncio.run(post_many(app, 5))
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [200, 200, 200, 503, 503]
+    refused = [response for response in responses if response.status_code == 503]
+    assert refused[0].headers["Retry-After"] == "2"
+    assert "overloaded" in refused[0].json()["detail"]
+    assert shed.value("queue_full") == 2
+    assert controller.in_flight == 0
+
+def test_queue_timeout():
+    async def run():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.01)
+        await controller.acquire()
+        with pytest.raises(OverloadedError) as excinfo:
+            await controller.acquire()
+        controller.release()
+        return excinfo.value.reason, controller.in_flight, controller.queued
+
+    assert asyncio.run(run()) == ("queue_timeout", 0, 0)
+
+def test_unlimited_and_uncontrolled_paths():
+    controller = AdmissionController(max_in_flight=0)
+    app, _ = make_app(controller)
+    assert all(response.status_code == 200 for response in asyncio.run(post_many(app, 10)))
+    controller = AdmissionController(max_in_flight=1, max_queue=0)
+    app, _ = make_app(controller)
+    assert all(response.status_code == 200 for response in asyncio.run(post_many(app, 3, path="/metrics")))
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=2, burst=2, now=0.0)
+    assert bucket.take(now=0.0) == 0 and bucket.take(now=0.0) == 0
+    assert bucket.take(now=0.0) == pytest.approx(0.5)
+    assert bucket.take(now=0.5) == 0
+
+def test_rate_limited_clients_get_429():
+    limiter = RateLimiter(rate=1, burst=2)
+    app, shed = make_app(AdmissionController(), limiter=limiter, delay=0)
+    responses = asyncio.run(post_many(app, 4))
+    assert sorted(response.status_code for response in responses) == [200, 200, 429, 429]
+    assert all(int(response.headers["Retry-After"]) >= 1 for response in responses if response.status_code == 429)
+    assert shed.value("rate_limited") == 2
+    # Other clients have their own bucket
+    assert limiter.check("another client") == 0
+
+def test_rate_limiter_forgets_old_clients():
+    limiter = RateLimiter(rate=1, burst=1, max_clients=2)
+    for client in ("a", "b", "c"):
+        limiter.check(client, now=0.0)
+    assert limiter.check("a", now=0.0) == 0
+    assert limiter.check("c", now=0.0) > 0
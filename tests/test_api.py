@@ -1,3 +1,5 @@
+import json
+import pytest
 from fastapi.testclient import TestClient
 from src.expression_api import app
 
@@ -23,4 +25,415 @@ def test_evaluate_division_by_zero():
         "/evaluate",
         json={"expression": "1/0"}
     )
-    assert response.status_code == 400 
\ No newline at end of file
+    assert response.status_code == 400 
+
+def test_repeated_expressions_hit_the_cache():
+    client.post("/evaluate", json={"expression": "7 * 6"})
+    before = client.get("/cache/stats").json()
+    response = client.post("/evaluate", json={"expression": " 7*6 "})
+    assert response.json() == {"expression": " 7*6 ", "result": 42}
+    after = client.get("/cache/stats").json()
+    assert after["hits"] == before["hits"] + 1
+
+def test_errors_are_cached():
+    client.post("/evaluate", json={"expression": "8 /"})
+    before = client.get("/cache/stats").json()
+    response = client.post("/evaluate", json={"expression": "8 /"})
+    assert response.status_code == 400
+    assert client.get("/cache/stats").json()["hits"] == before["hits"] + 1
+
+def test_evaluate_batch_preserves_order_and_reports_errors():
+    response = client.post(
+        "/evaluate/batch",
+        json={"expressions": ["1 + 1", "1/0", "2 +", "1+1", "2.5 * 2"]}
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [item["expression"] for item in results] == ["1 + 1", "1/0", "2 +", "1+1", "2.5 * 2"]
+    assert results[0]["result"] == 2
+    assert results[1]["error"]["type"] == "division_by_zero"
+    assert results[2]["error"]["type"] == "invalid_expression"
+    assert results[3]["result"] == 2
+    assert results[4]["result"] == 5
+
+def test_evaluate_batch_too_large(monkeypatch):
+    monkeypatch.setattr("src.config.MAX_BATCH_SIZE", 2)
+    response = client.post("/evaluate/batch", json={"expressions": ["1", "2", "3"]})
+    assert response.status_code == 413
+
+def test_evaluate_with_variables():
+    response = client.post(
+        "/evaluate",
+        json={"expression": "(a + b) * c", "variables": {"a": 1, "b": 2, "c": 3}}
+    )
+    assert response.json() == {"expression": "(a + b) * c", "result": 9}
+    assert client.post("/evaluate", json={"expression": "(a + b) * c"}).status_code == 400
+
+def test_evaluate_vectorized():
+    response = client.post(
+        "/evaluate/vectorized",
+        json={"expression": "a / (b - 1)", "columns": {"a": [1, 2, 3], "b": [2, 1, 4]}}
+    )
+    assert response.status_code == 200
+    assert response.json()["results"] == [1.0, None, 1.0]
+
+def test_evaluate_vectorized_error_policy():
+    response = client.post(
+        "/evaluate/vectorized",
+        json={"expression": "a / b", "columns": {"a": [1], "b": [0]}, "division_by_zero": "error"}
+    )
+    assert response.status_code == 400
+
+def test_evaluate_stream():
+    response = client.post("/evaluate/stream", content=b"2 + 2\n1 / 0\n\n2 *\n")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert items[0] == {"line": 1, "expression": "2 + 2", "result": 4}
+    assert items[1]["error"]["type"] == "division_by_zero"
+    assert items[2]["line"] == 4 and items[2]["error"]["type"] == "invalid_expression"
+
+def test_large_expression_is_evaluated_off_the_event_loop():
+    expression = " + ".join(["1"] * 400)
+    response = client.post("/evaluate", json={"expression": expression})
+    assert response.json()["result"] == 400
+
+def test_deeply_nested_expression():
+    expression = "(" * 2000 + "1 + 1" + ")" * 2000
+    response = client.post("/evaluate", json={"expression": expression})
+    assert response.json()["result"] == 2
+
+def test_metrics_endpoint():
+    from src.expression_api import evaluations_total, phase_seconds
+    ok_before = evaluations_total.value("ok")
+    errors_before = evaluations_total.value("division_by_zero")
+    client.post("/evaluate", json={"expression": "123 + 456 * 789"})
+    client.post("/evaluate", json={"expression": "5 / (2 - 2)"})
+    assert evaluations_total.value("ok") == ok_before + 1
+    assert evaluations_total.value("division_by_zero") == errors_before + 1
+    for phase in ("validate", "lex", "parse", "evaluate", "serialize"):
+        assert phase_seconds.count(phase) > 0
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'expression_phase_seconds_bucket{phase="parse",le="+Inf"}' in response.text
+    assert 'expression_evaluations_total{outcome="ok"}' in response.text
+    assert "expression_size_characters_count" in response.text
+
+def test_large_integers_stay_exact():
+    response = client.post("/evaluate", json={"expression": "9007199254740993 + 0"})
+    assert response.json()["result"] == 9007199254740993
+
+def test_numeric_modes():
+    response = client.post("/evaluate", json={"expression": "0.1 + 0.2", "numeric_mode": "fraction"})
+    assert response.json()["result"] == "3/10"
+    response = client.post("/evaluate", json={"expression": "1 / 3", "numeric_mode": "decimal", "precision": 5})
+    assert response.json()["result"] == "0.33333"
+    response = client.post("/evaluate", json={"expression": "1 / 3", "numeric_mode": "float"})
+    assert response.json()["result"] == 1 / 3
+
+def test_numeric_mode_is_part_of_the_cache_key():
+    client.post("/evaluate", json={"expression": "2 / 8"})
+    response = client.post("/evaluate", json={"expression": "2 / 8", "numeric_mode": "fraction"})
+    assert response.json()["result"] == "1/4"
+
+def test_invalid_numeric_mode(monkeypatch):
+    response = client.post("/evaluate", json={"expression": "1", "numeric_mode": "binary"})
+    assert response.status_code == 400
+    monkeypatch.setattr("src.config.MAX_DECIMAL_PRECISION", 100)
+    response = client.post("/evaluate", json={"expression": "1", "numeric_mode": "decimal", "precision": 101})
+    assert response.status_code == 400
+
+def test_batch_and_stream_numeric_modes():
+    response = client.post("/evaluate/batch", json={"expressions": ["1 / 3", "1 / 0"], "numeric_mode": "fraction"})
+    results = response.json()["results"]
+    assert results[0]["result"] == "1/3"
+    assert results[1]["error"]["type"] == "division_by_zero"
+    response = client.post("/evaluate/stream?numeric_mode=decimal&precision=3", content=b"2 / 3\n")
+    assert json.loads(response.text.splitlines()[0])["result"] == "0.667"
+
+def test_hot_expressions_are_compiled_to_code(monkeypatch):
+    from src.expression_api import codegen_total
+    monkeypatch.setattr("src.config.CODEGEN_THRESHOLD", 3)
+    before = codegen_total.value()
+    for x in range(5):
+        response = client.post("/evaluate", json={"expression": "x * 7 - hot", "variables": {"x": x, "hot": 1}})
+        assert response.json()["result"] == x * 7 - 1
+    assert codegen_total.value() == before + 1
+
+def test_expressions_sent_to_a_process_pool_are_not_compiled_to_code(monkeypatch):
+    from src.codegen import CodeExpression
+    from src.expression_api import executor, promote
+    from src.expression_ast import compile_expression
+    from src.expression_cache import CacheEntry
+    monkeypatch.setattr("src.config.CODEGEN_THRESHOLD", 1)
+    monkeypatch.setattr(executor, "mode", "process")
+    monkeypatch.setattr(executor, "inline_threshold", 4)
+    compiled = compile_expression("x * 7 - 1")
+    assert promote(CacheEntry(compiled)) is compiled
+    # Small enough to be evaluated inline
+    assert isinstance(promote(CacheEntry(compile_expression("x*7"))), CodeExpression)
+
+def test_expression_limits(monkeypatch):
+    monkeypatch.setattr("src.config.MAX_EXPRESSION_LENGTH", 50)
+    response = client.post("/evaluate", json={"expression": "1 + " * 20 + "1"})
+    assert response.status_code == 413
+    assert response.headers["X-Expression-Limit"] == "MAX_EXPRESSION_LENGTH"
+    monkeypatch.setattr("src.config.MAX_NESTING_DEPTH", 10)
+    response = client.post("/evaluate", json={"expression": "(" * 11 + "1" + ")" * 11})
+    assert response.status_code == 422
+    assert "MAX_NESTING_DEPTH" in response.json()["detail"]
+    response = client.post("/evaluate/batch", json={"expressions": ["1 + 1", "(" * 11 + "1" + ")" * 11]})
+    results = response.json()["results"]
+    assert results[0]["result"] == 2
+    assert results[1]["error"]["type"] == "limit_exceeded"
+
+def test_evaluation_budget(monkeypatch):
+    monkeypatch.setattr("src.config.MAX_EVALUATION_STEPS", 1000)
+    response = client.post("/evaluate", json={"expression": " - ".join(["3"] * 3000)})
+    assert response.status_code == 422
+    assert response.headers["X-Expression-Limit"] == "MAX_EVALUATION_STEPS"
+
+def test_long_input_is_rerouted_from_the_recursive_engine(monkeypatch):
+    monkeypatch.setattr("src.config.PARSER_ENGINE", "recursive")
+    response = client.post("/evaluate", json={"expression": " + ".join(["2"] * 5000)})
+    assert response.json()["result"] == 10000
+
+def test_too_many_digits():
+    response = client.post("/evaluate", json={"expression": " * ".join(["9" * 100] * 50)})
+    assert response.status_code == 400
+
+def test_division_by_zero_message_does_not_depend_on_operand_types():
+    for body in (
+        {"expression": "1 / 0"},
+        {"expression": "1.5 / 0"},
+        {"expression": "x / y", "variables": {"x": 1, "y": 0}},
+        {"expression": "x / (y - 1)", "variables": {"x": 1.5, "y": 1}},
+    ):
+        assert client.post("/evaluate", json=body).json()["detail"] == "division by zero", body
+
+def test_float_overflow():
+    expression = "1" + "0" * 308 + ".5 * 10"
+    response = client.post("/evaluate", json={"expression": expression})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Result is too large"
+    response = client.post("/evaluate/batch", json={"expressions": [expression + " - " + expression]})
+    assert response.json()["results"][0]["error"]["detail"] == "Result is too large"
+
+def test_admission_metrics_are_exported():
+    text = client.get("/metrics").text
+    assert "expression_admission_in_flight 0" in text
+    assert "expression_admission_queue_depth 0" in text
+    assert "# TYPE expression_requests_shed_total counter" in text
+
+def test_shared_cache_answers_after_in_process_cache_is_lost(monkeypatch, tmp_path):
+    from src import expression_api
+    from src.shared_cache import SharedCache
+    monkeypatch.setattr(expression_api, "shared_cache", SharedCache(str(tmp_path / "shared.sqlite")))
+    client.post("/evaluate", json={"expression": "6 * 7 + 1000"})
+    client.post("/evaluate", json={"expression": "x * 7 + 1000", "variables": {"x": 1}})
+    # A restarted or different worker: empty in-process cache, same shared file
+    expression_api.expression_cache.clear()
+    response = client.post("/evaluate", json={"expression": "6*7 + 1000"})
+    assert response.json()["result"] == 1042
+    stats = client.get("/cache/stats").json()["shared"]
+    assert stats["hits"] == 1 and stats["size"] == 1
+    # Warm start fills the in-process cache from the shared one
+    expression_api.expression_cache.clear()
+    with TestClient(app):
+        pass
+    assert len(expression_api.expression_cache) == 1
+
+def test_vectorized_evaluates_constants_from_the_shared_cache(monkeypatch, tmp_path):
+    from src import expression_api
+    from src.shared_cache import SharedCache
+    monkeypatch.setattr(expression_api, "shared_cache", SharedCache(str(tmp_path / "shared.sqlite")))
+    body = {"expression": "2 + 3", "columns": {"x": [1.0, 2.0]}}
+    assert client.post("/evaluate/vectorized", json=body).json()["results"] == [5.0]
+    # Entries read back from the shared cache have no compiled expression
+    expression_api.expression_cache.clear()
+    expression_api.fingerprint_index.clear()
+    response = client.post("/evaluate/vectorized", json=body)
+    assert response.status_code == 200
+    assert response.json()["results"] == [5.0]
+    assert client.get("/cache/stats").json()["shared"]["hits"] == 1
+    assert client.post("/evaluate/vectorized", json={"expression": "2 +"}).status_code == 400
+
+def test_equivalent_expressions_share_a_cache_entry(monkeypatch):
+    from src import expression_api
+    monkeypatch.setattr("src.config.CANONICAL_CACHE", 1)
+    before = client.get("/cache/stats").json()["canonical"]["hits"]
+    assert client.post("/evaluate", json={"expression": "17 + 4 * 5"}).json()["result"] == 37
+    assert client.post("/evaluate", json={"expression": "(5*4) + 17"}).json()["result"] == 37
+    assert client.get("/cache/stats").json()["canonical"]["hits"] == before + 1
+
+    client.post("/evaluate", json={"expression": "z * 3 + 1", "variables": {"z": 1}})
+    response = client.post("/evaluate", json={"expression": "1 + 3*z", "variables": {"z": 2}})
+    assert response.json()["result"] == 7
+    cache = expression_api.expression_cache
+    assert cache.peek(("auto", "z*3+1")) is cache.peek(("auto", "1+3*z"))
+
+def test_canonical_cache_can_be_disabled(monkeypatch):
+    from src import expression_api
+    monkeypatch.setattr("src.config.CANONICAL_CACHE", 0)
+    client.post("/evaluate", json={"expression": "23 - 2 * 4"})
+    client.post("/evaluate", json={"expression": "23 - 4 * 2"})
+    cache = expression_api.expression_cache
+    assert cache.peek(("auto", "23-2*4")) is not cache.peek(("auto", "23-4*2"))
+
+def test_responses_are_compact_json():
+    response = client.post("/evaluate", json={"expression": "2 + 2"})
+    assert response.content == b'{"expression":"2 + 2","result":4}'
+    assert response.headers["content-type"] == "application/json"
+    response = client.post("/evaluate", json={"expression": " * ".join(["99999999999"] * 3)})
+    assert response.json()["result"] == 99999999999 ** 3
+
+def test_invalid_bodies_are_rejected_with_422():
+    response = client.post("/evaluate", json={"variables": {"x": 1}})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "expression"]
+    response = client.post("/evaluate/batch", content=b"{not json", headers={"Content-Type": "application/json"})
+    assert response.status_code == 422
+    assert "/evaluate" in app.openapi()["paths"]
+
+def test_msgpack_requests_and_responses():
+    msgpack = pytest.importorskip("msgpack")
+    headers = {"Content-Type": "application/msgpack", "Accept": "application/msgpack"}
+    response = client.post("/evaluate", content=msgpack.packb({"expression": "6 * 7"}), headers=headers)
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content) == {"expression": "6 * 7", "result": 42}
+    response = client.post(
+        "/evaluate/batch", content=msgpack.packb({"expressions": ["1 + 1", "1/0"]}), headers=headers
+    )
+    results = msgpack.unpackb(response.content)["results"]
+    assert results[0]["result"] == 2 and results[1]["error"]["type"] == "division_by_zero"
+    response = client.post(
+        "/evaluate/vectorized",
+        content=msgpack.packb({"expression": "a / b", "columns": {"a": [1, 2], "b": [2, 0]}}),
+        headers=headers,
+    )
+    assert msgpack.unpackb(response.content)["results"] == [0.5, None]
+    # JSON in, MessagePack out
+    response = client.post("/evaluate", json={"expression": "1 + 2"}, headers={"Accept": "application/msgpack"})
+    assert msgpack.unpackb(response.content)["result"] == 3
+    response = client.post("/evaluate", content=b"\x92\x01", headers=headers)
+    assert response.status_code == 422
+
+def test_msgpack_bodies_need_msgpack(monkeypatch):
+    monkeypatch.setattr("src.serialization.msgpack", None)
+    response = client.post("/evaluate", content=b"\x81", headers={"Content-Type": "application/msgpack"})
+    assert response.status_code == 415
+
+def test_websocket_answers_tagged_messages():
+    with client.websocket_connect("/ws") as websocket:
+        for tag, expression in enumerate(["1 + 1", "1 / 0", "2 *"]):
+            websocket.send_text(json.dumps({"id": tag, "expression": expression}))
+        websocket.send_text(json.dumps({"id": "v", "expression": "a * b", "variables": {"a": 6, "b": 7}}))
+        websocket.send_text(json.dumps({"id": "m", "expression": "1 / 3", "numeric_mode": "fraction"}))
+        replies = {reply["id"]: reply for reply in (websocket.receive_json() for _ in range(5))}
+    assert replies[0] == {"id": 0, "expression": "1 + 1", "result": 2}
+    assert replies[1]["error"]["type"] == "division_by_zero"
+    assert replies[2]["error"]["type"] == "invalid_expression"
+    assert replies["v"]["result"] == 42
+    assert replies["m"]["result"] == "1/3"
+
+def test_websocket_rejects_invalid_messages():
+    with client.websocket_connect("/ws") as websocket:
+        websocket.send_text("{not json")
+        assert websocket.receive_json()["error"]["type"] == "invalid_request"
+        websocket.send_text(json.dumps({"id": 7}))
+        assert websocket.receive_json() == {
+            "id": 7, "error": {"type": "invalid_request", "detail": "expression: Field required"}
+        }
+        websocket.send_text(json.dumps({"id": 8, "expression": "1", "numeric_mode": "roman"}))
+        assert websocket.receive_json()["error"]["detail"] == "Unknown numeric mode: roman"
+
+def test_websocket_replies_as_each_expression_finishes(monkeypatch):
+    import asyncio
+
+    async def evaluate_cached(expression, variables=None, numeric=None):
+        if expression == "slow":
+            await asyncio.sleep(0.2)
+        return len(expression)
+
+    monkeypatch.setattr("src.expression_api.evaluate_cached", evaluate_cached)
+    with client.websocket_connect("/ws") as websocket:
+        websocket.send_text(json.dumps({"id": 1, "expression": "slow"}))
+        websocket.send_text(json.dumps({"id": 2, "expression": "fast!"}))
+        assert [websocket.receive_json()["id"] for _ in range(2)] == [2, 1]
+
+def test_websocket_messages_are_rate_limited(monkeypatch):
+    from src import expression_api
+    from src.admission import RateLimiter
+    monkeypatch.setattr(expression_api, "rate_limiter", RateLimiter(rate=0.01, burst=2))
+    before = expression_api.shed_total.value("rate_limited")
+    with client.websocket_connect("/ws") as websocket:
+        for tag in range(3):
+            websocket.send_text(json.dumps({"id": tag, "expression": "1 + 1"}))
+            reply = websocket.receive_json()
+        assert reply["id"] == 2 and reply["error"]["type"] == "rate_limited"
+        assert reply["error"]["retry_after"] >= 1
+    assert expression_api.shed_total.value("rate_limited") == before + 1
+
+def test_websocket_messages_take_admission_slots(monkeypatch):
+    from src import expression_api
+    from src.admission import AdmissionController
+    controller = AdmissionController(max_in_flight=1, max_queue=0)
+    monkeypatch.setattr(expression_api, "admission", controller)
+    before = expression_api.shed_total.value("queue_full")
+    with client.websocket_connect("/ws") as websocket:
+        websocket.send_text(json.dumps({"id": 1, "expression": "2 * 3"}))
+        assert websocket.receive_json()["result"] == 6
+        assert controller.in_flight == 0
+        # Another request holds the only slot
+        controller.in_flight = 1
+        websocket.send_text(json.dumps({"id": 2, "expression": "2 * 3"}))
+        assert websocket.receive_json()["error"]["type"] == "overloaded"
+    assert expression_api.shed_total.value("queue_full") == before + 1
+
+def test_websocket_msgpack_frames():
+    msgpack = pytest.importorskip("msgpack")
+    with client.websocket_connect("/ws") as websocket:
+        websocket.send_bytes(msgpack.packb({"id": 1, "expression": "6 * 7"}))
+        assert msgpack.unpackb(websocket.receive_bytes()) == {"id": 1, "expression": "6 * 7", "result": 42}
+
+def test_profiles_are_disabled_by_default():
+    response = client.post("/evaluate", json={"expression": "1 + 1", "profile": "timings"})
+    assert response.status_code == 403
+    assert client.post("/evaluate", json={"expression": "1 + 1", "profile": "flame"}).status_code == 422
+
+def test_timings_profile(monkeypatch):
+    monkeypatch.setattr("src.config.PROFILING", "timings")
+    client.post("/evaluate", json={"expression": "(a + 2) * 3", "variables": {"a": 1}})
+    before = client.get("/cache/stats").json()
+    response = client.post("/evaluate", json={"expression": "(a + 2) * 3", "variables": {"a": 1}, "profile": "timings"})
+    body = response.json()
+    assert body["result"] == 9
+    profile = body["profile"]
+    assert set(profile["timings"]) == {"lex", "parse", "optimize", "evaluate", "serialize"}
+    assert (profile["tokens"], profile["nesting"], profile["depth"], profile["nodes"]) == (7, 1, 3, 5)
+    # Profiled evaluations bypass the cache
+    assert client.get("/cache/stats").json()["hits"] == before["hits"]
+    assert client.post("/evaluate", json={"expression": "1", "profile": "cprofile"}).status_code == 403
+
+def test_cprofile_profile(monkeypatch):
+    monkeypatch.setattr("src.config.PROFILING", "cprofile")
+    response = client.post("/evaluate", json={"expression": "1 / 0", "profile": "cprofile"})
+    assert response.status_code == 400
+    body = response.json()
+    assert body["detail"] == "division by zero"
+    assert body["profile"]["mode"] == "cprofile" and body["profile"]["pstats"]
+    response = client.post("/evaluate", json={"expression": "2 * 3", "profile": "timings"})
+    assert response.json()["profile"]["mode"] == "timings"
+    with client.websocket_connect("/ws") as websocket:
+        websocket.send_text(json.dumps({"id": 1, "expression": "1", "profile": "timings"}))
+        assert websocket.receive_json()["error"]["type"] == "invalid_request"
+
+def test_profiled_result_too_large_for_a_float(monkeypatch):
+    monkeypatch.setattr("src.config.PROFILING", "timings")
+    expression = "9" * 400 + ".5"
+    assert client.post("/evaluate", json={"expression": expression}).status_code == 400
+    response = client.post("/evaluate", json={"expression": expression, "profile": "timings"})
+    assert response.status_code == 400
+    assert "result" not in response.json() and response.json()["profile"]["mode"] == "timings"
@@ -0,0 +1,110 @@
+from fastapi.testclient import TestClient
+from src.api_client import SocketClient, cacheable, evaluate_many, post_batch, socket_url
+from src.expression_api import app
+from src.expression_cache import ExpressionCache
+
+client = TestClient(app)
+
+def test_evaluate_many_batches_dedupes_and_caches():
+    expressions = ["1 + 1", "1+1", "2 *", "3 * 4", " 3*4 ", "1 / 0", "5"]
+    cache = ExpressionCache(maxsize=100)
+    progress = []
+    outcomes = evaluate_many(
+        client, expressions, cache, url="http://testserver", batch_size=2, workers=1,
+        on_progress=lambda done, total: progress.append((done, total)),
+    )
+    assert [outcome.get("result") for outcome in outcomes] == [2, 2, None, 12, 12, None, 5]
+    assert outcomes[2]["error"]["type"] == "invalid_expression"
+    assert outcomes[5]["error"]["type"] == "division_by_zero"
+    # Five distinct expressions, sent two per batch
+    assert progress == [(0, 5), (2, 5), (4, 5), (5, 5)]
+
+    progress.clear()
+    again = evaluate_many(
+        client, expressions, cache, url="http://testserver",
+        on_progress=lambda done, total: progress.append((done, total)),
+    )
+    assert again == outcomes
+    assert progress == [(0, 0)]
+
+def test_transient_errors_are_not_cached(monkeypatch):
+    replies = iter([
+        [{"result": 2}, {"error": {"type": "overloaded", "detail": "busy"}}],
+        [{"result": 3}],
+    ])
+    monkeypatch.setattr("src.api_client.post_batch", lambda session, url, batch: next(replies))
+    cache = ExpressionCache(maxsize=100)
+    outcomes = evaluate_many(None, ["1 + 1", "1 + 2"], cache, workers=1)
+    assert outcomes[1]["error"]["type"] == "overloaded"
+    assert len(cache) == 1
+    # Only the expression that failed for lack of capacity is sent again
+    assert evaluate_many(None, ["1 + 1", "1 + 2"], cache, workers=1) == [{"result": 2}, {"result": 3}]
+
+def test_batches_over_the_server_limit_are_split(monkeypatch):
+    monkeypatch.setattr("src.config.MAX_BATCH_SIZE", 2)
+    expressions = [f"{n} + 1" for n in range(5)]
+    outcomes = evaluate_many(client, expressions, ExpressionCache(maxsize=100), url="http://testserver", batch_size=5)
+    assert outcomes == [{"result": n + 1} for n in range(5)]
+
+def test_batches_are_halved_without_a_size_hint(monkeypatch):
+    class Response:
+        def __init__(self, status_code, results=()):
+            self.status_code = status_code
+            self.headers = {}
+            self.results = results
+
+        def raise_for_status(self):
+            assert self.status_code == 200
+
+        def json(self):
+            return {"results": self.results}
+
+    class Session:
+        sizes = []
+
+        def post(self, url, json, timeout):
+            self.sizes.append(len(json["expressions"]))
+            if len(json["expressions"]) > 2:
+                return Response(413)
+            return Response(200, [{"result": int(expression)} for expression in json["expressions"]])
+
+    session = Session()
+    assert post_batch(session, "http://testserver", ["1", "2", "3", "4", "5"]) == [{"result": n} for n in range(1, 6)]
+    assert session.sizes == [5, 2, 2, 1]
+
+def test_cacheable():
+    assert cacheable({"result": 1})
+    assert cacheable({"error": {"type": "division_by_zero", "detail": ""}})
+    for kind in ("timeout", "overloaded", "limit_exceeded"):
+        assert not cacheable({"error": {"type": kind, "detail": ""}})
+
+
+class SessionConnection:
+    """Adapts the test client's WebSocket session to the interface of a websockets connection."""
+
+    def __init__(self, session):
+        self.session = session
+
+    def send(self, text):
+        self.session.send_text(text)
+
+    def recv(self, timeout=None):
+        return self.session.receive_text()
+
+    def close(self):
+        self.session.close()
+
+
+def test_socket_url():
+    assert socket_url("http://localhost:8000") == "ws://localhost:8000/ws"
+    assert socket_url("https://example.com/api/") == "wss://example.com/api/ws"
+
+def test_socket_client_evaluates_and_pipelines():
+    with client.websocket_connect("/ws") as session:
+        socket = SocketClient(connection=SessionConnection(session))
+        assert socket.evaluate("(a + b) * c", {"a": 1, "b": 2, "c": 3}) == {"result": 9}
+        assert socket.evaluate("1 / 0")["error"]["type"] == "division_by_zero"
+        expressions = [f"{n} * 2" for n in range(50)] + ["2 *"]
+        outcomes = {index: outcome for index, outcome, seconds in socket.pipeline(iter(expressions), window=8)}
+    assert [outcomes[n]["result"] for n in range(50)] == [n * 2 for n in range(50)]
+    assert outcomes[50]["error"]["type"] == "invalid_expression"
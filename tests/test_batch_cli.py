@@ -0,0 +1,95 @@
+import io
+import json
+
+import pytest
+
+from src.batch_cli import evaluate_file, evaluate_range, main, split_ranges
+from src.numeric import NumericMode
+
+LINES = ["1 + 2", "2 * (3 + 4)", "1 / 0", "2 +", "", "10 / 4", "  7  "]
+
+
+@pytest.fixture
+def input_file(tmp_path):
+    path = tmp_path / "expressions.txt"
+    path.write_text("\n".join(LINES * 50) + "\n")
+    return path
+
+
+def read_records(data):
+    return [json.loads(line) for line in data.decode().splitlines()]
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 7, 64, 10_000])
+def test_split_ranges_end_at_newlines_and_cover_input(chunk_bytes):
+    data = b"1+1\n22*3\n\n4/2\n5"
+    ranges = split_ranges(data, chunk_bytes)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start and data[end - 1:end] == b"\n"
+
+
+def test_split_ranges_empty():
+    assert split_ranges(b"", 10) == []
+
+
+def test_evaluate_range_one_record_per_line(input_file):
+    output, lines, errors = evaluate_range(str(input_file), 0, input_file.stat().st_size, NumericMode())
+    records = read_records(output)
+    assert lines == len(records) == len(LINES) * 50
+    assert records[:7] == [
+        {"result": 3},
+        {"result": 14},
+        {"error": {"type": "division_by_zero", "detail": "division by zero"}},
+        {"error": {"type": "invalid_expression", "detail": "Expected number"}},
+        {"error": {"type": "invalid_expression", "detail": "Expected number"}},
+        {"result": 2.5},
+        {"result": 7},
+    ]
+    assert errors == 3 * 50
+
+
+def test_evaluate_range_reports_invalid_utf8(tmp_path):
+    path = tmp_path / "bad.txt"
+    path.write_bytes(b"1 + 1\n\xff\xfe\n")
+    output, _, errors = evaluate_range(str(path), 0, path.stat().st_size, NumericMode(), "text")
+    assert output == b"2\nerror: Line is not valid UTF-8\n"
+    assert errors == 1
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_evaluate_file_keeps_input_order(input_file, workers):
+    expected, _, _ = evaluate_range(str(input_file), 0, input_file.stat().st_size, NumericMode())
+    output = io.BytesIO()
+    stats = evaluate_file(str(input_file), output, workers=workers, chunk_bytes=64)
+    assert output.getvalue() == expected
+    assert stats["lines"] == len(LINES) * 50
+    assert stats["errors"] == 3 * 50
+
+
+def test_evaluate_file_numeric_mode(tmp_path):
+    path = tmp_path / "exact.txt"
+    path.write_text("0.1 + 0.2\n1 / 3")
+    output = io.BytesIO()
+    evaluate_file(str(path), output, workers=1, numeric=NumericMode("fraction"), output_format="text")
+    assert output.getvalue() == b"3/10\n1/3\n"
+
+
+def test_evaluate_file_empty(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.write_bytes(b"")
+    output = io.BytesIO()
+    assert evaluate_file(str(path), output)["lines"] == 0
+    assert output.getvalue() == b""
+
+
+def test_main_writes_output_file(input_file, tmp_path, capsys):
+    target = tmp_path / "results.txt"
+    main([str(input_file), "--output", str(target), "--format", "text", "--workers", "2", "--chunk-mb", "0.0001"])
+    assert target.read_text().splitlines()[:3] == ["3", "14", "error: division by zero"]
+    assert "350 lines" in capsys.readouterr().err
+
+
+def test_main_rejects_precision_outside_decimal_mode(input_file):
+    with pytest.raises(SystemExit):
+        main([str(input_file), "--precision", "5"])
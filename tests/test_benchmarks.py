@@ -0,0 +1,23 @@
+from benchmarks.suite import find_regressions, median_results, run_case
+from benchmarks.workloads import WORKLOADS
+from src.expression_ast import compile_expression
+
+def test_workloads_are_deterministic():
+    for generator in WORKLOADS.values():
+        assert generator(count=5) == generator(count=5)
+
+def test_run_case_counts_errors():
+    result = run_case(lambda e: compile_expression(e).evaluate(), ["1 + 2", "1 / 0", "2 +"], min_time=0)
+    assert result["errors"] == 2
+    assert result["ops_per_sec"] > 0
+    assert result["p50_us"] <= result["p99_us"]
+
+def test_find_regressions():
+    baseline = {"a/x": {"ops_per_sec": 1000}, "b/x": {"ops_per_sec": 1000}}
+    results = {"a/x": {"ops_per_sec": 800}, "b/x": {"ops_per_sec": 700}, "c/x": {"ops_per_sec": 1}}
+    regressions = find_regressions(results, baseline, tolerance=0.25)
+    assert len(regressions) == 1 and regressions[0].startswith("b/x")
+
+def test_median_results():
+    runs = [{"a/x": {"ops_per_sec": ops}} for ops in (300, 100, 200)]
+    assert median_results(runs) == {"a/x": {"ops_per_sec": 200}}
@@ -0,0 +1,121 @@
+import math
+import random
+
+import pytest
+
+from src import canonical
+from src.canonical import canonical_form, fingerprint
+from src.expression_ast import compile_expression
+from src.numeric import NumericMode
+
+AUTO = NumericMode()
+FRACTION = NumericMode("fraction")
+
+
+def form(expression, numeric=AUTO, engine="iterative"):
+    return canonical_form(compile_expression(expression, engine, numeric=numeric))
+
+
+@pytest.mark.parametrize("spellings", [
+    ["2+3", "2 + 3", "(2+3)", "((3)+(2))", "3+2"],
+    ["2*x", "x*2", "(x)*(2)"],
+    ["2.50 * y", "y*2.5", "y * 02.5"],
+    ["007 - x", "7-x"],
+    ["(a+b)*c", "c*(b+a)"],
+    ["1+2+3", "3+(2+1)", "2+3+1"],
+])
+def test_equivalent_spellings_share_a_fingerprint(spellings):
+    fingerprints = {fingerprint(compile_expression(s, numeric=AUTO)) for s in spellings}
+    assert len(fingerprints) == 1
+
+
+@pytest.mark.parametrize("first, second", [
+    ("a+b+c", "a+(b+c)"),      # floats do not associate
+    ("x-y", "y-x"),
+    ("x/y", "y/x"),
+    ("2", "2.0"),              # exact int versus float in auto mode
+    ("1+2.0+3", "1+(2.0+3)"),
+])
+def test_different_computations_have_different_fingerprints(first, second):
+    assert fingerprint(compile_expression(first, numeric=AUTO)) != fingerprint(compile_expression(second, numeric=AUTO))
+
+
+def test_numeric_mode_is_part_of_the_fingerprint():
+    compiled = [compile_expression("1 / 3", numeric=mode) for mode in (AUTO, FRACTION, NumericMode("decimal", 5))]
+    assert len({fingerprint(c) for c in compiled}) == 3
+
+
+@pytest.mark.parametrize("expression, numeric, expected", [
+    ("((3 + 2)) * x", None, "(2.0+3.0)*x"),
+    ("c + b + a", AUTO, "a+(b+c)"),
+    ("c + b + a", FRACTION, "a+b+c"),
+    ("c * (b * a) * 0.5", FRACTION, "(1/2)*a*b*c"),
+    ("-(x + 1) * -2", AUTO, "-(1+x)*-2"),
+    ("a - (b - c)", AUTO, "a-(b-c)"),
+    ("(a - b) - c", AUTO, "a-b-c"),
+    ("4 * (3 + 2 + 1)", AUTO, "(1+2+3)*4"),
+])
+def test_canonical_form(expression, numeric, expected):
+    assert form(expression, numeric) == expected
+
+
+def test_fingerprint_is_stable():
+    # Fingerprints key shared caches and stored datasets, so they must not change between releases
+    assert fingerprint(compile_expression("3 + 2", numeric=AUTO)) == "9da4e2de23311e73079c812c77ae1c4d"
+
+
+def _random_expression(rng, depth):
+    roll = rng.random()
+    if depth == 0 or roll < 0.25:
+        return rng.choice(["1", "2", "3", "0.5", "0.1", "x", "y", "10", "2.5", "0"])
+    if roll < 0.3:
+        return f"-({_random_expression(rng, depth - 1)})"
+    left, right = _random_expression(rng, depth - 1), _random_expression(rng, depth - 1)
+    return f"({left}{rng.choice('+-*/')}{right})"
+
+
+def _outcome(compiled, variables):
+    try:
+        value = compiled.evaluate(variables)
+    except ZeroDivisionError:
+        return "division_by_zero"
+    return "nan" if isinstance(value, float) and math.isnan(value) else (type(value), value)
+
+
+@pytest.mark.parametrize("numeric", [None, AUTO, FRACTION, NumericMode("decimal", 6)])
+def test_canonical_form_evaluates_to_the_same_result(numeric):
+    rng = random.Random(7)
+    variables = {"x": 0.3, "y": -1e308}
+    for _ in range(500):
+        expression = _random_expression(rng, rng.randint(1, 6))
+        compiled = compile_expression(expression, numeric=numeric)
+        text = canonical_form(compiled)
+        if "#" in text:
+            continue
+        assert _outcome(compile_expression(text, numeric=numeric), variables) == _outcome(compiled, variables), (
+            expression, text
+        )
+
+
+def test_recursive_and_iterative_forms_agree():
+    rng = random.Random(11)
+    for numeric in (None, AUTO, FRACTION):
+        for _ in range(300):
+            compiled = compile_expression(_random_expression(rng, rng.randint(1, 8)), numeric=numeric)
+            exactness = canonical._exactness(numeric)
+            recursive = canonical._text(canonical._recursive_form(compiled.root, exactness))
+            assert recursive == canonical._text(canonical._iterative_form(compiled.root, exactness))
+
+
+def test_deep_and_long_expressions():
+    deep = "(" * 5000 + "x" + "+1)" * 5000
+    chain = "+".join(["x"] * 20_000)
+    for expression in (deep, chain):
+        text = form(expression)
+        assert "#" in text and len(text) <= canonical.MAX_FORM_LENGTH
+    assert form("+".join(str(n) for n in range(2000, 0, -1))) == form("+".join(str(n) for n in range(1, 2001)))
+
+
+def test_parsers_agree():
+    for expression in ("1 + 2 * (3 - x) / 4", "-(a * b) + c", "((2))"):
+        assert form(expression, engine="recursive") == form(expression, engine="iterative")
@@ -0,0 +1,58 @@
+import pickle
+from decimal import Decimal
+import pytest
+from src.codegen import CodeExpression, generate
+from src.expression_ast import compile_expression
+from src.numeric import NumericMode
+from src.optimizer import optimize
+from src.vectorized import evaluate_vectorized
+
+@pytest.mark.parametrize("expression", [
+    "x * (1.5 + 2.25) + x * y", "-(x - -y) / 4", "x - -0.0", "(x * 3) / (y - 1) + (x * 3) - (y - 1)", "x",
+])
+def test_matches_tree_evaluation(expression):
+    compiled = compile_expression(expression)
+    generated = generate(compiled)
+    for x, y in ((-2.0, 0.5), (0.5, 3.0), (7.0, -1.25)):
+        bindings = {"x": x, "y": y}
+        assert repr(generated.evaluate(bindings)) == repr(compiled.evaluate(bindings))
+
+def test_generated_source_has_no_expression_text():
+    generated = generate(compile_expression("x * 123456789012345678901234567890 + y", numeric=NumericMode("auto")))
+    assert "123456789012345678901234567890" not in generated.code
+    assert generated.evaluate({"x": 1, "y": 2}) == 123456789012345678901234567892
+
+def test_errors_match_the_original_form():
+    generated = generate(compile_expression("y / (x - 1) + z"))
+    with pytest.raises(ZeroDivisionError, match="^division by zero$"):
+        generated.evaluate({"x": 1.0, "y": 2.0})
+    with pytest.raises(ValueError, match="Undefined variable: z"):
+        generated.evaluate({"x": 2.0, "y": 2.0})
+
+def test_deep_expressions_compile():
+    source = "x"
+    for i in range(2000):
+        source = f"({source} + {i % 5} * y)"
+    compiled = compile_expression(source, "iterative")
+    bindings = {"x": 1.5, "y": 0.25}
+    assert generate(compiled).evaluate(bindings) == compiled.evaluate(bindings)
+
+def test_exact_numeric_modes():
+    compiled = compile_expression("1 / 3 + x", numeric=NumericMode("decimal", 6))
+    generated = generate(compiled)
+    assert generated.evaluate({"x": 0.1}) == Decimal("0.433333")
+    with pytest.raises(ZeroDivisionError, match="decimal division by zero"):
+        generate(compile_expression("x / 0", numeric=NumericMode("decimal"))).evaluate({"x": 1.0})
+
+def test_max_nodes():
+    with pytest.raises(ValueError):
+        generate(compile_expression(" + ".join(f"x * {i}" for i in range(100))), max_nodes=50)
+
+def test_pickle_regenerates():
+    generated = pickle.loads(pickle.dumps(generate(compile_expression("x * 2 - y"))))
+    assert isinstance(generated, CodeExpression)
+    assert generated.evaluate({"x": 4.0, "y": 1.0}) == 7.0
+
+def test_usable_as_an_optimized_expression():
+    generated = generate(optimize(compile_expression("x / 2 + 1")))
+    assert evaluate_vectorized(generated, {"x": [2.0, 4.0]}).values.tolist() == [2.0, 3.0]
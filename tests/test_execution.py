@@ -0,0 +1,50 @@
+import asyncio
+import threading
+import time
+import pytest
+from src.execution import EvaluationExecutor, EvaluationTimeoutError, ExecutorBusyError
+from src.expression_cache import build_entry
+
+def test_small_work_runs_inline():
+    executor = EvaluationExecutor(mode="thread", inline_threshold=10)
+    thread = asyncio.run(executor.run(5, threading.current_thread))
+    assert thread is threading.current_thread()
+
+def test_large_work_runs_in_pool():
+    executor = EvaluationExecutor(mode="thread", inline_threshold=10)
+    thread = asyncio.run(executor.run(50, threading.current_thread))
+    assert thread.name.startswith("evaluator")
+    executor.shutdown()
+
+def test_process_pool_returns_entries():
+    executor = EvaluationExecutor(mode="process", inline_threshold=0, max_workers=1)
+    entry = asyncio.run(executor.run(10, build_entry, "2*(3+4)"))
+    assert entry.result == 14
+    assert entry.compiled.evaluate() == 14
+    executor.shutdown()
+
+def test_timeout():
+    executor = EvaluationExecutor(mode="thread", inline_threshold=0, timeout=0.05)
+    with pytest.raises(EvaluationTimeoutError):
+        asyncio.run(executor.run(1, time.sleep, 0.5))
+    executor.shutdown()
+
+def test_bounded_queue():
+    executor = EvaluationExecutor(mode="thread", inline_threshold=0, max_workers=1, max_queue=1)
+
+    async def scenario():
+        first = asyncio.ensure_future(executor.run(1, time.sleep, 0.2))
+        second = asyncio.ensure_future(executor.run(1, time.sleep, 0.2))
+        await asyncio.sleep(0.01)
+        with pytest.raises(ExecutorBusyError):
+            await executor.run(1, time.sleep, 0)
+        await asyncio.gather(first, second)
+        await asyncio.sleep(0.01)
+        assert executor.pending == 0
+
+    asyncio.run(scenario())
+    executor.shutdown()
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        EvaluationExecutor(mode="fibers")
@@ -0,0 +1,101 @@
+import pytest
+from src.evaluator import ExpressionEvaluator
+from src.expression_ast import BinaryOp, Number, compile_expression, normalize_expression
+
+@pytest.mark.parametrize("expression,expected", [
+    ("2 + 2", 4),
+    ("2 * (3 + 4)", 14),
+    ("(3 + 5) * (2 - 1) / 4", 2),
+    ("-5 + 10", 5),
+    ("3.5 + 2.7", 6.2),
+    ("2 * (-3 + 4)", 2),
+    ("(-2) * (-3)", 6),
+    ("10 - 5 - 3", 2),
+    ("10 / 2 / 2", 2.5),
+    ("-(-3)", 3),
+    ("0.1 * (0.2 + 0.3)", 0.05),
+])
+@pytest.mark.parametrize("engine", ["recursive", "iterative"])
+def test_compiled_expressions(engine, expression, expected):
+    compiled = compile_expression(expression, engine)
+    assert abs(compiled.evaluate() - expected) < 1e-10
+    # Evaluating again reuses the tree and gives the same answer
+    assert compiled.evaluate() == compiled.evaluate()
+
+@pytest.mark.parametrize("expression", [
+    "2 + 2",
+    "(3 + 5) * (2 - 1) / 4",
+    "10 / 2 / 2",
+    "2.5 * (3.0 + 4.5)",
+])
+def test_compiled_matches_evaluator(expression):
+    assert compile_expression(expression).evaluate() == ExpressionEvaluator().parse_expression(expression)
+
+@pytest.mark.parametrize("expression", ["2 3", "(1) 2", "2 )"])
+def test_evaluator_rejects_trailing_tokens(expression):
+    with pytest.raises(ValueError, match="Unexpected token"):
+        ExpressionEvaluator().parse_expression(expression)
+
+@pytest.mark.parametrize("expression", [
+    "",
+    "2 + ",
+    "* 3",
+    "2 * (3 + 4",
+    "2 + + 2",
+    "3 ** 2",
+    ".5 + 2",
+    "2 * ()",
+    "2 * (3 + 4))",
+    "2..5",
+    "2 3",
+    "2a",
+])
+@pytest.mark.parametrize("engine", ["recursive", "iterative"])
+def test_invalid_expressions(engine, expression):
+    with pytest.raises(ValueError):
+        compile_expression(expression, engine)
+
+def test_division_by_zero_raised_on_evaluate():
+    compiled = compile_expression("2 / (3 - 3)")
+    with pytest.raises(ZeroDivisionError):
+        compiled.evaluate()
+
+def test_tree_shape_and_immutability():
+    compiled = compile_expression("1 - 2 * 3")
+    root = compiled.root
+    assert isinstance(root, BinaryOp) and root.op == '-'
+    assert isinstance(root.left, Number) and root.left.value == 1.0
+    assert root.right.op == '*'
+    with pytest.raises(AttributeError):
+        root.op = '+'
+    with pytest.raises(AttributeError):
+        compiled.root = Number(0.0)
+
+@pytest.mark.parametrize("expression,normalized", [
+    (" 2 +\t3 ", "2+3"),
+    ("2 * ( x + 3 )", "2*(x+3)"),
+    ("2  3", "2 3"),
+    ("a   b", "a b"),
+])
+def test_normalize_expression(expression, normalized):
+    assert normalize_expression(expression) == normalized
+
+def test_variables():
+    compiled = compile_expression("(a + b) * c")
+    assert compiled.variables == {"a", "b", "c"}
+    assert compiled.evaluate({"a": 1, "b": 2, "c": 4}) == 12
+    with pytest.raises(ValueError, match="Undefined variable: c"):
+        compiled.evaluate({"a": 1, "b": 2})
+
+@pytest.mark.parametrize("expression", [
+    "1 - 2 * 3",
+    "-(a - -2) / (3 * -b)",
+    "((1 + 2) * (3 - 4)) / 5 - 6",
+    "--3 * -x",
+])
+def test_engines_build_the_same_tree(expression):
+    assert repr(compile_expression(expression, "iterative").root) == repr(compile_expression(expression, "recursive").root)
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        compile_expression("1", engine="magic")
@@ -0,0 +1,69 @@
+import pytest
+from src.expression_cache import CacheEntry, ExpressionCache, build_entry
+
+def test_lru_evicts_least_recently_used():
+    cache = ExpressionCache(maxsize=2, policy="lru")
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+def test_fifo_evicts_oldest_inserted():
+    cache = ExpressionCache(maxsize=2, policy="fifo")
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+def test_counters():
+    cache = ExpressionCache(maxsize=4)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("missing")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 1, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+def test_zero_size_disables_cache():
+    cache = ExpressionCache(maxsize=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        ExpressionCache(policy="random")
+
+def test_cached_error_is_raised_again():
+    entry = CacheEntry(error=ZeroDivisionError("float division by zero"))
+    for _ in range(2):
+        with pytest.raises(ZeroDivisionError, match="float division by zero"):
+            entry.unwrap()
+
+def test_peek_does_not_count_or_refresh():
+    cache = ExpressionCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.peek("a") == 1 and cache.peek("missing") is None
+    cache.put("c", 3)
+    assert cache.peek("a") is None
+    assert cache.stats()["hits"] == cache.stats()["misses"] == 0
+
+def test_build_entry_reuses_an_equivalent_entry():
+    first = build_entry("x*2+1", canonical=True)
+    index = {first.fingerprint: first}
+    second = build_entry("1+2*x", canonical=True, known=index.get)
+    assert second.fingerprint == first.fingerprint
+    assert second.compiled is first.compiled
+    assert "canonicalize" in second.timings and "optimize" not in second.timings
+
+def test_build_entry_fingerprints_errors():
+    assert build_entry("1/0", canonical=True).fingerprint == build_entry("(1)/0", canonical=True).fingerprint
+    assert build_entry("1+", canonical=True).fingerprint is None
+    assert build_entry("1+2").fingerprint is None
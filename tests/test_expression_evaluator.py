@@ -1,9 +1,10 @@
 import pytest
+from src.evaluator import EngineEvaluator
 from src.streamlit_expression import ExpressionEvaluator
 
-@pytest.fixture
-def evaluator():
-    return ExpressionEvaluator()
+@pytest.fixture(params=["recursive", "iterative"])
+def evaluator(request):
+    return ExpressionEvaluator(engine=request.param)
 
 @pytest.mark.parametrize("expression,expected", [
     ("2 + 2", 4),
@@ -50,4 +51,15 @@ def test_valid_expressions(evaluator, expression, expected):
 ])
 def test_invalid_expressions(evaluator, expression):
     with pytest.raises((ValueError, ZeroDivisionError)):
-        evaluator.parse_expression(expression) 
\ No newline at end of file
+        evaluator.parse_expression(expression) 
+
+def test_division_by_zero_is_a_value_error(evaluator):
+    with pytest.raises(ValueError, match="Division by zero"):
+        evaluator.parse_expression("2 / (3 - 3)")
+
+@pytest.mark.parametrize("depth", [500, 5000])
+def test_deep_nesting_with_iterative_engine(depth):
+    evaluator = EngineEvaluator(engine="iterative")
+    assert evaluator.parse_expression("(" * depth + "1" + ")" * depth) == 1
+    assert evaluator.parse_expression("1 - (" * depth + "1" + ")" * depth) == (depth + 1) % 2
+    assert evaluator.parse_expression(" + ".join(["1"] * depth)) == depth
@@ -0,0 +1,91 @@
+import json
+import subprocess
+import sys
+import time
+
+import pytest
+
+CORE_MODULES = [
+    "src.evaluator",
+    "src.lexer",
+    "src.expression_ast",
+    "src.numeric",
+    "src.optimizer",
+    "src.codegen",
+    "src.limits",
+    "src.profiling",
+    "src.incremental",
+    "src.canonical",
+    "src.expression_cache",
+    "src.batch_cli",
+]
+
+FRONT_END_DEPENDENCIES = ["fastapi", "pydantic", "starlette", "streamlit", "numpy", "pandas", "httpx", "requests"]
+
+# Importing the core takes about as long as starting a bare interpreter, while
+# FastAPI and pydantic alone take several times as long. Comparing with the
+# machine's own startup time keeps the check meaningful on slow or busy
+# machines; the module set above is the precise check.
+MAX_IMPORT_STARTUPS = 3
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+@pytest.fixture(scope="module")
+def core_import():
+    # A fresh interpreter, since this one has already imported the front ends
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT.format(modules=CORE_MODULES)],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output)
+
+
+def test_core_imports_no_front_end_dependencies(core_import):
+    loaded = {name.split(".")[0] for name in core_import["modules"]}
+    assert loaded.isdisjoint(FRONT_END_DEPENDENCIES), loaded & set(FRONT_END_DEPENDENCIES)
+
+
+def interpreter_startup_seconds(runs=3):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def test_core_imports_quickly(core_import):
+    assert core_import["seconds"] < MAX_IMPORT_STARTUPS * interpreter_startup_seconds()
+
+
+def test_http_clients_do_not_import_websockets():
+    modules = ["src.api_client", "src.simple_client"]
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT.format(modules=modules)],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    assert "websockets" not in json.loads(output)["modules"]
+
+
+def test_front_end_evaluator_is_the_core_evaluator():
+    from src.evaluator import ExpressionEvaluator
+    from src.expression_api import ExpressionEvaluator as ApiEvaluator
+    assert ApiEvaluator is ExpressionEvaluator
+
+
+def test_streamlit_script_import_has_no_ui_side_effects():
+    pytest.importorskip("streamlit")
+    output = subprocess.run(
+        [sys.executable, "-c", "import src.streamlit_expression as m; print(callable(m.main))"],
+        capture_output=True, text=True, check=True,
+    )
+    assert output.stdout.strip() == "True"
+    assert "Warning: to view this Streamlit app" not in output.stderr
@@ -0,0 +1,50 @@
+import pytest
+from src.expression_ast import compile_expression
+from src.incremental import IncrementalEvaluator
+
+def outcome(evaluate):
+    try:
+        return evaluate()
+    except (ValueError, ZeroDivisionError) as e:
+        return type(e), str(e)
+
+EDITS = [
+    "2 * (3 + 4)",
+    "2 * (3 + 45)",
+    "2 * (3 + 45) - (1 / 0)",
+    "2 * (3 + 45) - (1 / 0",
+    "2 * (3 + 45) - (1 / 2)",
+    "2 * (3 + x) - (1 / 2)",
+    "(2 * (3 + 45)) - (1 / 2)",
+    "-(2 * (3 + 45)) - -(1 / 2)",
+    "-(2 * (3 + 45)) - -(1 / 2) (",
+    "",
+    "7",
+]
+
+def test_matches_full_evaluation_across_edits():
+    evaluator = IncrementalEvaluator()
+    for text in EDITS:
+        expected = outcome(lambda: compile_expression(text).evaluate())
+        assert outcome(lambda: evaluator.evaluate(text)) == expected, text
+
+def test_unchanged_groups_are_memoized():
+    groups = " + ".join(f"({i} * ({i} + 1))" for i in range(50))
+    evaluator = IncrementalEvaluator()
+    evaluator.evaluate(groups)
+    misses = evaluator.memo.misses
+    assert evaluator.evaluate(groups + " + 1") == pytest.approx(compile_expression(groups).evaluate() + 1)
+    # Every group is found in the memo, none is parsed again
+    assert evaluator.memo.misses == misses
+    assert evaluator.memo.hits >= 50
+
+def test_parse_errors_win_over_evaluation_errors():
+    evaluator = IncrementalEvaluator()
+    with pytest.raises(ZeroDivisionError):
+        evaluator.evaluate("(1 / 0) + 2")
+    with pytest.raises(ValueError, match="Expected number"):
+        evaluator.evaluate("(1 / 0) + ")
+
+def test_deep_nesting_falls_back_to_iterative_engine():
+    depth = 3000
+    assert IncrementalEvaluator().evaluate("(" * depth + "1" + ")" * depth) == 1.0
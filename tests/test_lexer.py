@@ -0,0 +1,53 @@
+import pytest
+from src.lexer import END, IDENTIFIER, LPAREN, MINUS, NUMBER, PLUS, RPAREN, STAR, retokenize, tokenize
+
+def test_token_buffers():
+    tokens = tokenize(" 2.5 * (x1 + 3) - x1")
+    assert list(tokens.kinds) == [NUMBER, STAR, LPAREN, IDENTIFIER, PLUS, NUMBER, RPAREN, MINUS, IDENTIFIER, END]
+    assert tokens.values[0] == 2.5 and tokens.values[5] == 3.0
+    assert tokens.names == ["x1"]
+    assert tokens.name_of(3) == tokens.name_of(8) == "x1"
+    assert len(tokens) == 9
+
+def test_spans():
+    tokens = tokenize("12 +  ab")
+    starts, ends = tokens.spans()
+    assert list(starts) == [0, 3, 6, 8]
+    assert list(ends) == [2, 4, 8, 8]
+    assert tokens.text_of(2) == "ab"
+
+def test_whitespace_separates_tokens():
+    assert list(tokenize("2 3").kinds) == [NUMBER, NUMBER, END]
+    assert list(tokenize("").kinds) == [END]
+
+@pytest.mark.parametrize("expression,message", [
+    ("2..5", "Invalid number format"),
+    (".5 + 2", "Invalid number format"),
+    ("2. + 1", "Invalid number format"),
+    ("2 % 3", "Unexpected character '%'"),
+])
+def test_invalid_input(expression, message):
+    with pytest.raises(ValueError, match=message):
+        tokenize(expression)
+
+@pytest.mark.parametrize("old,new", [
+    ("12 + 3", "123 + 3"),
+    ("2.5 * x", "2.x * x"),
+    ("1 + 2 + 3", "1 + 2"),
+    ("1 + 2", "(1 + 2) * y"),
+    ("a + bc", "a + b"),
+    ("", "2 * 3"),
+    ("2 * 3", ""),
+])
+def test_retokenize_matches_tokenize(old, new):
+    try:
+        expected = tokenize(new)
+    except ValueError as e:
+        with pytest.raises(ValueError, match=str(e)):
+            retokenize(tokenize(old), new)
+        return
+    tokens = retokenize(tokenize(old), new)
+    assert list(tokens.kinds) == list(expected.kinds)
+    assert list(tokens.values) == list(expected.values)
+    assert tokens.texts == expected.texts and tokens.names == expected.names
+    assert [list(span) for span in tokens.spans()] == [list(span) for span in expected.spans()]
@@ -0,0 +1,46 @@
+import pickle
+import pytest
+from src.expression_ast import compile_expression
+from src.expression_cache import build_entry
+from src.limits import EvaluationBudget, LimitExceededError, check_expression, estimate_cost
+
+def test_estimate_cost():
+    assert estimate_cost("2 * (3 + (4 - 1))") == (17, 11, 2)
+    assert estimate_cost("(1))((2)").depth == 1
+    assert estimate_cost("(1 + 2) * 3").depth == 1
+    assert estimate_cost(")1 + 2(").depth == 0
+    assert estimate_cost("1 + 2)").depth == 0
+    assert estimate_cost("") == (0, 1, 0)
+
+@pytest.mark.parametrize("expression, limits, limit, status_code", [
+    ("1 + 1", {"max_length": 4}, "MAX_EXPRESSION_LENGTH", 413),
+    ("1 + 1 + 1", {"max_tokens": 4}, "MAX_TOKENS", 413),
+    ("((1))", {"max_depth": 1}, "MAX_NESTING_DEPTH", 422),
+])
+def test_check_expression_names_the_limit(expression, limits, limit, status_code):
+    with pytest.raises(LimitExceededError, match=limit) as excinfo:
+        check_expression(expression, **limits)
+    assert excinfo.value.limit == limit
+    assert excinfo.value.status_code == status_code
+
+def test_check_expression_within_limits():
+    assert check_expression("(1 + 2)", max_length=7, max_tokens=5, max_depth=1).depth == 1
+
+def test_step_budget():
+    compiled = compile_expression(" + ".join(["1"] * 2000))
+    with pytest.raises(LimitExceededError, match="MAX_EVALUATION_STEPS"):
+        compiled.evaluate(budget=EvaluationBudget(max_steps=1000))
+    assert compiled.evaluate(budget=EvaluationBudget(max_steps=10_000)) == 2000
+
+def test_time_budget():
+    compiled = compile_expression(" * ".join(["99999999999999999999"] * 5000), "iterative")
+    with pytest.raises(LimitExceededError, match="EVALUATION_BUDGET_SECONDS"):
+        compiled.evaluate(budget=EvaluationBudget(max_seconds=1e-9))
+
+def test_budget_errors_are_not_cached():
+    with pytest.raises(LimitExceededError):
+        build_entry(" + ".join(["1"] * 2000), budget=EvaluationBudget(max_steps=100))
+
+def test_limit_errors_pickle():
+    error = pickle.loads(pickle.dumps(LimitExceededError("too deep", "MAX_NESTING_DEPTH", 422)))
+    assert (str(error), error.limit, error.status_code) == ("too deep", "MAX_NESTING_DEPTH", 422)
@@ -0,0 +1,41 @@
+import pytest
+from src.metrics import Registry
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency", (0.1, 1.0), labelnames=("phase",))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, "parse")
+    text = registry.render()
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{phase="parse",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{phase="parse",le="1"} 3' in text
+    assert 'latency_seconds_bucket{phase="parse",le="+Inf"} 4' in text
+    assert 'latency_seconds_sum{phase="parse"} 6.05' in text
+    assert 'latency_seconds_count{phase="parse"} 4' in text
+    assert histogram.count("parse") == 4
+
+def test_counter_and_gauge():
+    registry = Registry()
+    counter = registry.counter("requests_total", "Requests", labelnames=("outcome",))
+    counter.inc("ok")
+    counter.inc("ok")
+    counter.inc("timeout")
+    registry.gauge("queue_depth", "Queue depth", lambda: 3)
+    text = registry.render()
+    assert 'requests_total{outcome="ok"} 2' in text
+    assert 'requests_total{outcome="timeout"} 1' in text
+    assert 'queue_depth 3' in text
+    registry.clear()
+    assert counter.value("ok") == 0
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.counter("c", "C", labelnames=("name",)).inc('a"b\n')
+    assert 'c{name="a\\"b\\n"} 1' in registry.render()
+
+def test_duplicate_metric():
+    registry = Registry()
+    registry.counter("c", "C")
+    with pytest.raises(ValueError, match="Duplicate metric"):
+        registry.counter("c", "C")
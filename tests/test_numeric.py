@@ -0,0 +1,74 @@
+import pickle
+from decimal import Decimal
+from fractions import Fraction
+import pytest
+from src.expression_ast import compile_expression
+from src.expression_cache import build_entry
+from src.numeric import NumericMode, format_number
+from src.optimizer import optimize
+
+AUTO = NumericMode("auto")
+FRACTION = NumericMode("fraction")
+
+@pytest.mark.parametrize("engine", ["recursive", "iterative"])
+def test_auto_keeps_integer_expressions_exact(engine):
+    result = compile_expression("12345678901234567891 * 3 - -(1)", engine, numeric=AUTO).evaluate()
+    assert type(result) is int
+    assert result == 37037036703703703674
+
+def test_auto_falls_back_to_float():
+    assert compile_expression("7 / 2", numeric=AUTO).evaluate() == 3.5
+    result = compile_expression("1.5 + 2", numeric=AUTO).evaluate()
+    assert type(result) is float and result == 3.5
+
+@pytest.mark.parametrize("engine", ["recursive", "iterative"])
+def test_fraction_is_exact(engine):
+    compiled = compile_expression("0.1 + 0.2 - 1 / 3", engine, numeric=FRACTION)
+    assert compiled.evaluate() == Fraction(-1, 30)
+
+def test_fraction_converts_bindings_from_their_repr():
+    compiled = compile_expression("x * 3", numeric=FRACTION)
+    assert compiled.evaluate({"x": 0.1}) == Fraction(3, 10)
+
+def test_decimal_uses_the_requested_precision():
+    # Negative literals are folded at parse time, which must use the mode's precision too
+    compiled = compile_expression("-1.00000000000000000000000000000001 / 3", numeric=NumericMode("decimal", 40))
+    assert compiled.evaluate() == Decimal("-0.3333333333333333333333333333333366666667")
+    assert compile_expression("2 / 3", numeric=NumericMode("decimal", 5)).evaluate() == Decimal("0.66667")
+
+@pytest.mark.parametrize("mode", ["fraction", "decimal"])
+@pytest.mark.parametrize("expression", ["1 / 0", "0 / 0"])
+def test_exact_division_by_zero(mode, expression):
+    with pytest.raises(ZeroDivisionError, match=f"^{mode} division by zero$"):
+        compile_expression(expression, numeric=NumericMode(mode)).evaluate()
+
+def test_compiled_expression_pickles_with_its_mode():
+    compiled = compile_expression("1 / 3", numeric=NumericMode("decimal", 10))
+    assert pickle.loads(pickle.dumps(compiled)).evaluate() == Decimal("0.3333333333")
+
+def test_optimizer_keeps_int_and_float_constants_apart():
+    compiled = compile_expression("x * 2 + x * (4 / 2)", numeric=AUTO)
+    optimized = optimize(compiled)
+    assert optimized.evaluate({"x": 3}) == 12
+    assert optimized.nodes_after == 6
+
+def test_build_entry_in_fraction_mode():
+    entry = build_entry("x+1/3", numeric=FRACTION)
+    assert entry.error_type is ValueError
+    assert entry.compiled.evaluate({"x": 1.0}) == Fraction(4, 3)
+
+@pytest.mark.parametrize("name, precision", [("binary", None), ("float", 10), ("decimal", 0)])
+def test_invalid_modes(name, precision):
+    with pytest.raises(ValueError):
+        NumericMode(name, precision)
+
+@pytest.mark.parametrize("value, formatted", [
+    (10 ** 30, 10 ** 30), (4.0, 4), (0.5, 0.5), (Fraction(1, 3), "1/3"), (Decimal("0.10"), "0.10"),
+])
+def test_format_number(value, formatted):
+    assert format_number(value) == formatted
+
+@pytest.mark.parametrize("value", [float("inf"), float("-inf"), float("nan")])
+def test_format_number_refuses_non_finite_floats(value):
+    with pytest.raises(ValueError, match="Result is too large"):
+        format_number(value)
@@ -0,0 +1,51 @@
+import pickle
+import pytest
+from src.expression_ast import compile_expression
+from src.optimizer import CONSTANT, optimize
+
+def test_repeated_subterms_are_folded_once():
+    source = " + ".join(["(1.5 + 2.25)"] * 100)
+    optimized = optimize(compile_expression(source, "iterative"))
+    assert optimized.evaluate() == pytest.approx(375.0)
+    assert optimized.nodes_before == 399
+    assert optimized.nodes_after == 1
+    assert optimized.program[0][0] == CONSTANT
+
+def test_shared_subexpressions_with_variables():
+    source = "(x * 3) / (y - 1) + (x * 3) - (y - 1)"
+    compiled = compile_expression(source)
+    optimized = optimize(compiled)
+    assert optimized.stats() == {"nodes_before": 15, "nodes_after": 9, "folded": 0}
+    bindings = {"x": 2.0, "y": 5.0}
+    assert optimized.evaluate(bindings) == compiled.evaluate(bindings)
+
+@pytest.mark.parametrize("expression", [
+    "-(2 * 3) + x", "x - -0", "0 * -1 + x", "(1 + 2) * (x - (1 + 2)) / -(x)", "2 * x * 2 * x",
+])
+def test_matches_tree_evaluation(expression):
+    compiled = compile_expression(expression)
+    optimized = optimize(compiled)
+    for x in (-2.0, 0.5, 7.0):
+        assert repr(optimized.evaluate({"x": x})) == repr(compiled.evaluate({"x": x}))
+
+def test_division_by_zero_is_not_folded():
+    optimized = optimize(compile_expression("x + 1 / (2 - 2)"))
+    with pytest.raises(ZeroDivisionError):
+        optimized.evaluate({"x": 1.0})
+
+def test_error_order_is_preserved():
+    with pytest.raises(ValueError, match="Undefined variable: a"):
+        optimize(compile_expression("a + 1 / 0")).evaluate()
+    with pytest.raises(ZeroDivisionError):
+        optimize(compile_expression("1 / 0 + a")).evaluate()
+
+def test_deep_nesting():
+    depth = 5000
+    optimized = optimize(compile_expression("(" * depth + "x" + ")" * depth + " + 1", "iterative"))
+    assert optimized.evaluate({"x": 1.0}) == 2.0
+
+def test_pickle_round_trip():
+    optimized = optimize(compile_expression("x * (1 + 2)"))
+    restored = pickle.loads(pickle.dumps(optimized))
+    assert restored.evaluate({"x": 2.0}) == 6.0
+    assert restored.stats() == optimized.stats()
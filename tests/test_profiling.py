@@ -0,0 +1,56 @@
+import base64
+import marshal
+import pstats
+
+import pytest
+
+from src.expression_ast import compile_expression
+from src.limits import EvaluationBudget, LimitExceededError
+from src.numeric import NumericMode
+from src.profiling import profile_expression, tree_stats
+
+
+@pytest.mark.parametrize("expression, nodes, depth", [
+    ("2", 1, 1),
+    ("-x", 2, 2),
+    ("(1 + 2) * 3", 5, 3),
+    ("(" * 3000 + "1" + "+1)" * 3000, 6001, 3001),
+])
+def test_tree_stats(expression, nodes, depth):
+    assert tree_stats(compile_expression(expression, "iterative").root) == (nodes, depth)
+
+
+def test_profile_reports_phases_and_shape():
+    result, error, profile = profile_expression("(x+2)*3", {"x": 1.0})
+    assert (result, error) == (9.0, None)
+    assert set(profile["timings"]) == {"lex", "parse", "optimize", "evaluate"}
+    assert profile["mode"] == "timings" and "pstats" not in profile
+    assert (profile["tokens"], profile["nesting"], profile["depth"], profile["nodes"]) == (7, 1, 3, 5)
+
+
+def test_profile_of_a_failing_expression():
+    result, error, profile = profile_expression("1/0", numeric=NumericMode())
+    assert result is None and isinstance(error, ZeroDivisionError)
+    assert "evaluate" in profile["timings"]
+    result, error, profile = profile_expression("2*")
+    assert isinstance(error, ValueError)
+    assert set(profile["timings"]) == {"lex", "parse"}
+    assert profile["tokens"] == 2 and profile["nodes"] is None
+
+
+def test_captured_profile_loads_with_pstats(tmp_path):
+    _, _, profile = profile_expression("+".join(["1.5"] * 500), capture=True)
+    assert profile["mode"] == "cprofile"
+    path = tmp_path / "expression.prof"
+    path.write_bytes(base64.b64decode(profile["pstats"]))
+    stats = pstats.Stats(str(path))
+    assert any(name == "compile_expression" for _, _, name in stats.stats)
+    assert profile["top"][0]["cumulative_seconds"] >= profile["top"][-1]["cumulative_seconds"]
+    assert marshal.loads(base64.b64decode(profile["pstats"])) == stats.stats
+
+
+def test_budget_still_applies():
+    with pytest.raises(LimitExceededError):
+        profile_expression(" - ".join(["3"] * 3000), budget=EvaluationBudget(max_steps=100), capture=True)
+    # The profiler was released
+    assert profile_expression("1", capture=True)[0] == 1.0
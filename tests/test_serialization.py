@@ -0,0 +1,61 @@
+import json
+
+import numpy as np
+import pytest
+
+from src import serialization
+from src.serialization import encode_json, encode_msgpack, prefers_msgpack
+
+
+@pytest.mark.parametrize("content", [
+    {"expression": "2 + 2", "result": 4},
+    {"results": [{"expression": "1/0", "error": {"type": "division_by_zero", "detail": "division by zero"}}]},
+    {"expression": "π", "result": 3.141592653589793},
+    {"result": 10 ** 40},
+    {"result": "1/3"},
+])
+def test_json_matches_the_standard_encoder(content):
+    assert json.loads(encode_json(content)) == content
+
+
+def test_json_without_orjson(monkeypatch):
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert encode_json({"expression": "π", "result": 10 ** 40}) == '{"expression":"π","result":10000000000000000000000000000000000000000}'.encode()
+    assert encode_json({"results": np.array([1.0, np.nan])}) == b'{"results":[1.0,null]}'
+
+
+def test_arrays_encode_non_finite_values_as_null():
+    values = np.array([1.5, np.nan, np.inf, -np.inf, 2.0])
+    assert json.loads(encode_json({"results": values})) == {"results": [1.5, None, None, None, 2.0]}
+
+
+def test_msgpack_round_trip():
+    msgpack = pytest.importorskip("msgpack")
+    content = {"results": [{"expression": "1 + 1", "result": 2}, {"expression": "x", "result": 10 ** 30}]}
+    decoded = msgpack.unpackb(encode_msgpack(content))
+    assert decoded["results"][0] == {"expression": "1 + 1", "result": 2}
+    # Beyond 64 bits, integers are sent as decimal strings
+    assert decoded["results"][1]["result"] == str(10 ** 30)
+    assert msgpack.unpackb(encode_msgpack({"r": np.array([1.0, np.inf])})) == {"r": [1.0, None]}
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("", False),
+    ("application/json", False),
+    ("application/msgpack", True),
+    ("application/x-msgpack", True),
+    ("application/json, application/msgpack", True),
+    ("application/msgpack;q=0.5, application/json", False),
+    ("application/msgpack;q=0", False),
+    ("*/*;q=0.1, application/vnd.msgpack", True),
+])
+def test_prefers_msgpack(accept, expected):
+    pytest.importorskip("msgpack")
+    assert prefers_msgpack(accept) is expected
+
+
+def test_json_only_without_msgpack(monkeypatch):
+    monkeypatch.setattr(serialization, "msgpack", None)
+    assert not prefers_msgpack("application/msgpack")
+    with pytest.raises(RuntimeError, match="msgpack"):
+        encode_msgpack({})
@@ -0,0 +1,160 @@
+import decimal
+import multiprocessing
+from fractions import Fraction
+
+import pytest
+
+from src import shared_cache as shared_cache_module
+from src.expression_cache import CacheEntry, build_entry
+from src.numeric import NumericMode
+from src.shared_cache import SharedCache, decode_value, encode_value
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "results.sqlite")
+
+
+@pytest.mark.parametrize("value", [
+    0, -7, 3 ** 9000, 0.1, -0.0, float("inf"), 1e-310,
+    Fraction(1, 3), Fraction(-10 ** 50, 7), decimal.Decimal("0.3333333333"), decimal.Decimal("-1E+30"),
+])
+def test_values_round_trip_exactly(value):
+    decoded = decode_value(*encode_value(value))
+    assert type(decoded) is type(value) and decoded == value
+    if isinstance(value, float):
+        assert decoded.hex() == value.hex()
+
+
+def test_get_after_put_in_another_connection(path):
+    writer, reader = SharedCache(path), SharedCache(path)
+    writer.put("auto", "1+2", build_entry("1+2"))
+    writer.put("auto", "1/0", build_entry("1/0"))
+    assert reader.get("auto", "1+2").unwrap() == 3
+    with pytest.raises(ZeroDivisionError, match="division by zero"):
+        reader.get("auto", "1/0").unwrap()
+    assert reader.get("float", "1+2") is None
+    assert (reader.hits, reader.misses) == (2, 1)
+
+
+def test_entries_survive_reopening(path):
+    cache = SharedCache(path)
+    cache.put("fraction", "1/3", build_entry("1/3", numeric=NumericMode("fraction")))
+    cache.close()
+    assert SharedCache(path).get("fraction", "1/3").unwrap() == Fraction(1, 3)
+
+
+def test_expressions_with_variables_are_not_shared(path):
+    cache = SharedCache(path)
+    assert not cache.put("auto", "x+1", build_entry("x+1"))
+    assert cache.put("auto", "x+", build_entry("x+"))
+    assert len(cache) == 1
+
+
+def test_long_expressions_are_not_shared(path):
+    cache = SharedCache(path)
+    expression = "+".join(["1"] * shared_cache_module.MAX_KEY_LENGTH)
+    assert not cache.put("auto", expression, CacheEntry(result=1))
+    assert cache.get("auto", expression) is None
+
+
+def test_trims_least_recently_used(path, monkeypatch):
+    monkeypatch.setattr(shared_cache_module, "TRIM_INTERVAL", 1)
+    cache = SharedCache(path, maxsize=3)
+    for n in range(3):
+        cache.put("auto", str(n), CacheEntry(result=n))
+    cache.get("auto", "0")
+    cache.put("auto", "3", CacheEntry(result=3))
+    assert len(cache) == 3
+    assert cache.get("auto", "1") is None
+    assert cache.get("auto", "0").unwrap() == 0
+    assert cache.evictions == 1
+
+
+def test_recent_returns_most_recent_last(path):
+    cache = SharedCache(path)
+    for n in range(5):
+        cache.put("auto", str(n), CacheEntry(result=n))
+    assert [key for key, _ in cache.recent(3)] == [("auto", "2"), ("auto", "3"), ("auto", "4")]
+
+
+def test_unusable_database_counts_errors(tmp_path):
+    cache = SharedCache(str(tmp_path / "missing" / "results.sqlite"))
+    assert cache.get("auto", "1+1") is None
+    assert not cache.put("auto", "1+1", CacheEntry(result=2))
+    assert cache.errors == 2
+
+
+def _write_entries(path, worker):
+    cache = SharedCache(path, busy_timeout=5.0)
+    for n in range(100):
+        cache.put("auto", f"{worker}:{n}", CacheEntry(result=n))
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_processes_share_entries(path):
+    parent = SharedCache(path)
+    parent.put("auto", "1+1", CacheEntry(result=2))
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_write_entries, args=(path, worker)) for worker in range(3)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+        assert process.exitcode == 0
+    assert len(parent) == 301
+    assert parent.get("auto", "2:99").unwrap() == 99
+
+
+def _used(path, expression):
+    import sqlite3
+    with sqlite3.connect(path) as connection:
+        return connection.execute("SELECT used FROM results WHERE expression = ?", (expression,)).fetchone()[0]
+
+
+def test_recency_of_hits_is_written_in_batches(path, monkeypatch):
+    monkeypatch.setattr(shared_cache_module, "TOUCH_INTERVAL", 2)
+    cache = SharedCache(path)
+    for n in range(3):
+        cache.put("auto", str(n), CacheEntry(result=n))
+    stored = [_used(path, str(n)) for n in range(3)]
+    cache.get("auto", "0")
+    assert _used(path, "0") == stored[0]
+    cache.get("auto", "1")
+    assert _used(path, "0") > stored[0] and _used(path, "1") > stored[1]
+    cache.get("auto", "2")
+    cache.close()
+    assert _used(path, "2") > stored[2]
+
+
+def test_lookup_and_store_run_off_the_event_loop(path):
+    import asyncio
+    import threading
+    cache = SharedCache(path)
+    threads = set()
+    put, get = cache.put, cache.get
+    cache.put = lambda *args: threads.add(threading.current_thread()) or put(*args)
+    cache.get = lambda *args: threads.add(threading.current_thread()) or get(*args)
+
+    async def run():
+        cache.store("auto", "6*7", CacheEntry(result=42))
+        # Answered after the store queued before it
+        return await cache.lookup("auto", "6*7")
+
+    assert asyncio.run(run()).unwrap() == 42
+    assert threading.current_thread() not in threads and len(threads) == 1
+    assert cache._pending_stores == 0
+    cache.close()
+
+
+def test_stores_beyond_the_queue_are_dropped(path, monkeypatch):
+    import asyncio
+    monkeypatch.setattr(shared_cache_module, "MAX_PENDING_STORES", 0)
+    cache = SharedCache(path)
+
+    async def run():
+        cache.store("auto", "1", CacheEntry(result=1))
+
+    asyncio.run(run())
+    cache.close()
+    assert len(cache) == 0 and cache.errors == 1
@@ -0,0 +1,136 @@
+import asyncio
+import io
+import json
+import httpx
+from src.expression_api import app
+from fastapi.testclient import TestClient
+from src.api_client import SocketClient
+from src.simple_client import evaluate_expression, format_stats, post_with_retries, run_bulk, run_bulk_socket
+from tests.test_api_client import SessionConnection
+
+def test_run_bulk_against_app():
+    lines = ["1 + 1", "", "2 *", "3 * (4 + 5)", "1 / 0"]
+    output = io.StringIO()
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await run_bulk(lines, client, concurrency=3, retries=0, output=output)
+
+    stats = asyncio.run(run())
+    assert stats["expressions"] == 4
+    assert stats["ok"] == 2 and stats["errors"] == 2
+    records = {record["line"]: record for record in map(json.loads, output.getvalue().splitlines())}
+    assert records[1]["result"] == 2
+    assert records[3]["error"] == "Expected number"
+    assert records[4]["result"] == 27
+    assert "4 expressions" in format_stats(stats)
+
+def test_overloaded_responses_are_retried():
+    statuses = [503, 503, 200]
+
+    def handler(request):
+        status = statuses.pop(0)
+        if status == 200:
+            return httpx.Response(200, json={"expression": "1", "result": 1})
+        return httpx.Response(status, json={"detail": "busy"}, headers={"Retry-After": "0"})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+            return await post_with_retries(client, "1", retries=3)
+
+    record, attempts = asyncio.run(run())
+    assert record == {"expression": "1", "result": 1}
+    assert attempts == 3
+
+def test_retry_after_dates_fall_back_to_backoff():
+    statuses = [429, 200]
+
+    def handler(request):
+        if statuses.pop(0) == 200:
+            return httpx.Response(200, json={"expression": "1", "result": 1})
+        return httpx.Response(429, json={"detail": "slow down"}, headers={"Retry-After": "Wed, 21 Oct 2026 07:28:00 GMT"})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+            return await post_with_retries(client, "1", retries=1, backoff=0.01)
+
+    assert asyncio.run(run()) == ({"expression": "1", "result": 1}, 2)
+
+def test_run_bulk_keeps_requests_going_while_input_is_slow():
+    import threading
+    answered = threading.Event()
+    waited = []
+
+    def lines():
+        yield "1 + 1"
+        # A pipe with nothing more to read until the first result is written
+        waited.append(answered.wait(1))
+        yield "2 + 2"
+
+    class Output(io.StringIO):
+        def write(self, text):
+            answered.set()
+            return super().write(text)
+
+    async def handler(request):
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"expression": "", "result": 0})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+            return await run_bulk(lines(), client, concurrency=2, retries=0, output=Output())
+
+    assert asyncio.run(run())["ok"] == 2
+    assert waited == [True]
+
+def test_errors_are_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400, json={"detail": "Expected number"})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+            return await post_with_retries(client, "2 *", retries=3)
+
+    record, attempts = asyncio.run(run())
+    assert record["error"] == "Expected number"
+    assert attempts == 1 and len(calls) == 1
+
+def test_malformed_responses_fail_only_their_line():
+    def handler(request):
+        expression = json.loads(request.content)["expression"]
+        if expression == "2":
+            return httpx.Response(200, content=b"<html>")
+        if expression == "3":
+            raise httpx.DecodingError("bad gzip", request=request)
+        return httpx.Response(200, json={"expression": expression, "result": 1})
+
+    output = io.StringIO()
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+            return await run_bulk(["1", "2", "3", "4"], client, concurrency=2, retries=3, output=output)
+
+    stats = asyncio.run(run())
+    assert stats["ok"] == 2 and stats["errors"] == 2 and stats["requests"] == 4
+    records = {record["line"]: record for record in map(json.loads, output.getvalue().splitlines())}
+    assert records[2]["error"].startswith("Invalid response: JSONDecodeError")
+    assert records[3]["error"] == "DecodingError: bad gzip"
+
+def test_run_bulk_over_websocket():
+    lines = ["1 + 1", "", "2 *", "3 * (4 + 5)", "1 / 0"]
+    output = io.StringIO()
+    with TestClient(app).websocket_connect("/ws") as session:
+        socket = SocketClient(connection=SessionConnection(session))
+        stats = run_bulk_socket(lines, socket, window=2, output=output)
+        assert evaluate_expression("6 * 7", socket=socket) == 42
+        assert evaluate_expression("6 *", socket=socket) == "Error: Expected number"
+    assert stats["expressions"] == 4
+    assert stats["ok"] == 2 and stats["errors"] == 2
+    records = {record["line"]: record for record in map(json.loads, output.getvalue().splitlines())}
+    assert records[1]["result"] == 2
+    assert records[3]["error"] == "Expected number"
+    assert records[4]["result"] == 27
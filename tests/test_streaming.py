@@ -0,0 +1,37 @@
+import asyncio
+import json
+from src.streaming import ndjson_results
+
+async def _chunks(parts):
+    for part in parts:
+        yield part
+
+async def _echo(expression):
+    return {"expression": expression}
+
+def _collect(parts, max_line_bytes=1024):
+    async def run():
+        blocks = []
+        async for block in ndjson_results(_chunks(parts), _echo, max_line_bytes):
+            blocks.append(block)
+        return blocks
+    blocks = asyncio.run(run())
+    return [json.loads(line) for line in b"".join(blocks).splitlines()]
+
+def test_lines_split_across_chunks():
+    items = _collect([b"1 +", b" 2\n3", b"\n\n4 * 5"])
+    assert items == [
+        {"line": 1, "expression": "1 + 2"},
+        {"line": 2, "expression": "3"},
+        {"line": 4, "expression": "4 * 5"},
+    ]
+
+def test_oversized_line_is_not_buffered():
+    items = _collect([b"1\n", b"9" * 50, b"9" * 50, b"\n2\n"], max_line_bytes=40)
+    assert items[0] == {"line": 1, "expression": "1"}
+    assert items[1]["line"] == 2 and "exceeds" in items[1]["error"]["detail"]
+    assert items[2] == {"line": 3, "expression": "2"}
+
+def test_invalid_utf8():
+    items = _collect([b"\xff\xfe\n"])
+    assert items[0]["error"]["detail"] == "Line is not valid UTF-8"
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from src.expression_ast import compile_expression
+from src.vectorized import evaluate_vectorized
+
+def test_matches_scalar_evaluation():
+    compiled = compile_expression("(a + b) * c - a / 4")
+    columns = {
+        "a": np.arange(1000, dtype=float),
+        "b": np.linspace(-5, 5, 1000),
+        "c": np.full(1000, 2.5),
+    }
+    values, mask = evaluate_vectorized(compiled, columns)
+    assert not mask.any()
+    for row in (0, 17, 999):
+        expected = compiled.evaluate({name: column[row] for name, column in columns.items()})
+        assert values[row] == pytest.approx(expected)
+
+def test_constant_expression_broadcasts():
+    values, _ = evaluate_vectorized(compile_expression("2 * (3 + 4)"), {})
+    assert values.tolist() == [14.0]
+
+@pytest.mark.parametrize("policy,expected", [
+    ("nan", [1.0, np.nan, -0.5]),
+    ("inf", [1.0, np.inf, -0.5]),
+])
+def test_division_by_zero_is_per_row(policy, expected):
+    compiled = compile_expression("1 / x")
+    values, mask = evaluate_vectorized(compiled, {"x": [1, 0, -2]}, division_by_zero=policy)
+    assert mask.tolist() == [False, True, False]
+    np.testing.assert_array_equal(values, expected)
+
+def test_division_by_zero_error_policy():
+    with pytest.raises(ZeroDivisionError):
+        evaluate_vectorized(compile_expression("1 / x"), {"x": [1, 0]}, division_by_zero="error")
+
+@pytest.mark.parametrize("columns", [
+    {"a": [1, 2]},
+    {"a": [1, 2], "b": [1, 2, 3]},
+])
+def test_invalid_columns(columns):
+    with pytest.raises(ValueError):
+        evaluate_vectorized(compile_expression("a + b"), columns)